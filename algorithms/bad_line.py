@@ -1,4 +1,5 @@
-from .base import Algorithm
+from .base import (Algorithm, run_per_channel, PARALLEL_MODES, BAYER_PATTERNS, BAYER_OFFSETS,
+                   DEFAULT_MEMORY_BUDGET)
 import numpy as np
 
 class BadLineDetectionAlgorithm(Algorithm):
@@ -17,108 +18,166 @@ class BadLineDetectionAlgorithm(Algorithm):
                 "default": 100,
                 "min": 1,
                 "max": 10000,
-                "label": "Threshold"
+                "label": "Threshold",
+                "slider": True
             },
             "axis": {
                 "type": "list",
                 "options": ["Rows", "Cols", "Both"],
                 "default": "Both",
                 "label": "Detect Axis"
+            },
+            "parallel": {
+                "type": "list",
+                "options": PARALLEL_MODES,
+                "default": "Threads",
+                "label": "Parallelism"
             }
         }
 
-    def run(self, image_data: np.ndarray, params: dict):
+    def run(self, image_data: np.ndarray, params: dict, context=None):
         threshold = params.get("threshold", 100)
         axis = params.get("axis", "Both")
         pattern = params.get("pattern", "Mono/None")
+        parallel = params.get("parallel", "Threads")
         
-        overlays = []
+        channel_lines = [(offset, self.lines_from_means(row_means if axis in ["Rows", "Both"] else None,
+                                                        col_means if axis in ["Cols", "Both"] else None,
+                                                        threshold))
+                         for offset, (row_means, col_means) in self.channel_line_means(image_data, pattern, parallel)]
+        if context is not None:
+            context.report(1.0, "Line means") # Quick: line means only, just honor cancellation
         
-        # Helper to detect lines on a 2D plane
-        def detect_lines_on_plane(plane, p_threshold, p_axis_mode):
-            # p_axis_mode: "Rows", "Cols", "Both"
-            bad_rows = []
-            bad_cols = []
-            
-            h, w = plane.shape
-            
-            # Detect Rows
-            if p_axis_mode in ["Rows", "Both"]:
-                # Calculate mean of each row
-                row_means = np.mean(plane, axis=1)
-                # Median of row means
-                global_median = np.median(row_means)
-                
-                # Simple deviation check
-                diff = np.abs(row_means - global_median)
-                
-                # Find indices
-                bad_row_idxs = np.where(diff > p_threshold)[0]
-                bad_rows.extend(bad_row_idxs.tolist())
-                
-            # Detect Cols
-            if p_axis_mode in ["Cols", "Both"]:
-                # Calculate mean of each col
-                col_means = np.mean(plane, axis=0)
-                global_median = np.median(col_means)
-                
-                diff = np.abs(col_means - global_median)
-                bad_col_idxs = np.where(diff > p_threshold)[0]
-                bad_cols.extend(bad_col_idxs.tolist())
-                
-            return bad_rows, bad_cols
+        overlays = self.build_overlays(channel_lines, image_data.shape)
+        return {
+            "image": image_data,
+            "overlays": overlays,
+            "message": f"Detected {len(overlays)} bad lines."
+        }
 
-        # Logic to map plane coords back to global coords
-        # Reuse logic from bad_pixel but for lines
+    def run_tiled(self, image_data, params: dict, memory_budget=DEFAULT_MEMORY_BUDGET, mask_out=None,
+                  image_out=None, context=None):
+        """
+        Streams row bands, accumulating per-row means and per-column sums for
+        each channel, then applies the same median/threshold test as run().
+        Sums are float64, exact for integer data, so the result is identical.
+        Lines are only flagged, image_out is left untouched.
+        """
+        threshold = params.get("threshold", 100)
+        axis = params.get("axis", "Both")
+        pattern = params.get("pattern", "Mono/None")
         
-        if pattern in ["RGGB", "BGGR", "GRBG", "GBRG"]:
-            offsets = [(0,0), (0,1), (1,0), (1,1)]
-            
-            for dy, dx in offsets:
-                sub_img = image_data[dy::2, dx::2]
-                
-                b_rows, b_cols = detect_lines_on_plane(sub_img, threshold, axis)
-                
-                # Map back
-                # Row index r in sub_img corresponds to r*2 + dy in global
-                # Col index c in sub_img corresponds to c*2 + dx in global
-                
-                for r in b_rows:
-                    global_r = r * 2 + dy
-                    overlays.append({
-                        "type": "line",
-                        "coords": (0, global_r, image_data.shape[1], global_r), # x1, y1, x2, y2
-                        "color": "yellow"
-                    })
-                    
-                for c in b_cols:
-                    global_c = c * 2 + dx
-                    overlays.append({
-                        "type": "line",
-                        "coords": (global_c, 0, global_c, image_data.shape[0]),
-                        "color": "yellow"
-                    })
-                    
-        else:
-            # Mono
-            b_rows, b_cols = detect_lines_on_plane(image_data, threshold, axis)
+        height, width = image_data.shape
+        offsets = BAYER_OFFSETS if pattern in BAYER_PATTERNS else [None]
+        band_rows = self.get_band_rows(width, memory_budget)
+        
+        row_means = {offset: [] for offset in offsets}
+        col_sums = {offset: 0.0 for offset in offsets}
+        row_counts = {offset: 0 for offset in offsets}
+        
+        for y0 in range(0, height, band_rows): # band_rows is even: Bayer phase kept
+            if context is not None:
+                context.report(y0 / height, "Line means")
+            band = np.asarray(image_data[y0:min(y0 + band_rows, height)])
+            for offset in offsets:
+                plane = band if offset is None else band[offset[0]::2, offset[1]::2]
+                if axis in ["Rows", "Both"]:
+                    row_means[offset].append(np.mean(plane, axis=1))
+                if axis in ["Cols", "Both"]:
+                    col_sums[offset] = col_sums[offset] + plane.sum(axis=0, dtype=np.float64)
+                row_counts[offset] += plane.shape[0]
+        
+        channel_lines = []
+        for offset in offsets:
+            r_means = np.concatenate(row_means[offset]) if axis in ["Rows", "Both"] else None
+            c_means = col_sums[offset] / row_counts[offset] if axis in ["Cols", "Both"] else None
+            channel_lines.append((offset, self.lines_from_means(r_means, c_means, threshold)))
+        
+        overlays = self.build_overlays(channel_lines, (height, width))
+        return {
+            "image": image_data,
+            "overlays": overlays,
+            "message": f"Detected {len(overlays)} bad lines."
+        }
+
+    def build_overlays(self, channel_lines, shape):
+        """
+        Maps per-channel [(offset, (bad_rows, bad_cols)), ...] in plane
+        coordinates back to global line overlays.
+        """
+        overlays = []
+        for offset, (b_rows, b_cols) in channel_lines:
+            # Map back
+            # Row index r in sub_img corresponds to r*2 + dy in global
+            # Col index c in sub_img corresponds to c*2 + dx in global
+            # Mono: identity mapping
+            dy, dx = offset if offset is not None else (0, 0)
+            step = 2 if offset is not None else 1
             
             for r in b_rows:
+                global_r = r * step + dy
                 overlays.append({
                     "type": "line",
-                    "coords": (0, r, image_data.shape[1], r),
+                    "coords": (0, global_r, shape[1], global_r), # x1, y1, x2, y2
                     "color": "yellow"
                 })
                 
             for c in b_cols:
+                global_c = c * step + dx
                 overlays.append({
                     "type": "line",
-                    "coords": (c, 0, c, image_data.shape[0]),
+                    "coords": (global_c, 0, global_c, shape[0]),
                     "color": "yellow"
                 })
+        return overlays
 
-        return {
-            "image": image_data,
-            "overlays": overlays,
-            "message": f"Detected {len(overlays)} bad lines."
-        }
+    def channel_line_means(self, image_data, pattern, parallel):
+        """
+        Returns [(offset, (row_means, col_means)), ...] per channel, from
+        self.cache when this frame was processed before.
+        """
+        offsets = BAYER_OFFSETS if pattern in BAYER_PATTERNS else [None]
+        if self.cache is not None:
+            cached = [self.cache.get(image_data, offset, "line_means") for offset in offsets]
+            if all(m is not None for m in cached):
+                return list(zip(offsets, cached))
+        
+        results = run_per_channel(self.compute_line_means, image_data, pattern, parallel)
+        if self.cache is not None:
+            for offset, means in results:
+                self.cache.put(image_data, offset, "line_means", means)
+        return results
+
+    def compute_line_means(self, plane):
+        """Returns (row_means, col_means) of a 2D plane."""
+        return np.mean(plane, axis=1), np.mean(plane, axis=0)
+
+    def lines_from_means(self, row_means, col_means, p_threshold):
+        """
+        Flags lines whose mean deviates from the median line mean by more
+        than p_threshold. Either means array may be None (axis not checked).
+        """
+        bad_rows = []
+        bad_cols = []
+        
+        # Detect Rows
+        if row_means is not None:
+            # Median of row means
+            global_median = np.median(row_means)
+            
+            # Simple deviation check
+            diff = np.abs(row_means - global_median)
+            
+            # Find indices
+            bad_row_idxs = np.where(diff > p_threshold)[0]
+            bad_rows.extend(bad_row_idxs.tolist())
+            
+        # Detect Cols
+        if col_means is not None:
+            global_median = np.median(col_means)
+            
+            diff = np.abs(col_means - global_median)
+            bad_col_idxs = np.where(diff > p_threshold)[0]
+            bad_cols.extend(bad_col_idxs.tolist())
+            
+        return bad_rows, bad_cols
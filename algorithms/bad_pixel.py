@@ -1,7 +1,14 @@
-from .base import Algorithm
+from .base import Algorithm, make_detections, run_per_channel, PARALLEL_MODES, BAYER_PATTERNS, BAYER_OFFSETS
+from .median import iter_neighbor_median, median_dtype
+from functools import partial
 import numpy as np
 
 class BadPixelDetectionAlgorithm(Algorithm):
+    # One neighbor row per channel plane = 2 frame rows
+    tile_halo = 2
+    # Input (<=2) + float32 residual (4) + masks/indices + corrected copy, with headroom
+    tile_bytes_per_pixel = 20
+
     @property
     def name(self) -> str:
         return "Bad Pixel Detection"
@@ -17,142 +24,148 @@ class BadPixelDetectionAlgorithm(Algorithm):
                 "default": 100,
                 "min": 10,
                 "max": 4095, # Assuming 12-bit max mostly, but can go higher
-                "label": "Threshold"
+                "label": "Threshold",
+                "slider": True
             },
             "visualize_only": {
                 "type": "bool",
                 "default": True,
                 "label": "Visualize Only (No Correction)"
+            },
+            "parallel": {
+                "type": "list",
+                "options": PARALLEL_MODES,
+                "default": "Threads",
+                "label": "Parallelism"
             }
         }
 
-    def run(self, image_data: np.ndarray, params: dict):
+    def run(self, image_data: np.ndarray, params: dict, context=None):
         threshold = params.get("threshold", 100)
         pattern = params.get("pattern", "Mono/None")
+        parallel = params.get("parallel", "Threads")
+        correct = not params.get("visualize_only", True)
         
-        overlays = []
-        limit = 2000 # Increased limit
+        residual_func = self.compute_residual
+        if context is not None and parallel != "Processes": # The context does not cross processes
+            # Progress in median rows over all planes
+            if pattern in BAYER_PATTERNS:
+                total = sum(max(image_data[dy::2, dx::2].shape[0] - 2, 0) for dy, dx in BAYER_OFFSETS)
+            else:
+                total = max(image_data.shape[0] - 2, 0)
+            context.set_total(total, "Median filter")
+            residual_func = partial(self.compute_residual, context=context)
         
-        # Check if we should split channels
-        if pattern in ["RGGB", "BGGR", "GRBG", "GBRG"]:
-            # Per-channel processing
-            # 0: R, 1: Gr, 2: Gb, 3: B (conceptually, we just want 4 2x2 offsets)
-            
-            # Offsets for 2x2 grid: (0,0), (0,1), (1,0), (1,1)
-            offsets = [(0,0), (0,1), (1,0), (1,1)]
-            
-            h, w = image_data.shape
-            
-            running_count = 0
+        full_mask = np.zeros(image_data.shape, dtype=bool)
+        detections = []
+        medians = [] # Replacement value per detection, same order
+        
+        # Per-channel processing when a Bayer pattern is set (the four 2x2
+        # offsets run concurrently), full plane processing for mono
+        for offset, residual in self.channel_residuals(image_data, pattern, parallel, residual_func, context):
+            # |residual| > threshold without a full-size abs() temporary
+            bad_mask = (residual > threshold) | (residual < -threshold)
+            y_idxs, x_idxs = np.nonzero(bad_mask)
+            flagged = residual[y_idxs, x_idxs]
+            severity = np.abs(flagged)
             
-            for dy, dx in offsets:
-                # Slicing: start:stop:step
-                # Sub-image for this channel
-                sub_img = image_data[dy::2, dx::2]
-                
-                # Detect on sub-image
-                bad_mask = self.detect_on_plane(sub_img, threshold)
-                
+            if offset is None:
+                full_mask = bad_mask
+                plane = image_data
+                detections.append(make_detections(x_idxs, y_idxs, -1, severity))
+            else:
                 # Map back to global coordinates
-                y_idxs, x_idxs = np.where(bad_mask)
-                
-                # Global coords: 
                 # global_y = sub_y * 2 + dy
                 # global_x = sub_x * 2 + dx
-                
-                # We can iterate and add
-                for sy, sx in zip(y_idxs, x_idxs):
-                    if running_count >= limit:
-                        break
-                    
-                    gy = sy * 2 + dy
-                    gx = sx * 2 + dx
-                    
-                    overlays.append({
-                        "type": "point",
-                        "coords": (int(gx), int(gy)),
-                        "color": "red"
-                    })
-                    running_count += 1
-                
-                if running_count >= limit:
-                    break
-                    
-        else:
-            # Mono image - full plane processing
-            bad_mask = self.detect_on_plane(image_data, threshold)
-            y_idxs, x_idxs = np.where(bad_mask)
+                dy, dx = offset
+                full_mask[dy::2, dx::2] = bad_mask
+                plane = image_data[dy::2, dx::2]
+                detections.append(make_detections(x_idxs * 2 + dx, y_idxs * 2 + dy, dy * 2 + dx, severity))
             
-            count = 0
-            for y, x in zip(y_idxs, x_idxs):
-                if count >= limit:
-                    break
-                overlays.append({
-                    "type": "point",
-                    "coords": (int(x), int(y)),
-                    "color": "red"
-                })
-                count += 1
-
-        return {
-            "image": image_data,
-            "overlays": overlays,
-            "message": f"Detected {len(overlays)}+ bad pixels."
-        }
+            if correct:
+                # residual = pixel - median, so the median comes for free
+                medians.append(plane[y_idxs, x_idxs] - flagged)
 
-    def detect_on_plane(self, plane: np.ndarray, threshold: int) -> np.ndarray:
-        # 3x3 median filter check using neighbor splicing
-        # Ignore borders for simplicity
+        if context is not None:
+            context.check_cancelled()
         
-        # Center (crop by 1 all around)
-        center = plane[1:-1, 1:-1].astype(np.float32)
+        # Row-major order, independent of the channel split
+        detections = np.concatenate(detections)
+        order = np.lexsort((detections["x"], detections["y"]))
+        detections = detections[order]
         
-        # Neighbors
-        neighbors = []
-        for dy in [-1, 0, 1]:
-            for dx in [-1, 0, 1]:
-                if dy == 0 and dx == 0:
-                    continue
-                # Slice: 1+dy : -1+dy (but need to handle end index properly)
-                # simpler: slice from [1+dy : h-1+dy, 1+dx : w-1+dx] if we knew h,w
-                # Let's use negative indexing carefuly.
-                
-                # if dy=-1, slice 0:-2. if dy=1, slice 2:. if dy=0, slice 1:-1
-                s_y = slice(1+dy, -1+dy) if (1+dy) < (-1+dy) else slice(1+dy, None if -1+dy == 0 else -1+dy) 
-                # Wait, slice logic is tricky with negative indices.
-                
-                # Explicit start/end
-                # We want a view of size (H-2, W-2)
-                # Original range [1 : -1] -> indices 1 .. H-2
-                # Neighbor at dy,dx relative to (y,x) is at (y+dy, x+dx)
-                # So we want indices (1+dy) .. (H-2+dy)
-                
-                # Python slicing: start : stop
-                # stop is exclusive.
-                # if slicing [1:-1], we get items 1 through H-2. Length H-2.
-                # neighbor slice start: 1+dy. Stop: -1+dy (if -1+dy is 0, use None? No, 0 is start).
-                # Actually -1 is the last element. We want up to (but not including) the last-shifted.
-                
-                # Let's use explicit shape math to be safe.
-                h, w = plane.shape
-                # Target shape: h-2, w-2
-                
-                n_slice = plane[1+dy : h-1+dy, 1+dx : w-1+dx]
-                neighbors.append(n_slice)
+        result = {
+            "image": image_data,
+            "detections": detections,
+            "mask": full_mask,
+            "message": f"Detected {len(detections)} bad pixels."
+        }
         
-        # Stack
-        stack = np.array(neighbors)
-        # Median
-        med_val = np.median(stack, axis=0)
+        if correct:
+            # One scatter of all replacement values into a copy of the frame
+            corrected = np.array(image_data, copy=True)
+            values = np.concatenate(medians)[order]
+            if corrected.dtype.kind in "ui":
+                info = np.iinfo(corrected.dtype)
+                values = np.clip(np.rint(values), info.min, info.max)
+            corrected[detections["y"], detections["x"]] = values
+            result["image"] = corrected
+            result["message"] = f"Corrected {len(detections)} bad pixels."
         
-        # Difference
-        diff = np.abs(center - med_val)
+        return result
+
+    def channel_residuals(self, image_data, pattern, parallel, residual_func, context=None):
+        """
+        Returns [(offset, residual), ...] like run_per_channel, served from
+        self.cache when this exact frame was processed before, so only the
+        threshold comparison is left to do.
+        """
+        offsets = BAYER_OFFSETS if pattern in BAYER_PATTERNS else [None]
+        if self.cache is not None:
+            cached = [self.cache.get(image_data, offset, "residual") for offset in offsets]
+            if all(r is not None for r in cached):
+                if context is not None:
+                    context.report(1.0, "Cached")
+                return list(zip(offsets, cached))
         
-        # Mask
-        local_mask = diff > threshold
+        results = run_per_channel(residual_func, image_data, pattern, parallel)
+        if self.cache is not None:
+            for offset, residual in results:
+                residual.setflags(write=False) # Shared with later runs
+                self.cache.put(image_data, offset, "residual", residual)
+        return results
+
+    def detect_on_plane(self, plane: np.ndarray, threshold: int) -> np.ndarray:
+        """Returns the (H, W) bool mask of pixels deviating more than threshold."""
+        return self.compute_deviation(plane) > threshold
+
+    def compute_deviation(self, plane: np.ndarray) -> np.ndarray:
+        """
+        Returns |pixel - median of its 8 neighbors| for every pixel of plane,
+        0 on the 1-pixel border.
+        """
+        deviation = self.compute_residual(plane)
+        np.abs(deviation, out=deviation)
+        return deviation
+
+    def compute_residual(self, plane: np.ndarray, context=None) -> np.ndarray:
+        """
+        Returns the signed pixel - median of its 8 neighbors for every pixel
+        of plane, 0 on the 1-pixel border. Keeping the sign means the median
+        itself (pixel - residual) is still known where correction needs it.
+        """
+        # 3x3 median filter check (8 neighbors, center excluded)
+        # Ignore borders for simplicity
+        h, w = plane.shape
+        full_diff = np.zeros(plane.shape, dtype=median_dtype(plane.dtype))
         
-        # Pad back to original size
-        full_mask = np.zeros_like(plane, dtype=bool)
-        full_mask[1:-1, 1:-1] = local_mask
+        # Row bands of the interior; only O(band) scratch besides the output
+        for r0, r1, med_val in iter_neighbor_median(plane):
+            center = plane[1 + r0:1 + r1, 1:w - 1]
+            diff = full_diff[1 + r0:1 + r1, 1:w - 1]
+            # Difference
+            np.subtract(center, med_val, out=diff, dtype=diff.dtype)
+            if context is not None:
+                context.advance(r1 - r0) # Also raises if cancelled
         
-        return full_mask
+        return full_diff
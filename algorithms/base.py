@@ -1,11 +1,76 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
 
+from utils.bayer import BAYER_PATTERNS, BAYER_OFFSETS # Re-exported for the algorithms
+from .cache import default_cache
+
+# Compact per-pixel detection record (see Algorithm.run "detections")
+#   x, y:     global pixel coordinates
+#   channel:  Bayer plane index dy * 2 + dx (0..3), -1 for mono data
+#   severity: algorithm specific score, e.g. deviation from neighbors
+#   kind:     defect class, index into DETECTION_KINDS
+DETECTION_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("channel", np.int8),
+    ("severity", np.float32),
+    ("kind", np.int8)
+])
+
+# Replaced pixel of a correction streamed by Algorithm.run_tiled; the
+# value is float64, exact for every raw integer type
+CORRECTION_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("value", np.float64)
+])
+
+# Defect classes: single-frame spatial outliers, and the temporal classes
+# of algorithms.temporal
+DETECTION_KINDS = ["spatial", "hot", "dark", "stuck", "flicker", "rts"]
+KIND_SPATIAL, KIND_HOT, KIND_DARK, KIND_STUCK, KIND_FLICKER, KIND_RTS = range(len(DETECTION_KINDS))
+
+def make_detections(x, y, channel, severity, kind=KIND_SPATIAL) -> np.ndarray:
+    """
+    Builds a DETECTION_DTYPE array from coordinate/score arrays (scalars broadcast).
+    """
+    x = np.asarray(x)
+    detections = np.empty(x.shape[0], dtype=DETECTION_DTYPE)
+    detections["x"] = x
+    detections["y"] = y
+    detections["channel"] = channel
+    detections["severity"] = severity
+    detections["kind"] = kind
+    return detections
+
+# Default peak working memory for run_tiled (bytes)
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
 class Algorithm(ABC):
     """
     Abstract base class for all image processing algorithms.
     """
     
+    # Rows of context a band needs above and below so that run() on the band
+    # reproduces the whole-frame result for its rows. Must be even to keep
+    # the Bayer phase. None = run() cannot be split (see run_tiled).
+    tile_halo = None
+    
+    # Approximate working memory of run() per input pixel, used by run_tiled
+    # to size bands from the memory budget
+    tile_bytes_per_pixel = 32
+    
+    # True: run() takes a frame sequence (an (N, H, W) array or
+    # utils.raw_source.FrameSequence) instead of a single (H, W) frame
+    temporal = False
+    
+    # IntermediateCache for threshold independent results (deviation maps,
+    # line means, ...) so parameter sweeps only redo the cheap final step.
+    # None disables caching.
+    cache = default_cache
+    
     def __init__(self):
         pass
 
@@ -33,19 +98,23 @@ class Algorithm(ABC):
                 "min": value, (optional)
                 "max": value, (optional)
                 "options": [], (optional for list)
-                "label": "Display Label"
+                "label": "Display Label",
+                "slider": True (optional, int/float: adds a slider to the UI)
             }
         }
         """
         pass
 
     @abstractmethod
-    def run(self, image_data: np.ndarray, params: dict):
+    def run(self, image_data: np.ndarray, params: dict, context=None):
         """
         Runs the algorithm on the given image data.
         ARGS:
             image_data: 2D numpy array (H, W) for raw data.
             params: Dictionary of parameter values.
+            context: (optional) algorithms.jobs.JobContext when run as a
+                background job: report progress through it and call
+                check_cancelled() between chunks of work. None otherwise.
             
         RETURNS:
             dict with keys:
@@ -56,6 +125,167 @@ class Algorithm(ABC):
                         {"type": "line", "coords": (x1, y1, x2, y2), "color": "blue"},
                         {"type": "rect", "coords": (x, y, w, h), "color": "green"}
                     ]
+                "detections": (optional) DETECTION_DTYPE structured array, one
+                    record per flagged pixel. Preferred over point overlays for
+                    large results: no per-pixel Python objects, no truncation.
+                "mask": (optional) (H, W) bool defect mask
                 "message": (optional) status message string
         """
         pass
+
+    def get_band_rows(self, width, memory_budget=DEFAULT_MEMORY_BUDGET):
+        """Rows per band (even) so a band plus its halo stays within memory_budget."""
+        halo = self.tile_halo or 0
+        rows = memory_budget // max(1, width * self.tile_bytes_per_pixel) - 2 * halo
+        return max(2, rows - rows % 2)
+
+    def run_tiled(self, image_data, params: dict, memory_budget=DEFAULT_MEMORY_BUDGET, mask_out=None,
+                  image_out=None, context=None):
+        """
+        Runs the algorithm in row bands so that peak memory is bounded by
+        memory_budget instead of the frame size. image_data can be any
+        array-like with 2D slicing, typically a read-only np.memmap: only the
+        band being processed is paged in.
+        
+        Each band is extended by tile_halo rows on both sides, run() is
+        called on it and only the detections in the band's own rows are kept,
+        so the stitched result is identical to run() on the whole frame.
+        
+        The default implementation stitches "detections", "mask" and a
+        modified "image" (correction). Nothing full-frame is allocated here:
+            mask_out:  (H, W) bool array (e.g. a disk-backed memmap) the
+                       mask is written to, only if given.
+            image_out: (H, W) writable array of image_data's dtype that
+                       receives the corrected frame, band by band. Without
+                       one, "image" is image_data unchanged and the changed
+                       pixels come back as "corrections" instead.
+        Algorithms whose result does not decompose by rows override this
+        method; with tile_halo None it falls back to run().
+        
+        RETURNS: same dict format as run(), plus
+            "corrections": (correction mode without image_out) CORRECTION_DTYPE
+                           array (x, y, value) of every replaced pixel
+        """
+        if self.tile_halo is None:
+            if context is not None:
+                return self.run(np.asarray(image_data), params, context=context)
+            return self.run(np.asarray(image_data), params)
+        
+        height, width = image_data.shape
+        halo = self.tile_halo
+        if context is not None:
+            context.set_total(height, "Processing bands")
+        band_rows = self.get_band_rows(width, memory_budget)
+        
+        detections = []
+        corrections = []
+        for y0 in range(0, height, band_rows):
+            y1 = min(y0 + band_rows, height)
+            a0 = max(0, y0 - halo)
+            a1 = min(height, y1 + halo)
+            
+            band = np.asarray(image_data[a0:a1])
+            result = self.run(band, params)
+            if context is not None:
+                context.advance(y1 - y0)
+            
+            band_image = result.get("image")
+            if band_image is None:
+                band_image = band
+            if image_out is not None:
+                image_out[y0:y1] = band_image[y0 - a0:y1 - a0]
+            elif band_image is not band:
+                changed_y, changed_x = np.nonzero(band_image[y0 - a0:y1 - a0] != band[y0 - a0:y1 - a0])
+                band_corrections = np.empty(len(changed_y), dtype=CORRECTION_DTYPE)
+                band_corrections["x"] = changed_x
+                band_corrections["y"] = changed_y + y0
+                band_corrections["value"] = band_image[changed_y + (y0 - a0), changed_x]
+                corrections.append(band_corrections)
+            
+            band_detections = result.get("detections")
+            if band_detections is not None:
+                band_detections = band_detections.copy()
+                band_detections["y"] += a0
+                keep = (band_detections["y"] >= y0) & (band_detections["y"] < y1)
+                detections.append(band_detections[keep])
+            
+            if mask_out is not None and result.get("mask") is not None:
+                mask_out[y0:y1] = result["mask"][y0 - a0:y1 - a0]
+        
+        result = {
+            "image": image_data if image_out is None else image_out,
+            "message": f"{self.name}: {sum(len(d) for d in detections)} detections."
+        }
+        if detections:
+            result["detections"] = np.concatenate(detections)
+        if corrections:
+            result["corrections"] = np.concatenate(corrections)
+        if mask_out is not None:
+            result["mask"] = mask_out
+        return result
+
+# Values of the "parallel" algorithm parameter
+PARALLEL_MODES = ["Threads", "Processes", "Off"]
+
+_thread_pool = None
+_process_pool = None
+
+def _get_thread_pool():
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=len(BAYER_OFFSETS), thread_name_prefix="bayer-plane")
+    return _thread_pool
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=len(BAYER_OFFSETS))
+    return _process_pool
+
+def _run_on_shared_plane(func, shm_name, shape, dtype, dy, dx):
+    # Process pool worker: attach to the parent's frame, run on one sub-plane
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result = func(image[dy::2, dx::2])
+        del image
+        return result
+    finally:
+        shm.close()
+
+def run_per_channel(func, image_data: np.ndarray, pattern, mode="Threads"):
+    """
+    Runs func(plane) on each of the four Bayer sub-planes image_data[dy::2, dx::2]
+    and returns [((dy, dx), result), ...] in BAYER_OFFSETS order.
+    Mono data (pattern not in BAYER_PATTERNS) returns [(None, func(image_data))].
+    
+    mode:
+        "Threads":   planes run concurrently on a thread pool (NumPy kernels
+                     release the GIL, no copies).
+        "Processes": planes run on a process pool; the frame is copied once
+                     into shared memory. func must be picklable.
+        "Off":       sequential, in the calling thread.
+    """
+    if pattern not in BAYER_PATTERNS:
+        return [(None, func(image_data))]
+    
+    if mode == "Threads":
+        pool = _get_thread_pool()
+        futures = [pool.submit(func, image_data[dy::2, dx::2]) for dy, dx in BAYER_OFFSETS]
+        return [(offset, f.result()) for offset, f in zip(BAYER_OFFSETS, futures)]
+    
+    if mode == "Processes":
+        shm = shared_memory.SharedMemory(create=True, size=max(image_data.nbytes, 1))
+        try:
+            shared = np.ndarray(image_data.shape, dtype=image_data.dtype, buffer=shm.buf)
+            shared[...] = image_data
+            del shared
+            pool = _get_process_pool()
+            futures = [pool.submit(_run_on_shared_plane, func, shm.name, image_data.shape,
+                                   image_data.dtype.str, dy, dx) for dy, dx in BAYER_OFFSETS]
+            return [(offset, f.result()) for offset, f in zip(BAYER_OFFSETS, futures)]
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    return [((dy, dx), func(image_data[dy::2, dx::2])) for dy, dx in BAYER_OFFSETS]
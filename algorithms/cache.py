@@ -0,0 +1,92 @@
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+
+def cached_nbytes(value):
+    """Approximate memory held by a cached value (arrays, tuples/lists of them, plain objects)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(cached_nbytes(v) for v in value)
+    if hasattr(value, "__dict__"):
+        return sum(cached_nbytes(v) for v in vars(value).values())
+    return 0
+
+class IntermediateCache:
+    """
+    Memory-bounded LRU of threshold independent intermediates (deviation
+    maps, line means, temporal stats), keyed by (image identity, channel,
+    stage).
+
+    Image identity is the input object itself: the frame array the canvas
+    holds, or a FrameSequence. It is tracked with a weakref.finalize so the
+    entries go away with the image and a recycled id() never hits stale data.
+    Inputs are assumed not to be modified in place (corrections produce new
+    arrays).
+    """
+    def __init__(self, budget_bytes=512 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict() # (id(image), channel, stage) -> (value, nbytes), oldest first
+        self.cached_bytes = 0
+        self.finalizers = {} # id(image) -> weakref.finalize
+        self.lock = threading.Lock() # Jobs run on worker threads
+
+    def get(self, image, channel, stage):
+        key = (id(image), channel, stage)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or id(image) not in self.finalizers:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, image, channel, stage, value):
+        nbytes = cached_nbytes(value)
+        if nbytes > self.budget_bytes:
+            return # Would evict everything else and still not fit
+        image_id = id(image)
+        key = (image_id, channel, stage)
+        with self.lock:
+            if image_id not in self.finalizers:
+                try:
+                    self.finalizers[image_id] = weakref.finalize(image, self.drop_image, image_id)
+                except TypeError:
+                    return # Not weak-referenceable, identity can't be tracked safely
+
+            if key in self.entries:
+                self.cached_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, nbytes)
+            self.cached_bytes += nbytes
+
+            while self.cached_bytes > self.budget_bytes and len(self.entries) > 1:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.cached_bytes -= evicted
+
+    def get_or_compute(self, image, channel, stage, compute):
+        value = self.get(image, channel, stage)
+        if value is None:
+            value = compute()
+            self.put(image, channel, stage, value)
+        return value
+
+    def drop_image(self, image_id):
+        """Removes every entry of an image (called when it is garbage collected)."""
+        with self.lock:
+            self.finalizers.pop(image_id, None)
+            for key in [k for k in self.entries if k[0] == image_id]:
+                self.cached_bytes -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            for finalizer in self.finalizers.values():
+                finalizer.detach()
+            self.finalizers.clear()
+            self.entries.clear()
+            self.cached_bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+# Shared by the built-in algorithms (see Algorithm.cache)
+default_cache = IntermediateCache()
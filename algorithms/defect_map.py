@@ -0,0 +1,174 @@
+import json
+import numpy as np
+
+from .base import make_detections, BAYER_PATTERNS, KIND_SPATIAL
+from .median import neighbor_median_at
+
+DEFECT_MAP_VERSION = 1
+
+class DefectMap:
+    """
+    Defect list of one sensor: the flagged pixels as sorted, unique linear
+    indices (y * width + x) plus a per-pixel kind and severity, and a header
+    recording the frame geometry, Bayer pattern and how the map was made
+    (algorithm, thresholds, serial, ... in `meta`).
+
+    Sorted indices make the set operations vectorized membership tests
+    (np.isin) and the file a few flat arrays: a map with 100k defects saves
+    and loads in milliseconds.
+    """
+    def __init__(self, width, height, pattern="Mono/None", indices=None, kind=None, severity=None, meta=None):
+        self.width = int(width)
+        self.height = int(height)
+        self.pattern = pattern
+        self.meta = dict(meta or {})
+        self.indices = np.asarray(indices if indices is not None else [], dtype=np.int64)
+        n = len(self.indices)
+        self.kind = np.asarray(kind if kind is not None else np.full(n, KIND_SPATIAL), dtype=np.int8)
+        self.severity = np.asarray(severity if severity is not None else np.zeros(n), dtype=np.float32)
+
+    @classmethod
+    def from_detections(cls, detections, width, height, pattern="Mono/None", meta=None):
+        """
+        Builds a map from a DETECTION_DTYPE array. A pixel reported more
+        than once keeps its highest severity record.
+        """
+        indices = detections["y"].astype(np.int64) * width + detections["x"]
+        # Highest severity first, then the first occurrence of each pixel wins
+        order = np.argsort(-detections["severity"], kind="stable")
+        unique, first = np.unique(indices[order], return_index=True)
+        picked = order[first]
+        return cls(width, height, pattern, unique, detections["kind"][picked],
+                   detections["severity"][picked], meta)
+
+    @classmethod
+    def from_result(cls, result, width, height, algorithm_name, params):
+        """
+        Map of an Algorithm.run result, None if it has no "detections".
+        The header records the algorithm and the params it ran with.
+        """
+        detections = result.get("detections")
+        if detections is None:
+            return None
+        meta = {"algorithm": algorithm_name, "params": params}
+        return cls.from_detections(detections, width, height, params.get("pattern", "Mono/None"), meta)
+
+    @classmethod
+    def from_mask(cls, mask, pattern="Mono/None", meta=None):
+        height, width = mask.shape
+        return cls(width, height, pattern, np.flatnonzero(mask), meta=meta)
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def x(self):
+        return self.indices % self.width
+
+    @property
+    def y(self):
+        return self.indices // self.width
+
+    def to_detections(self):
+        """Returns the map as a DETECTION_DTYPE array (row-major order)."""
+        x, y = self.x, self.y
+        if self.pattern in BAYER_PATTERNS:
+            channel = (y % 2) * 2 + x % 2
+        else:
+            channel = -1
+        return make_detections(x, y, channel, self.severity, self.kind)
+
+    def to_mask(self):
+        mask = np.zeros(self.height * self.width, dtype=bool)
+        mask[self.indices] = True
+        return mask.reshape(self.height, self.width)
+
+    def header(self):
+        return {
+            "version": DEFECT_MAP_VERSION,
+            "width": self.width,
+            "height": self.height,
+            "pattern": self.pattern,
+            "count": len(self),
+            "meta": self.meta
+        }
+
+    def save(self, path):
+        """Writes an uncompressed .npz: JSON header + index, kind, severity columns."""
+        # uint32 indices cover frames up to 4 Gpixel
+        index_dtype = np.uint32 if self.width * self.height <= np.iinfo(np.uint32).max else np.uint64
+        np.savez(path,
+                 header=np.array(json.dumps(self.header(), default=str)),
+                 indices=self.indices.astype(index_dtype),
+                 kind=self.kind,
+                 severity=self.severity)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            if header.get("version", 0) > DEFECT_MAP_VERSION:
+                raise ValueError(f"Defect map version {header['version']} is newer than supported")
+            return cls(header["width"], header["height"], header.get("pattern", "Mono/None"),
+                       data["indices"].astype(np.int64), data["kind"], data["severity"], header.get("meta"))
+
+    def check_compatible(self, other):
+        if (self.width, self.height) != (other.width, other.height):
+            raise ValueError(f"Defect maps differ in size: {self.width}x{self.height} vs {other.width}x{other.height}")
+
+    def subset(self, keep, meta=None):
+        """New map with the entries selected by the bool/index array keep."""
+        return DefectMap(self.width, self.height, self.pattern, self.indices[keep], self.kind[keep],
+                         self.severity[keep], self.meta if meta is None else meta)
+
+    def union(self, other):
+        """Pixels in either map; kind/severity come from self where both have the pixel."""
+        self.check_compatible(other)
+        extra = other.subset(~np.isin(other.indices, self.indices, assume_unique=True))
+        indices = np.concatenate([self.indices, extra.indices])
+        order = np.argsort(indices, kind="stable")
+        return DefectMap(self.width, self.height, self.pattern, indices[order],
+                         np.concatenate([self.kind, extra.kind])[order],
+                         np.concatenate([self.severity, extra.severity])[order], self.meta)
+
+    def intersection(self, other):
+        """Pixels in both maps (attributes from self)."""
+        self.check_compatible(other)
+        return self.subset(np.isin(self.indices, other.indices, assume_unique=True))
+
+    def difference(self, other):
+        """Pixels in self but not in other."""
+        self.check_compatible(other)
+        return self.subset(~np.isin(self.indices, other.indices, assume_unique=True))
+
+    def diff(self, other):
+        """
+        Compares a newer map `other` against self.
+        RETURNS: (added, removed, common) DefectMaps.
+        """
+        return other.difference(self), self.difference(other), self.intersection(other)
+
+    def correct(self, image_data):
+        """
+        Returns a copy of image_data with every mapped pixel replaced by the
+        median of its 8 same-color neighbors (2 px apart for Bayer data,
+        see median.neighbor_median_at; at the border only the neighbors
+        inside the frame count). Only the N mapped pixels are gathered,
+        (N, 8) work instead of a full-frame filter.
+        """
+        if image_data.shape != (self.height, self.width):
+            raise ValueError(f"Image is {image_data.shape[1]}x{image_data.shape[0]}, map is {self.width}x{self.height}")
+        corrected = np.array(image_data, copy=True)
+        if not len(self):
+            return corrected
+        
+        step = 2 if self.pattern in BAYER_PATTERNS else 1
+        x, y = self.x, self.y
+        median = neighbor_median_at(image_data, x, y, step)
+        has_neighbors = ~np.isnan(median)
+        x, y, median = x[has_neighbors], y[has_neighbors], median[has_neighbors]
+        if image_data.dtype.kind in "iu":
+            info = np.iinfo(image_data.dtype)
+            median = np.clip(np.rint(median), info.min, info.max)
+        corrected[y, x] = median
+        return corrected
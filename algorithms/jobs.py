@@ -0,0 +1,150 @@
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class JobCancelled(Exception):
+    """Raised inside Algorithm.run when its job has been cancelled."""
+    pass
+
+class JobContext:
+    """
+    Handed to Algorithm.run(..., context=...) by the job runner.
+    Algorithms call check_cancelled() at convenient points (between bands,
+    frames, channels) and report progress either directly with report() or
+    as units of work with set_total() / advance(), which is safe to call
+    from several threads at once.
+    """
+    def __init__(self, progress_callback=None):
+        self.progress_callback = progress_callback
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._total = 0
+        self._done = 0
+        self._text = ""
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def report(self, fraction, text=""):
+        """Reports progress (0..1) and checks for cancellation."""
+        self.check_cancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(min(max(fraction, 0.0), 1.0), text)
+
+    def set_total(self, total, text=""):
+        with self._lock:
+            self._total = max(total, 1)
+            self._done = 0
+            self._text = text
+        self.report(0.0, text)
+
+    def advance(self, amount=1):
+        with self._lock:
+            self._done += amount
+            fraction = self._done / self._total if self._total else 0.0
+        self.report(fraction, self._text)
+
+def accepts_context(func):
+    """True if func takes a `context` argument (Algorithm.run of newer algorithms)."""
+    try:
+        return "context" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+class Job:
+    """One submitted algorithm run: its future, context and inputs."""
+    def __init__(self, algo_name, data, params, context, future=None):
+        self.algo_name = algo_name
+        self.data = data
+        self.params = params
+        self.context = context
+        self.future = future
+
+    def cancel(self):
+        self.context.cancel()
+        if self.future is not None:
+            self.future.cancel() # Only succeeds while still queued
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    @property
+    def cancelled(self):
+        return self.context.cancelled
+
+class JobRunner:
+    """
+    Runs algorithms from an AlgorithmManager on a worker pool.
+
+    submit() returns immediately; the callbacks are invoked on the worker
+    thread (a GUI bridges them to its own thread). Jobs submitted with the
+    same `key` (e.g. the canvas they are for) supersede each other: the
+    stale one is cancelled and its callbacks are not called anymore.
+    """
+    def __init__(self, manager, max_workers=2):
+        self.manager = manager
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="algorithm-job")
+        self.jobs = {} # key -> latest Job
+        self.lock = threading.Lock()
+
+    def submit(self, algo_name, data, params, key=None, on_progress=None, on_done=None, on_error=None,
+               on_cancelled=None):
+        algo = self.manager.get_algorithm(algo_name)
+        if algo is None:
+            raise ValueError(f"Unknown algorithm: {algo_name}")
+
+        job = Job(algo_name, data, dict(params), JobContext(on_progress))
+        with self.lock:
+            previous = self.jobs.get(key)
+            if previous is not None:
+                previous.cancel()
+            self.jobs[key] = job
+
+        def work():
+            try:
+                job.context.check_cancelled()
+                if accepts_context(algo.run):
+                    result = algo.run(data, job.params, context=job.context)
+                else:
+                    result = algo.run(data, job.params)
+                job.context.check_cancelled()
+            except JobCancelled:
+                if on_cancelled is not None:
+                    on_cancelled()
+                return None
+            except Exception as e:
+                if on_error is not None and not job.cancelled:
+                    on_error(e)
+                return None
+            finally:
+                with self.lock:
+                    if self.jobs.get(key) is job:
+                        del self.jobs[key]
+            if on_done is not None:
+                on_done(result)
+            return result
+
+        job.future = self.executor.submit(work)
+        return job
+
+    def cancel(self, key=None):
+        with self.lock:
+            job = self.jobs.pop(key, None)
+        if job is not None:
+            job.cancel()
+
+    def shutdown(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+            self.jobs.clear()
+        for job in jobs:
+            job.cancel()
+        self.executor.shutdown(wait=False)
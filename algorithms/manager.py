@@ -1,6 +1,7 @@
 from .base import Algorithm
 from .bad_pixel import BadPixelDetectionAlgorithm
 from .bad_line import BadLineDetectionAlgorithm
+from .temporal import TemporalDefectDetectionAlgorithm
 
 class AlgorithmManager:
     """
@@ -14,6 +15,7 @@ class AlgorithmManager:
         """Registers built-in algorithms."""
         self.register(BadPixelDetectionAlgorithm())
         self.register(BadLineDetectionAlgorithm())
+        self.register(TemporalDefectDetectionAlgorithm())
 
     def register(self, algorithm: Algorithm):
         """Registers an algorithm instance."""
@@ -0,0 +1,110 @@
+import numpy as np
+
+# Batcher odd-even merge sort network for 8 inputs, pruned to the 17
+# compare-exchanges that decide sorted positions 3 and 4 (the two middle
+# values, whose mean is the median of 8).
+MEDIAN8_NETWORK = [
+    (0, 1), (2, 3), (4, 5), (6, 7),
+    (0, 2), (1, 3), (4, 6), (5, 7),
+    (1, 2), (5, 6),
+    (0, 4), (1, 5), (2, 6), (3, 7),
+    (2, 4), (3, 5),
+    (3, 4)
+]
+
+# (dy, dx) of the 8 neighbors, network input order
+NEIGHBOR_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# Scratch memory targeted per band (bytes)
+TILE_BUDGET = 8 * 1024 * 1024
+
+def median_dtype(dtype):
+    """Float type that holds the mean of two middle values exactly."""
+    dtype = np.dtype(dtype)
+    if dtype.kind in "ui" and dtype.itemsize <= 2:
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+def iter_neighbor_median(plane: np.ndarray, tile_rows=None):
+    """
+    Yields (row_start, row_end, median) bands covering the interior of plane.
+    median[i, j] is the median of the 8 neighbors of plane[row_start + 1 + i, 1 + j]
+    (same values np.median over the 8 shifted views gives), for rows
+    row_start..row_end-1 of the (H-2, W-2) interior.
+
+    The 8 neighbors are sorted with a min/max network in a scratch buffer
+    that is reused between bands, so extra memory is O(tile_rows * W).
+    The yielded array is only valid until the next iteration.
+    """
+    h, w = plane.shape
+    out_h, out_w = h - 2, w - 2
+    if out_h <= 0 or out_w <= 0:
+        return
+    
+    if tile_rows is None:
+        tile_rows = max(16, TILE_BUDGET // (10 * out_w * plane.dtype.itemsize))
+    tile_rows = min(tile_rows, out_h)
+    
+    # 8 sort lanes + 1 spare for out-of-place compare-exchange
+    scratch = np.empty((9, tile_rows, out_w), dtype=plane.dtype)
+    med = np.empty((tile_rows, out_w), dtype=median_dtype(plane.dtype))
+    
+    for r0 in range(0, out_h, tile_rows):
+        r1 = min(r0 + tile_rows, out_h)
+        n = r1 - r0
+        lanes = [scratch[k, :n] for k in range(9)]
+        
+        # Neighbor views of the band (interior row r is plane row r + 1)
+        views = [plane[1 + dy + r0:1 + dy + r1, 1 + dx:1 + dx + out_w] for dy, dx in NEIGHBOR_OFFSETS]
+        
+        # First layer reads straight from the views, no copy into scratch
+        for i in range(0, 8, 2):
+            np.minimum(views[i], views[i + 1], out=lanes[i])
+            np.maximum(views[i], views[i + 1], out=lanes[i + 1])
+        
+        spare = lanes[8]
+        lanes = lanes[:8]
+        for i, j in MEDIAN8_NETWORK[4:]:
+            np.minimum(lanes[i], lanes[j], out=spare)
+            np.maximum(lanes[i], lanes[j], out=lanes[j])
+            lanes[i], spare = spare, lanes[i]
+        
+        band = med[:n]
+        np.add(lanes[3], lanes[4], out=band, dtype=band.dtype)
+        band *= 0.5
+        yield r0, r1, band
+
+def neighbor_median(plane: np.ndarray, tile_rows=None) -> np.ndarray:
+    """
+    Returns the (H-2, W-2) median of the 8 neighbors of every interior pixel.
+    """
+    h, w = plane.shape
+    out = np.empty((max(h - 2, 0), max(w - 2, 0)), dtype=median_dtype(plane.dtype))
+    for r0, r1, band in iter_neighbor_median(plane, tile_rows):
+        out[r0:r1] = band
+    return out
+
+def neighbor_median_at(image_data: np.ndarray, xs, ys, step=1) -> np.ndarray:
+    """
+    Returns the float64 median of the 8 neighbors `step` px away (the same
+    Bayer color with step 2) of each pixel xs, ys; only those N pixels are
+    gathered. Neighbors outside the frame are left out, so a border pixel
+    takes the median of the 3 or 5 that exist. NaN for a pixel without any.
+    """
+    h, w = image_data.shape
+    xs = np.asarray(xs, dtype=np.intp)
+    ys = np.asarray(ys, dtype=np.intp)
+    neighbors = np.full((len(xs), 8), np.nan)
+    for i, (dy, dx) in enumerate(NEIGHBOR_OFFSETS):
+        ny = ys + dy * step
+        nx = xs + dx * step
+        valid = (ny >= 0) & (ny < h) & (nx >= 0) & (nx < w)
+        neighbors[valid, i] = image_data[ny[valid], nx[valid]]
+    
+    # NaN sorts last: the k valid values lead each row
+    neighbors.sort(axis=1)
+    count = 8 - np.isnan(neighbors).sum(axis=1)
+    rows = np.arange(len(xs))
+    lo = neighbors[rows, np.maximum(count - 1, 0) // 2]
+    hi = neighbors[rows, count // 2]
+    return np.where(count > 0, (lo + hi) / 2, np.nan)
@@ -0,0 +1,235 @@
+from .base import (Algorithm, make_detections, BAYER_PATTERNS, BAYER_OFFSETS,
+                   KIND_HOT, KIND_DARK, KIND_STUCK, KIND_FLICKER, KIND_RTS, DETECTION_KINDS)
+import numpy as np
+
+# Gaussian-consistent MAD scale
+MAD_SCALE = 1.4826
+
+class TemporalStats:
+    """
+    Streaming per-pixel statistics over a sequence of (H, W) frames.
+
+    One update() per frame, Welford's algorithm for mean / variance plus
+    min, max, the sum of squared frame-to-frame differences and the number
+    of frame-to-frame jumps larger than `jump`.
+    All state (and the scratch space for an update) is allocated once, so
+    memory is O(H*W) no matter how many frames go through.
+    """
+    def __init__(self, shape, dtype, jump):
+        self.count = 0
+        self.jump = jump
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64) # Sum of squared deviations from the mean
+        self.min = np.zeros(shape, dtype=dtype)
+        self.max = np.zeros(shape, dtype=dtype)
+        self.transitions = np.zeros(shape, dtype=np.uint32)
+        self.successive_sq = np.zeros(shape, dtype=np.float64)
+        self.previous = np.zeros(shape, dtype=dtype)
+        self.allocate_scratch()
+
+    def allocate_scratch(self):
+        shape = self.mean.shape
+        self._delta = np.empty(shape, dtype=np.float64)
+        self._scratch = np.empty(shape, dtype=np.float64)
+        self._jumped = np.empty(shape, dtype=bool)
+
+    def release_scratch(self):
+        """Frees the per-update scratch space once no more frames are coming."""
+        self._delta = self._scratch = self._jumped = None
+
+    def update(self, frame):
+        frame = np.asarray(frame)
+        if self._delta is None:
+            self.allocate_scratch()
+        self.count += 1
+        delta, scratch = self._delta, self._scratch
+
+        # delta = x - mean_old; mean += delta / n; m2 += delta * (x - mean_new)
+        np.subtract(frame, self.mean, out=delta)
+        np.divide(delta, self.count, out=scratch)
+        self.mean += scratch
+        np.subtract(frame, self.mean, out=scratch)
+        scratch *= delta
+        self.m2 += scratch
+
+        if self.count == 1:
+            self.min[...] = frame
+            self.max[...] = frame
+        else:
+            np.minimum(self.min, frame, out=self.min)
+            np.maximum(self.max, frame, out=self.max)
+            # Level jumps since the previous frame (telegraph / blinking pixels)
+            np.subtract(frame, self.previous, out=scratch, dtype=np.float64) # No unsigned wraparound
+            np.multiply(scratch, scratch, out=delta)
+            self.successive_sq += delta
+            np.abs(scratch, out=scratch)
+            np.greater(scratch, self.jump, out=self._jumped)
+            self.transitions += self._jumped
+        self.previous[...] = frame
+
+    def variance(self):
+        """Unbiased per-pixel variance (zero before two frames were seen)."""
+        if self.count < 2:
+            return np.zeros_like(self.m2)
+        return self.m2 / (self.count - 1)
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+    def von_neumann_ratio(self):
+        """
+        Mean squared successive difference over variance: about 2 for
+        independent noise, well below 1 when a pixel dwells on discrete
+        levels for several frames (random telegraph signal).
+        """
+        variance = self.variance()
+        msd = self.successive_sq / max(self.count - 1, 1)
+        return np.divide(msd, variance, out=np.full_like(variance, 2.0), where=variance > 0)
+
+def robust_zscore(values, floor):
+    """
+    (values - median) / (1.4826 * MAD): distance from the bulk in sigmas,
+    insensitive to the outliers being looked for. `floor` bounds the scale
+    from below so near-constant data (MAD 0) does not flag rounding noise.
+    """
+    median = np.median(values)
+    mad = np.median(np.abs(values - median))
+    return (values - median) / max(MAD_SCALE * mad, floor)
+
+class TemporalDefectDetectionAlgorithm(Algorithm):
+    temporal = True
+
+    @property
+    def name(self) -> str:
+        return "Temporal Defect Detection"
+
+    @property
+    def description(self) -> str:
+        return ("Accumulates per-pixel mean, noise, min/max and level jumps over all frames of a "
+                "sequence and flags hot, dark, stuck, flickering and RTS (random telegraph) pixels "
+                "that are outliers for their Bayer channel.")
+
+    def get_parameters(self) -> dict:
+        return {
+            "threshold": {
+                "type": "float",
+                "default": 6.0,
+                "min": 1.0,
+                "max": 100.0,
+                "label": "Threshold (robust sigmas)",
+                "slider": True
+            },
+            "jump": {
+                "type": "int",
+                "default": 20,
+                "min": 1,
+                "max": 65535,
+                "label": "RTS Jump (DN)"
+            },
+            "max_frames": {
+                "type": "int",
+                "default": 0,
+                "min": 0,
+                "max": 1000000,
+                "label": "Max Frames (0 = all)"
+            }
+        }
+
+    def accumulate(self, frames, jump, max_frames=0, context=None):
+        """Runs every frame of `frames` (len() + indexing) through a TemporalStats."""
+        count = len(frames)
+        if max_frames:
+            count = min(count, max_frames)
+        if count < 2:
+            raise ValueError("Temporal detection needs a sequence of at least 2 frames.")
+
+        first = np.asarray(frames[0])
+        stats = TemporalStats(first.shape, first.dtype, jump)
+        stats.update(first)
+        for index in range(1, count):
+            if context is not None:
+                context.report(index / count, f"Frame {index + 1}/{count}")
+            stats.update(frames[index])
+        stats.release_scratch()
+        return stats
+
+    def classify(self, mean, std, value_range, transitions, ratio, threshold):
+        """
+        Classifies the pixels of one channel plane from their temporal stats.
+        Returns (kind, severity) arrays, kind -1 = not flagged. When several
+        classes apply the most specific wins: stuck > rts / flicker > hot/dark.
+        Noisy pixels (std or jump count outliers) are RTS when their samples
+        are correlated in time (von Neumann ratio below 1), else flicker.
+        """
+        z_mean = robust_zscore(mean, floor=0.1)
+        z_std = robust_zscore(std, floor=0.1)
+        z_trans = robust_zscore(transitions.astype(np.float64), floor=1.0)
+
+        kind = np.full(mean.shape, -1, dtype=np.int8)
+        severity = np.zeros(mean.shape, dtype=np.float32)
+
+        def assign(mask, k, score):
+            kind[mask] = k
+            severity[mask] = score[mask]
+
+        assign(z_mean < -threshold, KIND_DARK, -z_mean)
+        assign(z_mean > threshold, KIND_HOT, z_mean)
+        noisy = (z_std > threshold) | ((z_trans > threshold) & (transitions >= 2))
+        score = np.maximum(z_std, z_trans)
+        telegraph = (ratio < 1.0) & (transitions >= 2)
+        assign(noisy & ~telegraph, KIND_FLICKER, score)
+        assign(noisy & telegraph, KIND_RTS, score)
+        # Never changes while the rest of the channel does
+        if np.median(value_range) > 0:
+            assign(value_range == 0, KIND_STUCK, np.abs(z_mean))
+        return kind, severity
+
+    def run(self, image_data, params: dict, context=None):
+        threshold = params.get("threshold", 6.0)
+        jump = params.get("jump", 20)
+        max_frames = params.get("max_frames", 0)
+        pattern = params.get("pattern", "Mono/None")
+
+        # The stats only depend on jump / max_frames: a threshold change
+        # on the same sequence skips the pass over the frames
+        stage = ("temporal_stats", jump, max_frames)
+        stats = self.cache.get(image_data, None, stage) if self.cache is not None else None
+        if stats is None:
+            stats = self.accumulate(image_data, jump, max_frames, context)
+            if self.cache is not None:
+                self.cache.put(image_data, None, stage, stats)
+        std = stats.std()
+        ratio = stats.von_neumann_ratio()
+        value_range = stats.max.astype(np.int64) - stats.min
+
+        height, width = stats.mean.shape
+        full_mask = np.zeros((height, width), dtype=bool)
+        detections = []
+
+        # Outliers are judged against their own Bayer channel (channels
+        # differ in gain and dark current), whole plane for mono
+        offsets = BAYER_OFFSETS if pattern in BAYER_PATTERNS else [None]
+        for offset in offsets:
+            dy, dx = offset if offset else (0, 0)
+            step = 2 if offset else 1
+            view = (slice(dy, None, step), slice(dx, None, step))
+
+            kind, severity = self.classify(stats.mean[view], std[view], value_range[view],
+                                           stats.transitions[view], ratio[view], threshold)
+            y_idxs, x_idxs = np.nonzero(kind >= 0)
+            full_mask[view] = kind >= 0
+            channel = dy * 2 + dx if offset else -1
+            detections.append(make_detections(x_idxs * step + dx, y_idxs * step + dy, channel,
+                                              severity[y_idxs, x_idxs], kind[y_idxs, x_idxs]))
+
+        detections = np.concatenate(detections)
+        detections = detections[np.lexsort((detections["x"], detections["y"]))]
+
+        counts = np.bincount(detections["kind"], minlength=len(DETECTION_KINDS))
+        summary = ", ".join(f"{counts[k]} {DETECTION_KINDS[k]}" for k in
+                            (KIND_HOT, KIND_DARK, KIND_STUCK, KIND_FLICKER, KIND_RTS))
+        return {
+            "detections": detections,
+            "mask": full_mask,
+            "message": f"Detected {len(detections)} temporal defects over {stats.count} frames ({summary})."
+        }
@@ -0,0 +1,361 @@
+"""
+Headless batch runner: applies registered algorithms to many RAW files.
+
+Does not import PyQt, so it starts fast and runs on display-less servers.
+
+Example:
+    python batch.py captures/ --width 1920 --height 1080 --bit-depth 10 --pattern RGGB \
+        --algorithm "Bad Pixel Detection" --param threshold=200 \
+        --workers 8 --format csv --output results.csv
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from algorithms.base import DETECTION_DTYPE, DETECTION_KINDS
+from algorithms.defect_map import DefectMap
+from algorithms.manager import AlgorithmManager
+from utils.raw_source import RawSource
+from utils.unpack import PACKED_FORMATS
+
+RAW_EXTENSIONS = (".raw", ".bin", ".bayer")
+
+def collect_files(inputs):
+    """Expands files, directories (RAW extensions, recursive) and glob patterns."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in names if n.lower().endswith(RAW_EXTENSIONS))
+        elif any(c in item for c in "*?["):
+            files.extend(glob.glob(item, recursive=True))
+        else:
+            files.append(item)
+    return sorted(set(files))
+
+def parse_param_value(value, spec):
+    """Converts a command-line string according to a get_parameters() spec."""
+    param_type = spec.get("type", "str") if spec else "str"
+    if param_type == "int":
+        return int(value)
+    if param_type == "float":
+        return float(value)
+    if param_type == "bool":
+        return value.lower() in ("1", "true", "yes", "on")
+    return value
+
+def build_jobs(manager, names, raw_params, pattern):
+    """
+    Resolves algorithm names and their params: defaults, then --param
+    overrides for every algorithm declaring that key. A key no selected
+    algorithm declares (e.g. a typo) is a ValueError.
+    """
+    jobs = []
+    used = set()
+    for name in names:
+        algo = manager.get_algorithm(name)
+        if algo is None:
+            raise ValueError(f"Unknown algorithm: {name}")
+        spec = algo.get_parameters()
+        params = {k: v.get("default") for k, v in spec.items()}
+        # One process per file already, don't fan out again inside it
+        if "parallel" in params:
+            params["parallel"] = "Off"
+        for key, value in raw_params.items():
+            if key in spec:
+                params[key] = parse_param_value(value, spec[key])
+                used.add(key)
+        params["pattern"] = pattern
+        jobs.append((name, params))
+    
+    unknown = sorted(set(raw_params) - used)
+    if unknown:
+        raise ValueError(f"No selected algorithm takes parameter(s): {', '.join(unknown)}")
+    return jobs
+
+def process_file(file_path, load_params, jobs, tiled=False, memory_budget=None):
+    """
+    Loads one file and runs every (algorithm name, params) job on it.
+    Runs in a worker process; returns plain picklable data.
+    record["error"] is set when the file cannot be loaded; an algorithm
+    that fails only sets the "error" of its own result.
+    """
+    record = {"file": file_path, "error": None, "results": []}
+    try:
+        source = RawSource(file_path)
+        raw_data = source.raw(load_params)
+    except Exception as e:
+        record["error"] = str(e)
+        return record
+    
+    manager = AlgorithmManager()
+    for name, params in jobs:
+        entry = {"algorithm": name, "error": None, "message": "", "detections": None, "overlays": []}
+        try:
+            algo = manager.get_algorithm(name)
+            if algo.temporal:
+                # Streams every frame of the file (frame 0 alone for the others)
+                result = algo.run(source.sequence(load_params), params)
+            elif tiled:
+                result = algo.run_tiled(raw_data, params, memory_budget=memory_budget)
+            else:
+                result = algo.run(np.asarray(raw_data), params)
+            entry["message"] = result.get("message", "")
+            entry["detections"] = result.get("detections")
+            entry["overlays"] = result.get("overlays", [])
+        except Exception as e:
+            entry["error"] = str(e)
+        record["results"].append(entry)
+    return record
+
+def record_failed(record):
+    """True if the file or any of its algorithms failed."""
+    return record["error"] is not None or any(r["error"] is not None for r in record["results"])
+
+def result_count(result):
+    if result["detections"] is not None:
+        return int(len(result["detections"]))
+    return len(result["overlays"])
+
+class JsonlWriter:
+    """One JSON object per (file, algorithm), detections as columns."""
+    def __init__(self, path):
+        self.f = open(path, "w") if path != "-" else sys.stdout
+
+    def write(self, record):
+        if record["error"]:
+            self.f.write(json.dumps({"file": record["file"], "error": record["error"]}) + "\n")
+            return
+        for result in record["results"]:
+            row = {
+                "file": record["file"],
+                "algorithm": result["algorithm"],
+                "count": result_count(result),
+                "message": result["message"]
+            }
+            if result["error"]:
+                row["error"] = result["error"]
+            dets = result["detections"]
+            if dets is not None:
+                row["detections"] = {name: dets[name].tolist() for name in dets.dtype.names}
+            if result["overlays"]:
+                row["overlays"] = [{"type": o["type"], "coords": [int(c) for c in o["coords"]]}
+                                   for o in result["overlays"]]
+            self.f.write(json.dumps(row) + "\n")
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+class CsvWriter:
+    """One row per detection / overlay; files with nothing found get one empty row."""
+    FIELDS = ["file", "algorithm", "type", "x", "y", "channel", "severity", "x2", "y2", "kind", "error"]
+
+    def __init__(self, path):
+        self.f = open(path, "w", newline="") if path != "-" else sys.stdout
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(self.FIELDS)
+
+    def write(self, record):
+        file_path = record["file"]
+        if record["error"]:
+            self.writer.writerow([file_path, "", "", "", "", "", "", "", "", "", record["error"]])
+            return
+        for result in record["results"]:
+            name = result["algorithm"]
+            if result["error"]:
+                self.writer.writerow([file_path, name, "", "", "", "", "", "", "", "", result["error"]])
+                continue
+            dets = result["detections"]
+            if dets is not None and len(dets):
+                n = len(dets)
+                blank = [""] * n
+                kinds = np.array(DETECTION_KINDS)[dets["kind"]].tolist()
+                self.writer.writerows(zip([file_path] * n, [name] * n, ["pixel"] * n,
+                                          dets["x"].tolist(), dets["y"].tolist(), dets["channel"].tolist(),
+                                          dets["severity"].tolist(), blank, blank, kinds, blank))
+            for o in result["overlays"]:
+                c = [int(v) for v in o["coords"]]
+                row = [file_path, name, o["type"], c[0], c[1], "", ""]
+                row += [c[2], c[3]] if len(c) == 4 else ["", ""]
+                self.writer.writerow(row + ["", ""])
+            if result_count(result) == 0:
+                self.writer.writerow([file_path, name, "", "", "", "", "", "", "", "", ""])
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+class NpzWriter:
+    """
+    Columnar output: one array per field over all detections of all files,
+    with file/algorithm index columns and a per-(file, algorithm) summary.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.files = []
+        self.algorithms = []
+        self.errors = []
+        self.columns = []
+        self.summary = [] # (file_index, algorithm_index, count)
+        self.summary_errors = [] # Per summary row, "" if the algorithm ran
+
+    def write(self, record):
+        file_index = len(self.files)
+        self.files.append(record["file"])
+        self.errors.append(record["error"] or "")
+        for result in record["results"]:
+            if result["algorithm"] not in self.algorithms:
+                self.algorithms.append(result["algorithm"])
+            algo_index = self.algorithms.index(result["algorithm"])
+            self.summary.append((file_index, algo_index, result_count(result)))
+            self.summary_errors.append(result["error"] or "")
+            dets = result["detections"]
+            if dets is not None and len(dets):
+                self.columns.append((file_index, algo_index, dets))
+
+    def close(self):
+        if self.columns:
+            dets = np.concatenate([d for _, _, d in self.columns])
+            file_col = np.concatenate([np.full(len(d), f, np.int32) for f, _, d in self.columns])
+            algo_col = np.concatenate([np.full(len(d), a, np.int16) for _, a, d in self.columns])
+        else:
+            dets = np.empty(0, dtype=DETECTION_DTYPE)
+            file_col = np.empty(0, np.int32)
+            algo_col = np.empty(0, np.int16)
+        summary = np.array(self.summary, dtype=np.int64).reshape(-1, 3)
+        np.savez_compressed(
+            self.path,
+            files=np.array(self.files), algorithms=np.array(self.algorithms), errors=np.array(self.errors),
+            file_index=file_col, algorithm_index=algo_col,
+            **{name: dets[name] for name in dets.dtype.names},
+            summary_file_index=summary[:, 0], summary_algorithm_index=summary[:, 1], summary_count=summary[:, 2],
+            summary_error=np.array(self.summary_errors, dtype=str)
+        )
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "npz": NpzWriter}
+
+def defect_map_path(directory, file_path, algorithm):
+    # <file name>.<algorithm_name>.npz, e.g. SN0042.raw.bad_pixel_detection.npz
+    slug = "".join(c if c.isalnum() else "_" for c in algorithm.lower())
+    return os.path.join(directory, f"{os.path.basename(file_path)}.{slug}.npz")
+
+def write_defect_maps(directory, record, load_params, jobs):
+    """Saves one DefectMap per (file, algorithm) result that has detections."""
+    if record["error"]:
+        return
+    params_by_name = dict(jobs)
+    for result in record["results"]:
+        if result["error"]:
+            continue
+        defect_map = DefectMap.from_result(result, load_params["width"], load_params["height"],
+                                           result["algorithm"], params_by_name[result["algorithm"]])
+        if defect_map is not None:
+            defect_map.meta["source"] = record["file"]
+            defect_map.save(defect_map_path(directory, record["file"], result["algorithm"]))
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run RAW Viewer algorithms over many RAW files without the GUI.")
+    parser.add_argument("inputs", nargs="*", help="RAW files, directories or glob patterns")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--bit-depth", type=int, default=10, choices=[8, 10, 12, 14, 16])
+    parser.add_argument("--packing", default="None", choices=["None"] + list(PACKED_FORMATS.keys()))
+    parser.add_argument("--stride", type=int, default=0, help="Bytes per line including padding (0 = none)")
+    parser.add_argument("--frame-header", type=int, default=0, help="Bytes before each frame of a multi-frame file")
+    parser.add_argument("--frame-stride", type=int, default=0, help="Bytes from one frame to the next (0 = frame size)")
+    parser.add_argument("--pattern", default="Mono/None", choices=["Mono/None", "RGGB", "BGGR", "GRBG", "GBRG"])
+    parser.add_argument("-a", "--algorithm", action="append", default=[], help="Algorithm name (repeatable)")
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="Algorithm parameter, applied to every algorithm declaring it (repeatable)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--format", default="jsonl", choices=list(WRITERS.keys()))
+    parser.add_argument("-o", "--output", default="-", help="Output file ('-' = stdout, not for npz)")
+    parser.add_argument("--tiled", action="store_true", help="Run algorithms in bounded-memory row bands")
+    parser.add_argument("--memory-budget", type=int, default=256, help="MB per worker for --tiled")
+    parser.add_argument("--defect-maps", metavar="DIR", help="Also save a defect map (.npz) per file and algorithm")
+    parser.add_argument("--list", action="store_true", help="List available algorithms and exit")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    manager = AlgorithmManager()
+    
+    if args.list:
+        for name in manager.get_algorithm_names():
+            algo = manager.get_algorithm(name)
+            keys = ", ".join(algo.get_parameters().keys())
+            print(f"{name}: {algo.description} [params: {keys}]")
+        return 0
+    
+    if not args.algorithm:
+        parser.error("at least one --algorithm is required (see --list)")
+    if args.format == "npz" and args.output == "-":
+        parser.error("--format npz needs --output")
+    
+    raw_params = {}
+    for item in args.param:
+        key, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"--param expects KEY=VALUE, got {item!r}")
+        raw_params[key.strip()] = value.strip()
+    
+    try:
+        jobs = build_jobs(manager, args.algorithm, raw_params, args.pattern)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    files = collect_files(args.inputs)
+    if not files:
+        parser.error("no input files")
+    
+    load_params = {
+        "width": args.width,
+        "height": args.height,
+        "bit_depth": args.bit_depth,
+        "packing": args.packing,
+        "stride": args.stride,
+        "frame_header": args.frame_header,
+        "frame_stride": args.frame_stride
+    }
+    budget = args.memory_budget * 1024 * 1024
+    
+    if args.defect_maps:
+        os.makedirs(args.defect_maps, exist_ok=True)
+    
+    writer = WRITERS[args.format](args.output)
+    failures = 0
+    try:
+        if args.workers <= 1:
+            records = (process_file(f, load_params, jobs, args.tiled, budget) for f in files)
+            for record in records:
+                failures += record_failed(record)
+                writer.write(record)
+                if args.defect_maps:
+                    write_defect_maps(args.defect_maps, record, load_params, jobs)
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                n = len(files)
+                records = pool.map(process_file, files, [load_params] * n, [jobs] * n,
+                                   [args.tiled] * n, [budget] * n,
+                                   chunksize=max(1, min(16, n // (args.workers * 4))))
+                for record in records:
+                    failures += record_failed(record)
+                    writer.write(record)
+                    if args.defect_maps:
+                        write_defect_maps(args.defect_maps, record, load_params, jobs)
+    finally:
+        writer.close()
+    
+    print(f"Processed {len(files)} files, {failures} failed.", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Performance benchmarks for the loader, colorization, algorithms and canvas.
+
+    python benchmarks/bench.py run --sizes 1080p,4k -o before.json
+    python benchmarks/bench.py run --sizes 1080p,4k -o after.json
+    python benchmarks/bench.py compare before.json after.json --threshold 0.15
+
+Each case records the best wall time over --repeat runs and the peak memory
+allocated through Python/NumPy (tracemalloc) during one run. Canvas cases
+render an ImageCanvas offscreen and are skipped when PyQt6 is unavailable;
+their peak memory only covers the Python side, not Qt's own buffers.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_sample import make_sample_raw
+from utils.image_loader import load_raw_image, apply_bayer_mask
+from algorithms.bad_pixel import BadPixelDetectionAlgorithm
+from algorithms.bad_line import BadLineDetectionAlgorithm
+
+SIZES = {
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "12mp": (4000, 3000),
+    "48mp": (8000, 6000),
+    "100mp": (12000, 8400)
+}
+
+ZOOM_LEVELS = [0.1, 0.5, 1.0, 4.0, 25.0]
+
+def measure(func, repeat):
+    """Returns (best seconds over repeat runs, peak traced bytes of one run)."""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best, peak
+
+def get_canvas_factory():
+    """Returns a function building an offscreen ImageCanvas, or None without PyQt6."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+        from PyQt6.QtGui import QImage
+        from PyQt6.QtCore import QPoint
+        from ui.canvas import ImageCanvas
+        from ui.workers import to_qimage
+    except ImportError:
+        return None
+    
+    app = QApplication.instance() or QApplication([])
+    
+    def make(display_data, raw_data, pattern, scale):
+        canvas = ImageCanvas()
+        canvas.resize(1600, 1000)
+        canvas.set_image(to_qimage(display_data), raw_data, pattern)
+        # Look at the image center
+        h, w = raw_data.shape
+        canvas.set_view_params(scale, QPoint(int(800 - w / 2 * scale), int(500 - h / 2 * scale)))
+        target = QImage(canvas.size(), QImage.Format.Format_RGB32)
+        
+        def paint():
+            canvas.render(target) # Goes through paintEvent
+        return paint, (app, canvas, target)
+    return make
+
+def run_benchmarks(sizes, bit_depths, patterns, repeat, canvas=True, log=print):
+    results = []
+    make_canvas = get_canvas_factory() if canvas else None
+    if canvas and make_canvas is None:
+        log("PyQt6 not available, skipping canvas cases")
+    
+    # Uncached instances time the full computation on every repeat, the
+    # [cached] rows time a rerun on the same frame through default_cache
+    bad_pixel = BadPixelDetectionAlgorithm()
+    bad_line = BadLineDetectionAlgorithm()
+    bad_pixel.cache = bad_line.cache = None
+    cached_pixel = BadPixelDetectionAlgorithm()
+    cached_line = BadLineDetectionAlgorithm()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            width, height = SIZES[size]
+            for bit_depth in bit_depths:
+                raw = make_sample_raw(width, height, bit_depth, seed=0)
+                if bit_depth <= 8:
+                    raw = raw.astype(np.uint8)
+                path = os.path.join(tmp, f"{size}_{bit_depth}.raw")
+                raw.tofile(path)
+                
+                display, _ = load_raw_image(path, width, height, bit_depth)
+                
+                def record(case, func, pattern=None, zoom=None):
+                    seconds, peak = measure(func, repeat)
+                    results.append({
+                        "case": case, "size": size, "bit_depth": bit_depth,
+                        "pattern": pattern, "zoom": zoom,
+                        "seconds": seconds, "peak_bytes": peak
+                    })
+                    log(f"{case:<30} {size:>6} {bit_depth:>2}-bit {str(pattern):>9} {str(zoom):>5}"
+                        f" {seconds * 1000:10.2f} ms {peak / 2**20:9.1f} MB")
+                
+                record("load_raw_image", lambda: load_raw_image(path, width, height, bit_depth))
+                record("load_raw_image[mmap]", lambda: load_raw_image(path, width, height, bit_depth, use_mmap=True))
+                record("detect_on_plane", lambda: bad_pixel.detect_on_plane(raw, 100))
+                
+                for pattern in patterns:
+                    params = {"threshold": 100, "pattern": pattern, "axis": "Both"}
+                    if pattern != "Mono/None":
+                        record("apply_bayer_mask", lambda: apply_bayer_mask(raw, pattern, bit_depth), pattern)
+                        record("apply_bayer_mask[reuse]",
+                               lambda: apply_bayer_mask(raw, pattern, bit_depth, display), pattern)
+                    record("BadPixelDetection.run", lambda: bad_pixel.run(raw, params), pattern)
+                    record("BadLineDetection.run", lambda: bad_line.run(raw, params), pattern)
+                    record("BadPixelDetection.run[cached]", lambda: cached_pixel.run(raw, params), pattern)
+                    record("BadLineDetection.run[cached]", lambda: cached_line.run(raw, params), pattern)
+                    
+                    if make_canvas is not None:
+                        shown = apply_bayer_mask(raw, pattern, bit_depth, display) if pattern != "Mono/None" else display
+                        for zoom in ZOOM_LEVELS:
+                            paint, keep_alive = make_canvas(shown, raw, pattern, zoom)
+                            record("ImageCanvas.paintEvent", paint, pattern, zoom)
+                            del keep_alive
+    return results
+
+def result_key(r):
+    return (r["case"], r["size"], r["bit_depth"], r["pattern"], r["zoom"])
+
+def compare(old, new, threshold, log=print):
+    """
+    Prints old vs new per case; returns the number of regressions (time or
+    peak memory grown by more than threshold, as a fraction).
+    """
+    old_by_key = {result_key(r): r for r in old["results"]}
+    regressions = 0
+    for r in new["results"]:
+        o = old_by_key.get(result_key(r))
+        if o is None:
+            continue
+        t_ratio = r["seconds"] / o["seconds"] if o["seconds"] else 1.0
+        m_ratio = r["peak_bytes"] / o["peak_bytes"] if o["peak_bytes"] else 1.0
+        flags = []
+        if t_ratio > 1 + threshold:
+            flags.append("TIME")
+        if m_ratio > 1 + threshold:
+            flags.append("MEMORY")
+        regressions += bool(flags)
+        case, size, bit_depth, pattern, zoom = result_key(r)
+        log(f"{case:<30} {size:>6} {bit_depth:>2}-bit {str(pattern):>9} {str(zoom):>5}"
+            f"  time x{t_ratio:5.2f}  mem x{m_ratio:5.2f}  {' '.join(flags) or 'ok'}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RAW Viewer performance benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    run_p = sub.add_parser("run", help="Run benchmarks and write results")
+    run_p.add_argument("--sizes", default="1080p,4k", help=f"Comma list of {', '.join(SIZES)}")
+    run_p.add_argument("--bit-depths", default="10,16")
+    run_p.add_argument("--patterns", default="RGGB,Mono/None")
+    run_p.add_argument("--repeat", type=int, default=3)
+    run_p.add_argument("--no-canvas", action="store_true", help="Skip canvas painting cases")
+    run_p.add_argument("-o", "--output", default="bench_results.json")
+    
+    cmp_p = sub.add_parser("compare", help="Compare two result files")
+    cmp_p.add_argument("old")
+    cmp_p.add_argument("new")
+    cmp_p.add_argument("--threshold", type=float, default=0.15, help="Allowed growth, e.g. 0.15 = 15%%")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "run":
+        sizes = args.sizes.split(",")
+        for s in sizes:
+            if s not in SIZES:
+                parser.error(f"unknown size {s}")
+        results = run_benchmarks(sizes, [int(b) for b in args.bit_depths.split(",")],
+                                 args.patterns.split(","), args.repeat, canvas=not args.no_canvas)
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "platform": platform.platform(),
+                    "cpus": os.cpu_count()
+                },
+                "results": results
+            }, f, indent=1)
+        print(f"Wrote {len(results)} results to {args.output}")
+        return 0
+    
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
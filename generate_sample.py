@@ -1,8 +1,13 @@
 import numpy as np
 import os
 
-def generate_sample_raw(width, height, bit_depth, filename):
+def make_sample_raw(width, height, bit_depth, seed=None):
+    """
+    Builds a synthetic (height, width) uint16 RAW frame: gradient + noise
+    + a flat box in the center.
+    """
     max_val = (2 ** bit_depth) - 1
+    rng = np.random.default_rng(seed)
     
     # Create a gradient
     x = np.linspace(0, 1, width)
@@ -13,14 +18,19 @@ def generate_sample_raw(width, height, bit_depth, filename):
     
     # Add some "noise" or pattern to simulate Bayer
     # Just simple grid pattern
-    noise = (np.random.rand(height, width) * (max_val * 0.1)).astype(np.uint16)
+    noise = (rng.random((height, width)) * (max_val * 0.1)).astype(np.uint16)
     
     # Combine (clamp to max_val)
     raw_data = np.clip(gradient + noise, 0, max_val).astype(np.uint16)
     
     # Draw a box in the center
     cx, cy = width // 2, height // 2
-    raw_data[cy-50:cy+50, cx-50:cx+50] = max_val // 2
+    raw_data[max(cy-50, 0):cy+50, max(cx-50, 0):cx+50] = max_val // 2
+    
+    return raw_data
+
+def generate_sample_raw(width, height, bit_depth, filename):
+    raw_data = make_sample_raw(width, height, bit_depth)
     
     # Save
     raw_data.tofile(filename)
@@ -36,13 +36,10 @@ def test_bad_pixel_detection():
     
     result = algo.run(img, run_params)
     
-    overlays = result.get('overlays', [])
-    print(f"Detected {len(overlays)} bad pixels.")
+    detections = result['detections']
+    print(f"Detected {len(detections)} bad pixels.")
     
-    detected_coords = []
-    for o in overlays:
-        if o['type'] == 'point':
-            detected_coords.append(o['coords'])
+    detected_coords = list(zip(detections['x'].tolist(), detections['y'].tolist()))
             
     # Check if known bad pixels are detected
     # Note: Algorithm returns (x, y)
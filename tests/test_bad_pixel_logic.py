@@ -46,18 +46,23 @@ def test_bad_pixel_detection_bayer():
     }
     
     result = algo.run(img, params)
-    overlays = result['overlays']
+    detections = result['detections']
     
     detected = False
-    for ov in overlays:
-        if ov['coords'] == (bad_x, bad_y):
+    for det in detections:
+        if (det['x'], det['y']) == (bad_x, bad_y):
             detected = True
             print(f"Success: Detected bad pixel at {bad_x}, {bad_y}")
             break
             
     if not detected:
         print("FAILURE: Did not detect bad pixel.")
-        print("Overlays found:", overlays)
+        print("Detections found:", detections)
+        sys.exit(1)
+    
+    # Channel of (5, 5) in BGGR is plane (1, 1) -> index 3; mask agrees
+    if det['channel'] != 3 or det['severity'] != 4000 or not result['mask'][bad_y, bad_x]:
+        print(f"FAILURE: Unexpected detection record {det}.")
         sys.exit(1)
         
     # Check false positive
@@ -86,14 +91,62 @@ def test_bad_pixel_detection_bayer():
     # Should be detected as FALSE POSITIVE if logic is wrong.
     
     result2 = algo.run(img2, params)
-    overlays2 = result2['overlays']
+    detections2 = result2['detections']
     
-    if len(overlays2) > 0:
-        print(f"FAILURE: False positives detected! Count: {len(overlays2)}")
-        print("First few:", overlays2[:5])
+    if len(detections2) > 0 or result2['mask'].any():
+        print(f"FAILURE: False positives detected! Count: {len(detections2)}")
+        print("First few:", detections2[:5])
         sys.exit(1)
     else:
         print("Success: No false positives in clean bayer pattern.")
 
+def test_bad_pixel_detection_no_cap():
+    print("Testing exact counts beyond the old 2000 overlay limit...")
+    
+    img = np.full((200, 200), 1000, dtype=np.uint16)
+    # 2500 isolated hot pixels on a 4-pixel lattice (never adjacent per channel)
+    ys, xs = np.meshgrid(np.arange(2, 200, 4), np.arange(2, 200, 4), indexing="ij")
+    img[ys, xs] = 3000
+    
+    algo = BadPixelDetectionAlgorithm()
+    result = algo.run(img, {"threshold": 500, "pattern": "Mono/None"})
+    
+    count = len(result['detections'])
+    if count != ys.size:
+        print(f"FAILURE: Expected {ys.size} detections, got {count}")
+        sys.exit(1)
+    print(f"Success: Detected all {count} bad pixels.")
+
+def test_bad_pixel_correction():
+    print("Testing bad pixel correction...")
+    
+    img = np.full((40, 40), 1000, dtype=np.uint16)
+    img[0::2, 0::2] = 800 # R plane darker
+    img[1::2, 1::2] = 1200 # B plane brighter
+    img[10, 10] = 4000 # Hot R
+    img[21, 21] = 0 # Dead B
+    
+    algo = BadPixelDetectionAlgorithm()
+    result = algo.run(img, {"threshold": 100, "pattern": "RGGB"})
+    if result["image"] is not img:
+        print("FAILURE: Visualize only mode must return the input frame.")
+        sys.exit(1)
+    
+    result = algo.run(img, {"threshold": 100, "pattern": "RGGB", "visualize_only": False})
+    corrected = result["image"]
+    if corrected[10, 10] != 800 or corrected[21, 21] != 1200:
+        print(f"FAILURE: Pixels not replaced by the channel median: {corrected[10, 10]}, {corrected[21, 21]}")
+        sys.exit(1)
+    if img[10, 10] != 4000:
+        print("FAILURE: Input frame was modified.")
+        sys.exit(1)
+    changed = np.argwhere(corrected != img).tolist()
+    if changed != [[10, 10], [21, 21]]:
+        print(f"FAILURE: Unexpected pixels changed: {changed}")
+        sys.exit(1)
+    print("Success: Bad pixels corrected.")
+
 if __name__ == "__main__":
     test_bad_pixel_detection_bayer()
+    test_bad_pixel_detection_no_cap()
+    test_bad_pixel_correction()
@@ -0,0 +1,123 @@
+import numpy as np
+import sys
+import os
+import csv
+import json
+import subprocess
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import batch
+
+def test_batch_cli_outputs():
+    print("Testing headless batch runner...")
+    
+    width, height = 64, 32
+    img = np.full((height, width), 1000, dtype=np.uint16)
+    img[10, 20] = 4000
+    img[11, 41] = 4000
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(3):
+            img.tofile(os.path.join(tmp, f"frame_{i}.raw"))
+        
+        csv_path = os.path.join(tmp, "out.csv")
+        code = batch.main([tmp, "--width", str(width), "--height", str(height), "--bit-depth", "12",
+                           "--pattern", "RGGB", "-a", "Bad Pixel Detection", "-p", "threshold=500",
+                           "-j", "1", "--format", "csv", "-o", csv_path])
+        if code != 0:
+            print("FAILURE: Batch run reported failures.")
+            sys.exit(1)
+        
+        with open(csv_path) as f:
+            rows = list(csv.DictReader(f))
+        found = sorted({(r["file"][-11:], int(r["x"]), int(r["y"])) for r in rows})
+        expected = sorted((f"frame_{i}.raw", x, y) for i in range(3) for x, y in [(20, 10), (41, 11)])
+        if found != expected:
+            print(f"FAILURE: Unexpected CSV detections {found}")
+            sys.exit(1)
+        
+        jsonl_path = os.path.join(tmp, "out.jsonl")
+        batch.main([os.path.join(tmp, "frame_0.raw"), "--width", str(width), "--height", str(height),
+                    "-a", "Bad Pixel Detection", "-p", "threshold=500", "-j", "1", "--tiled", "-o", jsonl_path])
+        with open(jsonl_path) as f:
+            record = json.loads(f.readline())
+        if record["count"] != 2 or record["detections"]["x"] != [20, 41]:
+            print(f"FAILURE: Unexpected JSONL record {record}")
+            sys.exit(1)
+    
+        # Worker processes: records (structured arrays) cross the process boundary
+        pool_path = os.path.join(tmp, "pool.jsonl")
+        code = batch.main([tmp, "--width", str(width), "--height", str(height), "--pattern", "RGGB",
+                           "-a", "Bad Pixel Detection", "-p", "threshold=500", "-j", "2", "-o", pool_path])
+        with open(pool_path) as f:
+            records = [json.loads(line) for line in f]
+        found = sorted((r["file"][-11:], x, y) for r in records
+                       for x, y in zip(r["detections"]["x"], r["detections"]["y"]))
+        if code != 0 or found != expected:
+            print(f"FAILURE: Unexpected -j 2 detections {found}")
+            sys.exit(1)
+        
+        # A failing algorithm (Temporal needs >= 2 frames) keeps the others' results
+        partial_path = os.path.join(tmp, "partial.jsonl")
+        code = batch.main([os.path.join(tmp, "frame_0.raw"), "--width", str(width), "--height", str(height),
+                           "-a", "Temporal Defect Detection", "-a", "Bad Pixel Detection",
+                           "-p", "threshold=500", "-j", "1", "-o", partial_path])
+        with open(partial_path) as f:
+            rows = {r["algorithm"]: r for r in map(json.loads, f)}
+        if code != 1 or not rows["Temporal Defect Detection"].get("error") or rows["Bad Pixel Detection"]["count"] != 2:
+            print(f"FAILURE: Per-algorithm failure handling wrong {rows}")
+            sys.exit(1)
+        
+        csv_path = os.path.join(tmp, "partial.csv")
+        batch.main([os.path.join(tmp, "frame_0.raw"), "--width", str(width), "--height", str(height),
+                    "-a", "Temporal Defect Detection", "-a", "Bad Pixel Detection",
+                    "-p", "threshold=500", "-j", "1", "--format", "csv", "-o", csv_path])
+        with open(csv_path) as f:
+            rows = list(csv.DictReader(f))
+        errors = [r for r in rows if r["error"]]
+        if len(errors) != 1 or errors[0]["algorithm"] != "Temporal Defect Detection" or len(rows) != 3:
+            print(f"FAILURE: CSV per-algorithm error rows wrong {rows}")
+            sys.exit(1)
+    
+    # Must stay importable without a display stack
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    probe = "import sys, batch; print(any(m.startswith('PyQt') for m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True)
+    if out.stdout.strip() != "False":
+        print(f"FAILURE: batch imports PyQt ({out.stdout} {out.stderr})")
+        sys.exit(1)
+    
+    print("Success: Batch outputs correct, no PyQt import.")
+
+def test_build_jobs_params():
+    print("Testing --param resolution...")
+    
+    from algorithms.manager import AlgorithmManager
+    manager = AlgorithmManager()
+    names = ["Bad Pixel Detection", "Bad Line Detection"]
+    
+    # Declared by one algorithm only: the other keeps its defaults
+    jobs = dict(batch.build_jobs(manager, names, {"axis": "Rows", "threshold": "50"}, "RGGB"))
+    if jobs["Bad Line Detection"]["axis"] != "Rows" or "axis" in jobs["Bad Pixel Detection"]:
+        print(f"FAILURE: axis applied to the wrong algorithms {jobs}")
+        sys.exit(1)
+    if jobs["Bad Pixel Detection"]["threshold"] != 50 or jobs["Bad Line Detection"]["threshold"] != 50:
+        print("FAILURE: Shared key not applied (as int) to both algorithms.")
+        sys.exit(1)
+    
+    # Nobody declares it (typo)
+    try:
+        batch.build_jobs(manager, names, {"treshold": "50"}, "RGGB")
+        print("FAILURE: Unknown parameter accepted.")
+        sys.exit(1)
+    except ValueError:
+        pass
+    
+    print("Success: Parameters go only to the algorithms declaring them.")
+
+if __name__ == "__main__":
+    test_batch_cli_outputs()
+    test_build_jobs_params()
@@ -0,0 +1,109 @@
+import numpy as np
+import sys
+import os
+import time
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from algorithms.base import make_detections, KIND_HOT, KIND_SPATIAL
+from algorithms.defect_map import DefectMap
+
+def random_map(rng, width, height, count, meta=None):
+    idx = rng.choice(width * height, size=count, replace=False)
+    dets = make_detections(idx % width, idx // width, -1, rng.random(count), KIND_SPATIAL)
+    return DefectMap.from_detections(dets, width, height, "RGGB", meta)
+
+def test_defect_map_roundtrip_and_set_ops():
+    print("Testing defect map format...")
+    
+    width, height = 4000, 3000
+    rng = np.random.default_rng(1)
+    
+    # Duplicate reports keep the strongest record
+    dets = make_detections([5, 5, 9], [2, 2, 3], -1, [1.0, 7.0, 2.0], [KIND_SPATIAL, KIND_HOT, KIND_SPATIAL])
+    small = DefectMap.from_detections(dets, width, height, "RGGB")
+    if len(small) != 2 or small.kind[0] != KIND_HOT or small.severity[0] != 7.0:
+        print("FAILURE: Duplicate detections not merged.")
+        sys.exit(1)
+    if small.to_detections()["channel"].tolist() != [1, 3]:
+        print("FAILURE: Channels not derived from the pattern.")
+        sys.exit(1)
+    
+    a = random_map(rng, width, height, 100000, {"serial": "SN0001", "params": {"threshold": 100}})
+    b = random_map(rng, width, height, 100000)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "SN0001.npz")
+        a.save(path)
+        t0 = time.perf_counter()
+        loaded = DefectMap.load(path)
+        elapsed = time.perf_counter() - t0
+        if not (np.array_equal(loaded.indices, a.indices) and np.array_equal(loaded.kind, a.kind)
+                and np.array_equal(loaded.severity, a.severity)):
+            print("FAILURE: Round trip changed the map.")
+            sys.exit(1)
+        if loaded.meta["serial"] != "SN0001" or loaded.pattern != "RGGB" or loaded.width != width:
+            print("FAILURE: Header not restored.")
+            sys.exit(1)
+        print(f"Loaded 100k defects in {elapsed * 1000:.1f} ms")
+        del loaded
+    
+    sa, sb = set(a.indices.tolist()), set(b.indices.tolist())
+    checks = [
+        (a.union(b), sa | sb),
+        (a.intersection(b), sa & sb),
+        (a.difference(b), sa - sb)
+    ]
+    for result, expected in checks:
+        if result.indices.tolist() != sorted(expected):
+            print("FAILURE: Set operation result wrong.")
+            sys.exit(1)
+    added, removed, common = a.diff(b)
+    if set(added.indices.tolist()) != sb - sa or set(removed.indices.tolist()) != sa - sb:
+        print("FAILURE: Diff wrong.")
+        sys.exit(1)
+    
+    # Correction replaces mapped pixels with the same-color neighbor median
+    img = np.full((8, 10), 100, dtype=np.uint16)
+    img[1::2, 1::2] = 300 # Blue plane
+    img[3, 5] = 4000
+    img[0, 0] = 0
+    fix = DefectMap.from_mask(img == 4000, "RGGB").union(DefectMap.from_mask(img == 0, "RGGB"))
+    corrected = fix.correct(img)
+    if corrected[3, 5] != 300 or corrected[0, 0] != 100 or img[3, 5] != 4000:
+        print("FAILURE: Correction wrong.")
+        sys.exit(1)
+    
+    print("Success: Defect maps round-trip and combine correctly.")
+
+def test_defect_map_border_correction():
+    print("Testing defect correction next to the border...")
+    
+    # Blue plane defects in row / column 1: their neighbors across the edge
+    # would mirror back onto the defects themselves
+    img = np.full((8, 10), 100, dtype=np.uint16)
+    img[1::2, 1::2] = 300
+    img[1, 1] = img[1, 3] = img[5, 1] = 4000
+    img[7, 9] = 4000 # Far corner, 3 neighbors
+    fix = DefectMap.from_mask(img == 4000, "RGGB")
+    corrected = fix.correct(img)
+    if corrected[1, 1] != 300 or corrected[1, 3] != 300 or corrected[5, 1] != 300 or corrected[7, 9] != 300:
+        print(f"FAILURE: Border defects not corrected: {corrected[1, 1]}, {corrected[1, 3]}, "
+              f"{corrected[5, 1]}, {corrected[7, 9]}")
+        sys.exit(1)
+    
+    # Mono: only the 3 in-frame neighbors of a corner count
+    mono = np.arange(16, dtype=np.uint16).reshape(4, 4)
+    mono[0, 0] = 1000
+    corrected = DefectMap.from_mask(mono == 1000, "Mono/None").correct(mono)
+    if corrected[0, 0] != np.median([1, 4, 5]):
+        print(f"FAILURE: Corner median {corrected[0, 0]}")
+        sys.exit(1)
+    
+    print("Success: Border defects use only in-frame neighbors.")
+
+if __name__ == "__main__":
+    test_defect_map_roundtrip_and_set_ops()
+    test_defect_map_border_correction()
@@ -0,0 +1,82 @@
+import numpy as np
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.demosaic import demosaic, superpixel
+
+def make_mosaic(rgb, pattern):
+    """Samples an (H, W, 3) image through a Bayer pattern."""
+    height, width, _ = rgb.shape
+    raw = np.empty((height, width), dtype=np.uint16)
+    for dy in (0, 1):
+        for dx in (0, 1):
+            channel = "RGB".index(pattern[dy * 2 + dx])
+            raw[dy::2, dx::2] = rgb[dy::2, dx::2, channel]
+    return raw
+
+def test_demosaic_reconstructs_gradients():
+    print("Testing demosaic on smooth images...")
+
+    yy, xx = np.mgrid[0:48, 0:64]
+    rgb = np.stack([1000 + 5 * xx, 800 + 3 * yy + 2 * xx, 600 + 4 * yy], axis=-1)
+    inner = (slice(2, -2), slice(2, -2))
+    for pattern in ["RGGB", "BGGR", "GRBG", "GBRG"]:
+        raw = make_mosaic(rgb, pattern)
+        for method in ["Bilinear", "Malvar-He-Cutler"]:
+            out = demosaic(raw, pattern, method)
+            # Both methods are exact for linear ramps away from the border
+            if not np.allclose(out[inner], rgb[inner], atol=1e-3):
+                print(f"FAILURE: {method} / {pattern} does not reconstruct a linear ramp.")
+                sys.exit(1)
+            # Known samples are passed through
+            for dy in (0, 1):
+                for dx in (0, 1):
+                    channel = "RGB".index(pattern[dy * 2 + dx])
+                    if not np.array_equal(out[dy::2, dx::2, channel], raw[dy::2, dx::2]):
+                        print(f"FAILURE: {method} / {pattern} changed a known sample.")
+                        sys.exit(1)
+    print("Success: Linear ramps are reconstructed.")
+
+def test_demosaic_tiles_match_whole_frame():
+    print("Testing per-tile demosaic against the whole frame...")
+
+    raw = np.random.default_rng(2).integers(0, 4096, (45, 70)).astype(np.uint16)
+    for pattern in ["RGGB", "GBRG"]:
+        for method in ["Bilinear", "Malvar-He-Cutler"]:
+            whole = demosaic(raw, pattern, method)
+            # Odd tile origins and sizes, tiles touching every border
+            rows = [(0, 13), (13, 30), (30, 45)]
+            cols = [(0, 7), (7, 41), (41, 70)]
+            tiled = np.concatenate([np.concatenate([demosaic(raw, pattern, method, y0, y1, x0, x1)
+                                                    for x0, x1 in cols], axis=1) for y0, y1 in rows], axis=0)
+            if not np.array_equal(tiled, whole):
+                print(f"FAILURE: Tiles differ from the whole frame ({method} / {pattern}).")
+                sys.exit(1)
+
+    mono = demosaic(raw, "Mono/None")
+    if not np.array_equal(mono[..., 0], raw) or not np.array_equal(mono[..., 2], raw):
+        print("FAILURE: Mono data should pass through as gray.")
+        sys.exit(1)
+    print("Success: Tiled demosaic is seamless.")
+
+def test_superpixel():
+    print("Testing superpixel preview...")
+
+    raw = np.zeros((8, 10), dtype=np.uint16)
+    raw[0::2, 0::2] = 100 # R
+    raw[0::2, 1::2] = 200 # G
+    raw[1::2, 0::2] = 300 # G
+    raw[1::2, 1::2] = 400 # B
+    rgb = superpixel(raw, "RGGB", 0, 8, 0, 10, 4)
+    if rgb.shape != (2, 3, 3) or not np.allclose(rgb, [100, 250, 400]):
+        print(f"FAILURE: Wrong superpixel output {rgb.shape}")
+        sys.exit(1)
+    print("Success: Superpixels combine each 2x2 cell.")
+
+if __name__ == "__main__":
+    test_demosaic_reconstructs_gradients()
+    test_demosaic_tiles_match_whole_frame()
+    test_superpixel()
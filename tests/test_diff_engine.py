@@ -0,0 +1,91 @@
+import numpy as np
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.diff_engine import compare_frames, difference
+
+def test_compare_frames_metrics():
+    print("Testing frame comparison metrics...")
+
+    rng = np.random.default_rng(11)
+    reference = rng.integers(0, 1024, (67, 90)).astype(np.uint16)
+    test = reference.copy()
+    noise = rng.integers(-3, 4, test.shape)
+    test = np.clip(test.astype(np.int32) + noise, 0, 1023).astype(np.uint16)
+    test[10, 21] = 1023 # One big outlier in a G site of RGGB
+    reference[10, 21] = 0
+
+    result = compare_frames(test, reference, "RGGB", bit_depth=10, tolerance=3, chunk_rows=7)
+    d = test.astype(np.int64) - reference
+    for channel, (dy, dx) in zip(result["channels"], [(0, 0), (0, 1), (1, 0), (1, 1)]):
+        plane = d[dy::2, dx::2]
+        mse = (plane ** 2).mean()
+        expected_psnr = 10 * np.log10(1023 ** 2 / mse)
+        if (channel["count"] != plane.size or not np.isclose(channel["mae"], np.abs(plane).mean())
+                or not np.isclose(channel["rmse"], np.sqrt(mse)) or not np.isclose(channel["psnr"], expected_psnr)
+                or channel["max_error"] != np.abs(plane).max()
+                or channel["mismatches"] != np.count_nonzero(np.abs(plane) > 3)):
+            print(f"FAILURE: Wrong metrics for channel {channel['name']}: {channel}")
+            sys.exit(1)
+    if result["channels"][1]["max_error"] != 1023 or result["total"]["max_error"] != 1023:
+        print("FAILURE: Outlier not attributed to its channel.")
+        sys.exit(1)
+    if not np.array_equal(result["mask"], np.abs(d) > 3):
+        print("FAILURE: Mismatch mask wrong.")
+        sys.exit(1)
+
+    # Band size does not change the result
+    whole = compare_frames(test, reference, "RGGB", bit_depth=10, tolerance=3)
+    if whole["total"] != result["total"] or whole["channels"] != result["channels"]:
+        print("FAILURE: Chunked and single-band results differ.")
+        sys.exit(1)
+
+    same = compare_frames(reference, reference)
+    if same["total"]["psnr"] != float("inf") or same["mask"].any():
+        print("FAILURE: Identical frames should have infinite PSNR and no mismatches.")
+        sys.exit(1)
+
+    try:
+        compare_frames(test, reference[:-1])
+        print("FAILURE: Size mismatch not reported.")
+        sys.exit(1)
+    except ValueError:
+        pass
+    print("Success: Metrics match a direct computation.")
+
+def test_difference_tiles():
+    print("Testing lazily rendered difference regions...")
+
+    a = np.full((64, 64), 100, dtype=np.uint16)
+    b = a.copy()
+    b[33, 17] = 140 # Odd site, would be skipped by plain striding
+    full = difference(a, b, 0, 64, 0, 64)
+    if full.dtype != np.int32 or full[33, 17] != -40 or np.count_nonzero(full) != 1:
+        print("FAILURE: Full resolution difference wrong.")
+        sys.exit(1)
+    coarse = difference(a, b, 0, 64, 0, 64, step=4)
+    if coarse.shape != (16, 16) or coarse[8, 4] != -40 or np.count_nonzero(coarse) != 1:
+        print("FAILURE: Isolated mismatch lost when zoomed out.")
+        sys.exit(1)
+    region = difference(a, b, 30, 35, 15, 21, step=2)
+    if region.shape != (3, 3) or region[1, 1] != -40:
+        print("FAILURE: Region offsets wrong.")
+        sys.exit(1)
+
+    # Mismatches at every offset of a block, coarser levels and ragged edges
+    for y, x in [(34, 18), (35, 19), (34, 17), (63, 62)]:
+        b = a.copy()
+        b[y, x] = 40
+        for step in (4, 8, 16):
+            coarse = difference(a, b, 0, 64, 0, 63, step) # 63: partial last block
+            if np.count_nonzero(coarse) != 1 or coarse[y // step, x // step] != 60:
+                print(f"FAILURE: Mismatch at ({y}, {x}) lost at step {step}.")
+                sys.exit(1)
+    print("Success: Difference tiles keep isolated mismatches.")
+
+if __name__ == "__main__":
+    test_compare_frames_metrics()
+    test_difference_tiles()
@@ -0,0 +1,119 @@
+import numpy as np
+import sys
+import os
+import time
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.histogram import ChannelHistogram, display_window, DEFAULT_MAX_SAMPLES
+from utils.raw_source import RawSource
+
+def test_channel_histogram():
+    print("Testing per-channel histograms...")
+
+    rng = np.random.default_rng(5)
+    img = np.empty((64, 96), dtype=np.uint16)
+    # Distinct level per Bayer plane
+    for i, (dy, dx) in enumerate([(0, 0), (0, 1), (1, 0), (1, 1)]):
+        img[dy::2, dx::2] = 100 * (i + 1) + rng.integers(0, 10, img[dy::2, dx::2].shape)
+
+    hist = ChannelHistogram(pattern="GRBG")
+    hist.add(img)
+    if hist.channel_names != ["G", "R", "B", "G"]:
+        print(f"FAILURE: Wrong channel names {hist.channel_names}")
+        sys.exit(1)
+    for i, (dy, dx) in enumerate([(0, 0), (0, 1), (1, 0), (1, 1)]):
+        expected = np.bincount(img[dy::2, dx::2].ravel(), minlength=hist.levels)
+        if not np.array_equal(hist.counts[i], expected):
+            print(f"FAILURE: Channel {i} counts wrong.")
+            sys.exit(1)
+
+    # Tiles at odd offsets land on the same channels as the whole frame
+    tiled = ChannelHistogram(pattern="GRBG")
+    for y0, y1 in [(0, 17), (17, 40), (40, 64)]:
+        for x0, x1 in [(0, 33), (33, 96)]:
+            tiled.add(img[y0:y1, x0:x1], y0, x0)
+    if not np.array_equal(tiled.counts, hist.counts):
+        print("FAILURE: Tiled histogram differs from the full one.")
+        sys.exit(1)
+
+    # Percentiles match numpy's inverted CDF (always an actual sample value)
+    for q in (0.1, 5, 50, 99.9):
+        expected = int(np.percentile(img, q, method="inverted_cdf"))
+        if hist.percentile(q) != expected:
+            print(f"FAILURE: Percentile {q}: {hist.percentile(q)} vs {expected}")
+            sys.exit(1)
+    if hist.percentile(50, channel=1) // 100 != 2:
+        print("FAILURE: Per-channel percentile picked the wrong plane.")
+        sys.exit(1)
+
+    binned = hist.binned(bins=64, max_value=1023)
+    if binned.shape != (4, 64) or binned.sum() != img.size:
+        print("FAILURE: Binned counts lost samples.")
+        sys.exit(1)
+    print("Success: Histograms are per channel, tile-invariant and exact.")
+
+def test_histogram_sampling_speed():
+    print("Testing sampled histogram on a 50 MP frame...")
+
+    img = np.random.default_rng(0).integers(0, 4096, (6144, 8192)).astype(np.uint16)
+    ChannelHistogram.from_image(img[:64], "RGGB") # Warm up
+    start = time.perf_counter()
+    hist = ChannelHistogram.from_image(img, "RGGB")
+    elapsed = time.perf_counter() - start
+    print(f"  {elapsed * 1000:.1f} ms for {hist.sample_count()} samples")
+    # The cost follows the sample count, not the frame size
+    if hist.sample_count() > 2 * DEFAULT_MAX_SAMPLES:
+        print(f"FAILURE: {hist.sample_count()} samples taken, expected about {DEFAULT_MAX_SAMPLES}.")
+        sys.exit(1)
+    black, white = hist.auto_window(1, 99)
+    if abs(black - 41) > 15 or abs(white - 4055) > 15:
+        print(f"FAILURE: Auto window ({black}, {white}) off for uniform data.")
+        sys.exit(1)
+    print("Success: Sampled histogram is bounded and representative.")
+
+def test_auto_levels_display():
+    print("Testing auto levels on a dark frame...")
+
+    # Dark frame: everything within the lowest 3% of the 12-bit range
+    img = np.random.default_rng(1).integers(60, 120, (32, 48)).astype(np.uint16)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dark.raw")
+        img.tofile(path)
+        source = RawSource(path)
+        params = {"width": 48, "height": 32, "bit_depth": 12}
+
+        linear = source.display(params)
+        if linear.max() > 8:
+            print("FAILURE: Expected a near-black linear display.")
+            sys.exit(1)
+
+        raw = source.raw(params)
+        auto = dict(params, auto_levels=True, low_percentile=0.0, high_percentile=100.0)
+        stretched = source.display(auto)
+        if source.raw(auto) is not raw:
+            print("FAILURE: Changing the display window re-decoded the frame.")
+            sys.exit(1)
+        if stretched.min() != 0 or stretched.max() != 255:
+            print(f"FAILURE: Auto levels did not stretch ({stretched.min()}..{stretched.max()}).")
+            sys.exit(1)
+        if source.display_window(auto) != (60, 119):
+            print(f"FAILURE: Wrong auto window {source.display_window(auto)}")
+            sys.exit(1)
+
+        # Manual window, white 0 = full range
+        if display_window({"black": 10, "white": 0}) != (10, None):
+            print("FAILURE: Manual window not taken from params.")
+            sys.exit(1)
+        rendered, _ = source.render(auto)
+        if not np.array_equal(rendered, stretched):
+            print("FAILURE: render() and display() disagree.")
+            sys.exit(1)
+    print("Success: Auto levels stretch dark frames without re-decoding.")
+
+if __name__ == "__main__":
+    test_channel_histogram()
+    test_histogram_sampling_speed()
+    test_auto_levels_display()
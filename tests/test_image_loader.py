@@ -0,0 +1,164 @@
+import numpy as np
+import sys
+import os
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.image_loader import load_raw_image, apply_bayer_mask, apply_display_lut, get_display_lut
+from utils.unpack import PACKED_FORMATS, unpack_mipi
+
+def pack_mipi_reference(img, packing, stride):
+    # Straightforward per-group packer, used to check the vectorized decoder
+    fmt = PACKED_FORMATS[packing]
+    ppg, lsb_bits = fmt["pixels"], fmt["bit_depth"] - 8
+    out = bytearray()
+    for row in img:
+        line = bytearray()
+        padded = list(row) + [0] * (-len(row) % ppg)
+        for g in range(0, len(padded), ppg):
+            group = padded[g:g + ppg]
+            lsb = 0
+            for i, v in enumerate(group):
+                line.append(int(v) >> lsb_bits)
+                lsb |= (int(v) & ((1 << lsb_bits) - 1)) << (lsb_bits * i)
+            line.extend(lsb.to_bytes(fmt["bytes"] - ppg, "little"))
+        line.extend(b"\x00" * (stride - len(line)))
+        out.extend(line)
+    return bytes(out)
+
+def test_load_raw_image_mmap():
+    print("Testing memory-mapped RAW loading...")
+    
+    width, height = 64, 48
+    img = (np.arange(width * height, dtype=np.uint32) % 1024).astype(np.uint16).reshape(height, width)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frame.raw")
+        # Trailing garbage must be ignored, as with the in-memory path
+        with open(path, "wb") as f:
+            f.write(img.tobytes())
+            f.write(b"\xff" * 100)
+        
+        display_ref, raw_ref = load_raw_image(path, width, height, 10)
+        display_map, raw_map = load_raw_image(path, width, height, 10, use_mmap=True)
+        
+        if not isinstance(raw_map, np.memmap):
+            print(f"FAILURE: Expected a memmap, got {type(raw_map)}")
+            sys.exit(1)
+        
+        if raw_map.shape != (height, width) or not np.array_equal(raw_map, img):
+            print("FAILURE: Mapped raw data does not match file contents.")
+            sys.exit(1)
+            
+        if not np.array_equal(raw_ref, raw_map) or not np.array_equal(display_ref, display_map):
+            print("FAILURE: mmap and in-memory paths disagree.")
+            sys.exit(1)
+        
+        # Too small for the requested dimensions
+        display, raw = load_raw_image(path, width, height * 2, 10, use_mmap=True)
+        if display is not None or raw is not None:
+            print("FAILURE: Undersized file should fail to load.")
+            sys.exit(1)
+        
+        del raw_map, display_map
+    
+    print("Success: mmap loader matches in-memory loader.")
+
+def test_unpack_mipi_formats():
+    print("Testing MIPI packed RAW decoding...")
+    
+    rng = np.random.default_rng(0)
+    # Odd width exercises the partial last group
+    width, height = 30, 6
+    
+    for packing, fmt in PACKED_FORMATS.items():
+        img = rng.integers(0, 2 ** fmt["bit_depth"], (height, width), dtype=np.uint16)
+        
+        line_bytes = -(-width // fmt["pixels"]) * fmt["bytes"]
+        stride = line_bytes + 8 # Line padding
+        data = pack_mipi_reference(img, packing, stride)
+        
+        lines = np.frombuffer(data, dtype=np.uint8).reshape(height, stride)
+        decoded = unpack_mipi(lines, width, packing)
+        if decoded.dtype != np.uint16 or not np.array_equal(decoded, img):
+            print(f"FAILURE: {packing} decode mismatch.")
+            sys.exit(1)
+        
+        # Through the loader, both read paths
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "packed.raw")
+            with open(path, "wb") as f:
+                f.write(data)
+            for use_mmap in (False, True):
+                display, raw = load_raw_image(path, width, height, 16, use_mmap=use_mmap,
+                                              packing=packing, stride=stride)
+                if raw is None or not np.array_equal(raw, img):
+                    print(f"FAILURE: {packing} loader mismatch (mmap={use_mmap}).")
+                    sys.exit(1)
+                del raw, display
+        
+        print(f"Success: {packing} decoded correctly.")
+
+def test_unpacked_line_stride():
+    print("Testing unpacked line stride...")
+    
+    width, height, pad = 10, 4, 6
+    img = np.arange(width * height, dtype=np.uint16).reshape(height, width)
+    padded = np.zeros((height, width + pad // 2), dtype=np.uint16)
+    padded[:, :width] = img
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "strided.raw")
+        padded.tofile(path)
+        display, raw = load_raw_image(path, width, height, 12, use_mmap=True, stride=(width * 2 + pad))
+        if raw is None or not np.array_equal(raw, img):
+            print("FAILURE: Line padding not skipped.")
+            sys.exit(1)
+        del raw, display
+    
+    print("Success: Line padding skipped.")
+
+def test_display_lut_matches_float_normalization():
+    print("Testing LUT display conversion...")
+    
+    rng = np.random.default_rng(1)
+    for bit_depth in (8, 10, 12, 14, 16):
+        dtype = np.uint8 if bit_depth <= 8 else np.uint16
+        raw = rng.integers(0, 2 ** bit_depth, (40, 50)).astype(dtype)
+        
+        max_val = (2 ** bit_depth) - 1
+        expected = (raw.astype(np.float32) / max_val * 255).astype(np.uint8)
+        display = apply_display_lut(raw, bit_depth)
+        if not np.array_equal(display, expected):
+            print(f"FAILURE: LUT differs from float normalization at {bit_depth}-bit.")
+            sys.exit(1)
+        
+        # Reusing the loader's plane gives the same mosaic as recomputing it
+        if not np.array_equal(apply_bayer_mask(raw, "GRBG", bit_depth),
+                              apply_bayer_mask(raw, "GRBG", bit_depth, display)):
+            print(f"FAILURE: apply_bayer_mask result depends on reuse at {bit_depth}-bit.")
+            sys.exit(1)
+    
+    # Cached per parameters
+    if get_display_lut(10) is not get_display_lut(10):
+        print("FAILURE: LUT not cached.")
+        sys.exit(1)
+    
+    # Window and gamma fold into the table
+    lut = get_display_lut(12, 16, 100, 1100, 2.2)
+    if lut[100] != 0 or lut[50] != 0 or lut[1100] != 255 or lut[4095] != 255:
+        print("FAILURE: Window endpoints not clipped.")
+        sys.exit(1)
+    if not lut[600] > 127: # Gamma lifts the mid-tones
+        print("FAILURE: Gamma not applied.")
+        sys.exit(1)
+    
+    print("Success: LUT conversion matches.")
+
+if __name__ == "__main__":
+    test_load_raw_image_mmap()
+    test_unpack_mipi_formats()
+    test_unpacked_line_stride()
+    test_display_lut_matches_float_normalization()
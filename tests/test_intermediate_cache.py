@@ -0,0 +1,91 @@
+import numpy as np
+import sys
+import os
+import gc
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from algorithms.cache import IntermediateCache
+from algorithms.bad_pixel import BadPixelDetectionAlgorithm
+from algorithms.bad_line import BadLineDetectionAlgorithm
+
+def test_threshold_rerun_hits_cache():
+    print("Testing intermediate cache across threshold changes...")
+
+    rng = np.random.default_rng(3)
+    img = rng.normal(500, 10, (512, 512)).clip(0, 4095).astype(np.uint16)
+    img[rng.integers(0, 512, 200), rng.integers(0, 512, 200)] = 4000
+
+    cache = IntermediateCache()
+    algo = BadPixelDetectionAlgorithm()
+    algo.cache = cache
+    uncached = BadPixelDetectionAlgorithm()
+    uncached.cache = None
+
+    start = time.perf_counter()
+    algo.run(img, {"threshold": 100, "pattern": "RGGB", "parallel": "Off"})
+    first_time = time.perf_counter() - start
+    if len(cache) != 4:
+        print(f"FAILURE: Expected 4 cached channel residuals, got {len(cache)}")
+        sys.exit(1)
+
+    # Count residual computations on the rerun, a cache hit makes none
+    calls = []
+    compute_residual = algo.compute_residual
+    def counting_residual(plane, context=None):
+        calls.append(plane.shape)
+        return compute_residual(plane, context=context)
+    algo.compute_residual = counting_residual
+
+    start = time.perf_counter()
+    result = algo.run(img, {"threshold": 300, "pattern": "RGGB", "parallel": "Off"})
+    rerun_time = time.perf_counter() - start
+    print(f"First run: {first_time:.3f}s, cached rerun: {rerun_time:.3f}s")
+    if calls or len(cache) != 4:
+        print(f"FAILURE: Rerun recomputed {len(calls)} residuals ({len(cache)} cache entries).")
+        sys.exit(1)
+    expected = uncached.run(img, {"threshold": 300, "pattern": "RGGB", "parallel": "Off"})
+    if not np.array_equal(result["detections"], expected["detections"]):
+        print("FAILURE: Cached rerun differs from a fresh run.")
+        sys.exit(1)
+
+    # Line means are cached per algorithm stage alongside
+    lines = BadLineDetectionAlgorithm()
+    lines.cache = cache
+    lines.run(img, {"threshold": 50, "pattern": "RGGB", "parallel": "Off"})
+    if len(cache) != 8:
+        print(f"FAILURE: Expected 8 entries after line detection, got {len(cache)}")
+        sys.exit(1)
+
+    # Entries go away with the image
+    del img, result, expected # Results hold on to the input image
+    gc.collect()
+    if len(cache) != 0 or cache.cached_bytes != 0:
+        print(f"FAILURE: {len(cache)} entries left after the image was freed.")
+        sys.exit(1)
+    print("Success: Threshold changes reuse intermediates, entries follow the image.")
+
+def test_cache_budget():
+    print("Testing intermediate cache budget...")
+
+    cache = IntermediateCache(budget_bytes=3 * 1000 * 8)
+    images = [np.zeros(10) for _ in range(5)]
+    for i, image in enumerate(images):
+        cache.put(image, 0, "stage", np.zeros(1000))
+    if len(cache) != 3 or cache.get(images[0], 0, "stage") is not None \
+            or cache.get(images[4], 0, "stage") is None:
+        print("FAILURE: Budget did not evict the oldest entries.")
+        sys.exit(1)
+
+    # Too large to ever fit, not cached
+    cache.put(images[0], 0, "big", np.zeros(10000))
+    if cache.get(images[0], 0, "big") is not None:
+        print("FAILURE: Oversized entry was cached.")
+        sys.exit(1)
+    print("Success: Cache stays within its budget.")
+
+if __name__ == "__main__":
+    test_threshold_rerun_hits_cache()
+    test_cache_budget()
@@ -0,0 +1,107 @@
+import numpy as np
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.demosaic import demosaic
+from utils.isp import IspPipeline, IDENTITY_CCM, TONE_LUT_SIZE
+
+WB = (2.0, 1.0, 1.5)
+CCM = (1.6, -0.4, -0.2,
+       -0.3, 1.5, -0.2,
+       0.0, -0.6, 1.6)
+
+def reference_isp(raw, pattern, method, black, white, gains, ccm, gamma):
+    """Unfused float64 version of the preview: the stages one after another."""
+    linear = (raw.astype(np.float64) - black) / (white - black)
+    for dy in (0, 1):
+        for dx in (0, 1):
+            linear[dy::2, dx::2] *= gains["RGB".index(pattern[dy * 2 + dx])]
+    rgb = demosaic(linear.astype(np.float32), pattern, method).astype(np.float64)
+    rgb = np.clip(rgb @ np.asarray(ccm).reshape(3, 3).T, 0.0, 1.0)
+    levels = np.rint(rgb * (TONE_LUT_SIZE - 1)) / (TONE_LUT_SIZE - 1)
+    return np.rint(255.0 * levels ** (1.0 / gamma))
+
+def test_isp_matches_reference():
+    print("Testing fused ISP against the stage-by-stage reference...")
+
+    raw = np.random.default_rng(3).integers(0, 1024, (70, 90)).astype(np.uint16)
+    for pattern in ["RGGB", "GBRG"]:
+        pipeline = IspPipeline()
+        pipeline.set_frame(raw, pattern, "Malvar-He-Cutler", 10, (64, None))
+        pipeline.set_params({"wb_gains": WB, "ccm": CCM, "gamma": 2.2})
+        out = pipeline.render(0, 0, 70, 0, 90)
+        expected = reference_isp(raw, pattern, "Malvar-He-Cutler", 64, 1023, WB, CCM, 2.2)
+        if out.dtype != np.uint8 or out.shape != (70, 90, 3):
+            print(f"FAILURE: Wrong output {out.dtype} {out.shape}")
+            sys.exit(1)
+        # float32 vs float64 may round one code differently
+        if np.abs(out.astype(int) - expected).max() > 1:
+            print(f"FAILURE: ISP output differs from the reference ({pattern}).")
+            sys.exit(1)
+    print("Success: Fused pass matches the reference.")
+
+def test_isp_bands_and_tiles():
+    print("Testing banded and tiled ISP renders...")
+
+    raw = np.random.default_rng(4).integers(0, 4096, (600, 700)).astype(np.uint16)
+    pipeline = IspPipeline()
+    pipeline.set_frame(raw, "GRBG", "Bilinear", 12, (0, None))
+    pipeline.set_params({"wb_gains": WB, "ccm": CCM})
+
+    # Larger than MAX_CACHED_PIXELS: the uncached banded pass
+    whole = pipeline.render(0, 0, 600, 0, 700)
+    if pipeline.regions:
+        print("FAILURE: A whole-frame render should not be cached.")
+        sys.exit(1)
+    for y0, y1, x0, x1 in [(0, 256, 0, 256), (256, 512, 256, 512), (512, 600, 512, 700)]:
+        if not np.array_equal(pipeline.render(0, y0, y1, x0, x1), whole[y0:y1, x0:x1]):
+            print(f"FAILURE: Tile ({y0}, {x0}) differs from the banded pass.")
+            sys.exit(1)
+    print("Success: Tiles and bands agree.")
+
+def test_isp_reruns_downstream_stages_only():
+    print("Testing ISP stage caching...")
+
+    raw = np.random.default_rng(5).integers(0, 1024, (64, 64)).astype(np.uint16)
+    pipeline = IspPipeline()
+    pipeline.set_frame(raw, "RGGB", "Bilinear", 10, (0, None))
+    pipeline.render(0, 0, 64, 0, 64)
+    stages = pipeline.regions[(0, 0, 64, 0, 64)]
+    linear, indices = stages["linear"], stages["indices"]
+
+    # Gamma: only the tone LUT changes
+    pipeline.set_params({"gamma": 1.0})
+    out = pipeline.render(0, 0, 64, 0, 64)
+    if stages["linear"] is not linear or stages["indices"] is not indices:
+        print("FAILURE: A gamma change should not re-run the demosaic or the CCM.")
+        sys.exit(1)
+    if not np.array_equal(out, pipeline.tone_lut()[indices]):
+        print("FAILURE: Gamma change not applied.")
+        sys.exit(1)
+
+    # CCM: the demosaic is kept
+    pipeline.set_params({"ccm": CCM})
+    pipeline.render(0, 0, 64, 0, 64)
+    if stages["linear"] is not linear or stages["indices"] is indices:
+        print("FAILURE: A CCM change should re-run only the CCM stage.")
+        sys.exit(1)
+
+    # White balance and new frame content: everything again
+    pipeline.set_params({"wb_gains": WB, "ccm": IDENTITY_CCM})
+    pipeline.render(0, 0, 64, 0, 64)
+    if stages["linear"] is linear:
+        print("FAILURE: A WB change should re-run the demosaic.")
+        sys.exit(1)
+    pipeline.update_raw(raw.copy())
+    if pipeline.regions:
+        print("FAILURE: New frame content should drop the cached stages.")
+        sys.exit(1)
+    print("Success: Only the stages after a change re-run.")
+
+if __name__ == "__main__":
+    test_isp_matches_reference()
+    test_isp_bands_and_tiles()
+    test_isp_reruns_downstream_stages_only()
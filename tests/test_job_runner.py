@@ -0,0 +1,79 @@
+import numpy as np
+import sys
+import os
+import threading
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from algorithms.base import Algorithm
+from algorithms.manager import AlgorithmManager
+from algorithms.jobs import JobRunner
+
+class LegacyAlgorithm(Algorithm):
+    """run() without the context argument must keep working."""
+    name = "Legacy"
+    description = "Old style run signature."
+
+    def get_parameters(self):
+        return {}
+
+    def run(self, image_data, params):
+        return {"message": f"sum {int(image_data.sum())}"}
+
+def wait(job, timeout=30):
+    job.future.result(timeout=timeout)
+
+def test_job_runner_progress_and_cancel():
+    print("Testing background algorithm jobs...")
+    
+    manager = AlgorithmManager()
+    manager.register(LegacyAlgorithm())
+    runner = JobRunner(manager, max_workers=1)
+    
+    img = np.random.default_rng(0).integers(0, 1024, (512, 512)).astype(np.uint16)
+    
+    # Progress reaches 100% and the result comes back through on_done
+    progress = []
+    results = []
+    job = runner.submit("Bad Pixel Detection", img, {"threshold": 200, "pattern": "RGGB", "parallel": "Off"},
+                        key="canvas", on_progress=lambda f, t: progress.append(f), on_done=results.append)
+    wait(job)
+    if not results or "detections" not in results[0]:
+        print("FAILURE: No result delivered.")
+        sys.exit(1)
+    if not progress or progress[-1] != 1.0 or progress != sorted(progress):
+        print(f"FAILURE: Progress not monotonic to 1.0: {progress}")
+        sys.exit(1)
+    
+    # A new job with the same key cancels the running one
+    started = threading.Event()
+    events = []
+    first = runner.submit("Bad Pixel Detection", img, {"threshold": 200, "pattern": "RGGB", "parallel": "Off"},
+                          key="canvas", on_progress=lambda f, t: (started.set(), threading.Event().wait(0.01)),
+                          on_done=lambda r: events.append("first done"),
+                          on_cancelled=lambda: events.append("first cancelled"))
+    started.wait(10)
+    second = runner.submit("Legacy", img, {}, key="canvas", on_done=lambda r: events.append(r["message"]))
+    wait(first)
+    wait(second)
+    if not first.cancelled or events != ["first cancelled", f"sum {int(img.sum())}"]:
+        print(f"FAILURE: Stale job not cancelled cleanly: {events}")
+        sys.exit(1)
+    
+    # Explicit cancel of a temporal run over a long sequence
+    frames = np.zeros((2000, 64, 64), dtype=np.uint16)
+    cancelled = []
+    job = runner.submit("Temporal Defect Detection", frames, {}, key="seq",
+                        on_progress=lambda f, t: f > 0.05 and runner.cancel("seq"),
+                        on_cancelled=lambda: cancelled.append(True))
+    wait(job)
+    if cancelled != [True]:
+        print("FAILURE: Temporal job did not stop on cancel.")
+        sys.exit(1)
+    
+    runner.shutdown()
+    print("Success: Jobs report progress and cancel.")
+
+if __name__ == "__main__":
+    test_job_runner_progress_and_cancel()
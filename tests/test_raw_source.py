@@ -0,0 +1,61 @@
+import numpy as np
+import sys
+import os
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.raw_source import RawSource
+
+def test_raw_source_incremental_stages():
+    print("Testing RawSource stage caching...")
+    
+    width, height = 32, 16
+    img = (np.arange(width * height) % 4096).astype(np.uint16).reshape(height, width)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frame.raw")
+        img.tofile(path)
+        
+        source = RawSource(path)
+        params = {"width": width, "height": height, "bit_depth": 10, "pattern": "RGGB"}
+        
+        raw = source.raw(params)
+        display = source.display(params)
+        rgb = source.colorized(params)
+        
+        # Pattern change: same raw and display plane, new mosaic
+        params_bggr = dict(params, pattern="BGGR")
+        if source.raw(params_bggr) is not raw or source.display(params_bggr) is not display:
+            print("FAILURE: Pattern change recomputed upstream stages.")
+            sys.exit(1)
+        if source.colorized(params_bggr) is rgb:
+            print("FAILURE: Pattern change did not re-colorize.")
+            sys.exit(1)
+        
+        # Bit depth change within the uint16 container: raw reused, LUT reapplied
+        params_12 = dict(params, bit_depth=12)
+        if source.raw(params_12) is not raw:
+            print("FAILURE: Bit depth change re-decoded the frame.")
+            sys.exit(1)
+        if source.display(params_12) is display:
+            print("FAILURE: Bit depth change kept the old display plane.")
+            sys.exit(1)
+        
+        # Width change: reinterpretation of the mapped bytes
+        params_wide = dict(params, width=width * 2, height=height // 2)
+        if not np.array_equal(source.raw(params_wide), img.reshape(height // 2, width * 2)):
+            print("FAILURE: Reinterpreted frame is wrong.")
+            sys.exit(1)
+        
+        if source.colorized(dict(params, pattern="Mono/None")) is not None:
+            print("FAILURE: Mono data should not be colorized.")
+            sys.exit(1)
+        
+        del source, raw, display, rgb
+    
+    print("Success: Only changed stages were recomputed.")
+
+if __name__ == "__main__":
+    test_raw_source_incremental_stages()
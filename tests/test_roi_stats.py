@@ -0,0 +1,85 @@
+import numpy as np
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.roi_stats import RoiStats, same_color_neighborhood
+
+def test_roi_stats_match_direct():
+    print("Testing ROI statistics from summed-area tables...")
+
+    rng = np.random.default_rng(7)
+    img = rng.integers(0, 65536, (101, 77)).astype(np.uint16)
+    stats = RoiStats(img, "RGGB")
+
+    # Odd origins and sizes hit every Bayer phase
+    for x0, y0, x1, y1 in [(0, 0, 77, 101), (3, 5, 4, 6), (1, 2, 40, 33), (10, 11, 13, 14), (-5, -5, 200, 200)]:
+        result = stats.query(x0, y0, x1, y1)
+        roi = img[max(y0, 0):y1, max(x0, 0):x1]
+        expected = []
+        for dy, dx in [(0, 0), (0, 1), (1, 0), (1, 1)]:
+            # Plane pixels of the frame phase (dy, dx) inside the ROI
+            ys = np.arange(max(y0, 0), min(y1, 101))
+            xs = np.arange(max(x0, 0), min(x1, 77))
+            plane = img[np.ix_(ys[ys % 2 == dy], xs[xs % 2 == dx])]
+            if plane.size:
+                expected.append(plane.astype(np.float64))
+        if len(expected) != len(result):
+            print(f"FAILURE: {len(result)} channels for ROI {(x0, y0, x1, y1)}, expected {len(expected)}")
+            sys.exit(1)
+        for channel, plane in zip(result, expected):
+            if (channel["count"] != plane.size or not np.isclose(channel["mean"], plane.mean())
+                    or not np.isclose(channel["std"], plane.std()) or channel["min"] != plane.min()
+                    or channel["max"] != plane.max()):
+                print(f"FAILURE: Wrong stats {channel} for ROI {(x0, y0, x1, y1)}")
+                sys.exit(1)
+
+    mono = RoiStats(img)
+    result = mono.query(5, 5, 25, 15)
+    if len(result) != 1 or result[0]["name"] != "Y" or not np.isclose(result[0]["mean"], img[5:15, 5:25].mean()):
+        print("FAILURE: Mono ROI stats wrong.")
+        sys.exit(1)
+    print("Success: ROI stats match direct computation.")
+
+def test_roi_query_constant_time():
+    print("Testing ROI query cost...")
+
+    img = np.random.default_rng(0).integers(0, 4096, (2048, 2048)).astype(np.uint16)
+    stats = RoiStats(img, "BGGR")
+    start = time.perf_counter()
+    for _ in range(1000):
+        result = stats.query(1, 1, 2047, 2047, extrema=False)
+    elapsed = (time.perf_counter() - start) / 1000
+    print(f"  {elapsed * 1e6:.1f} us per full-frame query")
+    region = img[1:2047, 1:2047]
+    for channel, (dy, dx) in zip(result, [(1, 1), (1, 0), (0, 1), (0, 0)]):
+        # Region starts at odd (1, 1): its first pixel is the frame's B
+        plane = region[dy::2, dx::2]
+        if channel["count"] != plane.size or not np.isclose(channel["mean"], plane.mean()):
+            print(f"FAILURE: Full-frame query wrong for {channel['name']}.")
+            sys.exit(1)
+    print("Success: ROI queries are lookups.")
+
+def test_same_color_neighborhood():
+    print("Testing same-color neighborhood...")
+
+    img = np.arange(100, dtype=np.uint16).reshape(10, 10)
+    values, valid = same_color_neighborhood(img, 1, 2, 3, "RGGB")
+    # Same color = 2 pixels apart; x - 2 is outside the frame
+    expected = np.array([[0, 1, 3], [0, 21, 23], [0, 41, 43]])
+    if not np.array_equal(valid[:, 0], [False] * 3) or not np.array_equal(values[:, 1:], expected[:, 1:]):
+        print(f"FAILURE: Wrong Bayer neighborhood\n{values}\n{valid}")
+        sys.exit(1)
+    values, valid = same_color_neighborhood(img, 5, 5, 3)
+    if not valid.all() or not np.array_equal(values, img[4:7, 4:7]):
+        print("FAILURE: Wrong mono neighborhood.")
+        sys.exit(1)
+    print("Success: Neighborhood follows the Bayer phase.")
+
+if __name__ == "__main__":
+    test_roi_stats_match_direct()
+    test_roi_query_constant_time()
+    test_same_color_neighborhood()
@@ -0,0 +1,66 @@
+import numpy as np
+import sys
+import os
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from algorithms.base import KIND_HOT, KIND_STUCK, KIND_FLICKER, KIND_RTS
+from algorithms.temporal import TemporalDefectDetectionAlgorithm
+from utils.raw_source import RawSource
+
+def make_dark_stack(frames=60, height=32, width=40, seed=0):
+    rng = np.random.default_rng(seed)
+    stack = rng.normal(64, 2, size=(frames, height, width))
+    # Green channels a bit brighter, must not be flagged
+    stack[:, 0::2, 1::2] += 10
+    stack[:, 1::2, 0::2] += 10
+    
+    stack[:, 5, 7] += 300                              # hot
+    stack[:, 12, 20] = 64                              # stuck
+    stack[:, 20, 9] += rng.normal(0, 40, size=frames)  # flicker
+    stack[:, 25, 30] += np.repeat([0, 60], 5)[np.arange(frames) % 10]  # RTS, two levels
+    return np.clip(np.rint(stack), 0, 1023).astype(np.uint16)
+
+def test_temporal_stats_and_classes():
+    print("Testing temporal defect detection...")
+    
+    stack = make_dark_stack()
+    algo = TemporalDefectDetectionAlgorithm()
+    
+    stats = algo.accumulate(stack, jump=20)
+    if not np.allclose(stats.mean, stack.mean(axis=0)) or not np.allclose(stats.variance(), stack.var(axis=0, ddof=1)):
+        print("FAILURE: Streaming mean/variance differ from the batch result.")
+        sys.exit(1)
+    if not np.array_equal(stats.min, stack.min(axis=0)) or not np.array_equal(stats.max, stack.max(axis=0)):
+        print("FAILURE: Streaming min/max wrong.")
+        sys.exit(1)
+    
+    result = algo.run(stack, {"threshold": 6.0, "jump": 20, "pattern": "RGGB"})
+    found = {(int(d["x"]), int(d["y"])): int(d["kind"]) for d in result["detections"]}
+    expected = {(7, 5): KIND_HOT, (20, 12): KIND_STUCK, (9, 20): KIND_FLICKER, (30, 25): KIND_RTS}
+    for xy, kind in expected.items():
+        if found.get(xy) != kind:
+            print(f"FAILURE: Pixel {xy} expected kind {kind}, got {found.get(xy)}")
+            sys.exit(1)
+    if len(found) > len(expected) + 2:
+        print(f"FAILURE: Too many false positives: {found}")
+        sys.exit(1)
+    
+    # Same result streaming from a multi-frame file
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dark.raw")
+        stack.tofile(path)
+        source = RawSource(path)
+        frames = source.sequence({"width": 40, "height": 32, "bit_depth": 10})
+        from_file = algo.run(frames, {"threshold": 6.0, "jump": 20, "pattern": "RGGB"})
+        if not np.array_equal(from_file["detections"], result["detections"]):
+            print("FAILURE: FrameSequence run differs from the in-memory stack.")
+            sys.exit(1)
+        del source, frames
+    
+    print(f"Success: {result['message']}")
+
+if __name__ == "__main__":
+    test_temporal_stats_and_classes()
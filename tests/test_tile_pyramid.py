@@ -0,0 +1,50 @@
+import numpy as np
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ui.tile_cache import TilePyramid, QImageTileSource, array_to_qimage
+
+class CountingSource(QImageTileSource):
+    def __init__(self, image):
+        super().__init__(image)
+        self.rendered = []
+
+    def render_tile(self, level, rect):
+        self.rendered.append(level)
+        return super().render_tile(level, rect)
+
+def test_coarse_levels_from_finer_tiles():
+    print("Testing pyramid levels built from the level below...")
+
+    data = np.random.default_rng(6).integers(0, 256, (700, 1100)).astype(np.uint8)
+    source = CountingSource(array_to_qimage(data))
+    pyramid = TilePyramid(source, tile_size=64)
+    direct = QImageTileSource(source.image)
+
+    for level in range(pyramid.max_level, 0, -1):
+        span = pyramid.tile_size * 2 ** level
+        for ty in range(-(-700 // span)):
+            for tx in range(-(-1100 // span)):
+                tile = pyramid.get_tile(level, tx, ty)
+                expected = direct.render_tile(level, pyramid.tile_rect(level, tx, ty))
+                if tile.size() != expected.size() or tile.format() != expected.format():
+                    print(f"FAILURE: Tile {level} ({tx}, {ty}) is {tile.size()}, expected {expected.size()}")
+                    sys.exit(1)
+
+    # Only level 1 reads the full-resolution image, each of its tiles once
+    if set(source.rendered) != {1} or len(source.rendered) != 6 * 9:
+        print(f"FAILURE: Source rendered levels {sorted(set(source.rendered))} ({len(source.rendered)} tiles)")
+        sys.exit(1)
+
+    # Edits still reach the composed levels
+    pyramid.invalidate_points([1099], [699])
+    if any(key in pyramid.tiles for key in [(1, 8, 5), (2, 4, 2), (pyramid.max_level, 0, 0)]):
+        print("FAILURE: Composed tiles over an edited pixel were kept.")
+        sys.exit(1)
+    print("Success: Coarse tiles are halved from their children.")
+
+if __name__ == "__main__":
+    test_coarse_levels_from_finer_tiles()
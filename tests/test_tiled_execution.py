@@ -0,0 +1,97 @@
+import numpy as np
+import sys
+import os
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from algorithms.bad_pixel import BadPixelDetectionAlgorithm
+from algorithms.bad_line import BadLineDetectionAlgorithm
+
+def make_frame(height, width):
+    rng = np.random.default_rng(3)
+    img = rng.integers(900, 1100, (height, width)).astype(np.uint16)
+    # Defects near band edges and frame borders
+    for y, x in [(0, 5), (1, 7), (31, 40), (32, 41), (33, 2), (63, 63), (64, 10), (height - 1, width - 2)]:
+        img[y, x] = 4000
+    img[50, :] += 400 # Bad row
+    img[:, 21] += 400 # Bad col
+    return img
+
+def test_tiled_bad_pixel_matches_whole_frame():
+    print("Testing tiled bad pixel detection...")
+    
+    algo = BadPixelDetectionAlgorithm()
+    img = make_frame(131, 96)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frame.raw")
+        img.tofile(path)
+        source = np.memmap(path, dtype=np.uint16, mode='r', shape=img.shape)
+        
+        for pattern in ["Mono/None", "GRBG"]:
+            params = {"threshold": 500, "pattern": pattern}
+            whole = algo.run(img, params)
+            
+            # Budget small enough for many bands
+            mask_out = np.zeros(img.shape, dtype=bool)
+            tiled = algo.run_tiled(source, params, memory_budget=96 * 16 * 12, mask_out=mask_out)
+            
+            if not np.array_equal(whole["detections"], tiled["detections"]):
+                print(f"FAILURE: Tiled detections differ ({pattern}).")
+                sys.exit(1)
+            if not np.array_equal(whole["mask"], mask_out):
+                print(f"FAILURE: Tiled mask differs ({pattern}).")
+                sys.exit(1)
+            
+            # Correction mode: bands stitch into the same corrected frame
+            params["visualize_only"] = False
+            whole = algo.run(img, params)
+            image_out = np.memmap(os.path.join(tmp, "corrected.raw"), dtype=np.uint16, mode='w+', shape=img.shape)
+            tiled = algo.run_tiled(source, params, memory_budget=96 * 16 * 12, image_out=image_out)
+            if tiled["image"] is not image_out or not np.array_equal(whole["image"], image_out):
+                print(f"FAILURE: Tiled correction differs ({pattern}).")
+                sys.exit(1)
+            del tiled, image_out
+            
+            # Without image_out: no full-frame copy, the replaced pixels only
+            tiled = algo.run_tiled(source, params, memory_budget=96 * 16 * 12)
+            if tiled["image"] is not source:
+                print(f"FAILURE: Tiled correction allocated a frame ({pattern}).")
+                sys.exit(1)
+            patched = img.copy()
+            fixes = tiled["corrections"]
+            patched[fixes["y"], fixes["x"]] = fixes["value"]
+            if not np.array_equal(whole["image"], patched) or len(fixes) != len(whole["detections"]):
+                print(f"FAILURE: Tiled corrections differ ({pattern}).")
+                sys.exit(1)
+            del tiled
+        
+        del source
+    
+    print("Success: Tiled bad pixel detection identical.")
+
+def test_tiled_bad_line_matches_whole_frame():
+    print("Testing tiled bad line detection...")
+    
+    algo = BadLineDetectionAlgorithm()
+    img = make_frame(131, 96)
+    
+    for pattern in ["Mono/None", "BGGR"]:
+        params = {"threshold": 100, "axis": "Both", "pattern": pattern}
+        whole = algo.run(img, params)
+        tiled = algo.run_tiled(img, params, memory_budget=96 * 32 * 10)
+        
+        if sorted(o["coords"] for o in whole["overlays"]) != sorted(o["coords"] for o in tiled["overlays"]):
+            print(f"FAILURE: Tiled lines differ ({pattern}).")
+            sys.exit(1)
+        if not whole["overlays"]:
+            print("FAILURE: Expected bad lines.")
+            sys.exit(1)
+    
+    print("Success: Tiled bad line detection identical.")
+
+if __name__ == "__main__":
+    test_tiled_bad_pixel_matches_whole_frame()
+    test_tiled_bad_line_matches_whole_frame()
@@ -1,49 +1,155 @@
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtCore import Qt, QPoint, QRectF, pyqtSignal
-from PyQt6.QtGui import QPainter, QImage, QPaintEvent, QColor, QPen, QFont, QPalette
+from PyQt6.QtCore import Qt, QPoint, QPointF, QRect, QRectF, QLineF, QTimer, pyqtSignal
+from PyQt6.QtGui import QPainter, QImage, QPaintEvent, QColor, QPen, QPalette
 import numpy as np
 
+from ui.tile_cache import TilePyramid, QImageTileSource
+from ui.glyph_cache import GlyphCache
+from ui.overlays import OverlayStore
+from utils.roi_stats import RoiStats
+
+# Channel (0=R, 1=G, 2=B) at [row parity][col parity] for each Bayer pattern
+BAYER_CHANNELS = {
+    "RGGB": ((0, 1),  # R G
+             (1, 2)), # G B
+    "BGGR": ((2, 1),  # B G
+             (1, 0)), # G R
+    "GRBG": ((1, 0),  # G R
+             (2, 1)), # B G
+    "GBRG": ((1, 2),  # G B
+             (0, 1))  # R G
+}
+
 class ImageCanvas(QWidget):
     # Signal to report pixel info (x, y, value) to status bar
     pixel_hovered = pyqtSignal(str)
     view_changed = pyqtSignal(float, QPoint)
+    pixel_inspected = pyqtSignal(int, int) # Pixel under the cursor, at most once per display refresh
+    roi_changed = pyqtSignal(object, object) # (x0, y0, x1, y1) or None, RoiStats.query result
+    
+    # Min/max are reduced over the ROI itself; above this size only on release
+    LIVE_EXTREMA_PIXELS = 4 * 1024 * 1024
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.image = None # This will hold the QImage for display
         self.raw_data = None # This will hold the original raw numpy array
         self.pattern = None # Bayer pattern
-        self.overlays = [] # List of overlays to draw
+        self.overlays = OverlayStore() # Overlays to draw, grouped by type/color
+        self.pyramid = None # Tile cache / mip levels behind self.image
+        self.glyph_cache = GlyphCache() # Rendered pixel value labels
+        self.roi = None # (x0, y0, x1, y1) in image pixels, end exclusive
+        self.roi_stats = None # Summed-area tables of raw_data, built on first ROI
         
         # Interaction state
         self.scale = 1.0
         self.offset = QPoint(0, 0)
         self.last_mouse_pos = QPoint()
         self.is_panning = False
+        self.is_selecting = False
+        self.roi_anchor = None
+        self.hover_pixel = None
+        
+        # Hover / ROI updates are coalesced to the display refresh rate
+        self.inspect_timer = QTimer(self)
+        self.inspect_timer.setSingleShot(True)
+        self.inspect_timer.setInterval(16)
+        self.inspect_timer.timeout.connect(self.flush_inspection)
+        self.roi_dirty = False
         
         self.setMouseTracking(True) # Enable mouse tracking for pixel info
         self.setBackgroundRole(QPalette.ColorRole.NoRole) # Handle background painting manually
         
-    def set_image(self, q_image, raw_data, pattern=None):
-        self.image = q_image
+    def set_image(self, q_image, raw_data, pattern=None, keep_view=False):
+        # keep_view: swap the content but keep zoom/pan (stepping through frames)
+        self.set_source(QImageTileSource(q_image) if q_image is not None else None, raw_data, pattern, keep_view)
+
+    def set_source(self, source, raw_data=None, pattern=None, keep_view=False):
+        """
+        Shows the tiles of `source` (width(), height(), render_tile(), see
+        ui.tile_cache), rendered lazily as they come into view. self.image
+        is the QImage behind it, None for computed sources.
+        """
+        self.image = getattr(source, "image", None)
+        self.pyramid = TilePyramid(source) if source is not None else None
         self.raw_data = raw_data
         self.pattern = pattern
+        self.roi_stats = None
+        if keep_view:
+            self.refresh_roi() # Same region on the new frame
+            self.update()
+            return
+        self.roi = None
+        self.roi_changed.emit(None, None)
         self.scale = 1.0
         self.offset = QPoint(0, 0)
         
         # Center image initially
-        if self.image:
+        if self.pyramid is not None:
              # Logic to center can go here, or just reset to 0,0
              pass
         self.update()
         self.view_changed.emit(self.scale, self.offset)
 
+    def update_pixels(self, raw_data, xs, ys, values):
+        """
+        Replaces raw_data and patches the displayed image in place at the
+        pixels xs, ys with the 8-bit display values. Only the tiles holding
+        those pixels are re-rendered.
+        """
+        self.raw_data = raw_data
+        self.roi_stats = None
+        self.refresh_roi()
+        
+        source = self.pyramid.source if self.pyramid is not None else None
+        if self.image is None and hasattr(source, "update_raw"):
+            # Computed tiles (demosaic) read the raw frame: re-render the
+            # tiles within the source's halo of the changed pixels
+            source.update_raw(raw_data)
+            halo = getattr(source, "halo", 0)
+            xs, ys = np.asarray(xs), np.asarray(ys)
+            corner_xs = np.clip(np.concatenate([xs - halo, xs + halo, xs - halo, xs + halo]), 0, source.width() - 1)
+            corner_ys = np.clip(np.concatenate([ys - halo, ys - halo, ys + halo, ys + halo]), 0, source.height() - 1)
+            self.pyramid.invalidate_points(corner_xs, corner_ys)
+            self.update()
+            return
+        if self.image is None or len(xs) == 0:
+            self.update()
+            return
+        
+        # Writable view of the QImage rows (bytesPerLine may include padding)
+        ptr = self.image.bits()
+        ptr.setsize(self.image.sizeInBytes())
+        pixels = np.frombuffer(ptr, dtype=np.uint8).reshape(self.image.height(), self.image.bytesPerLine())
+        
+        if self.image.format() == QImage.Format.Format_RGB888:
+            # Mosaic: each pixel lives in the color channel of its Bayer site
+            table = np.array(BAYER_CHANNELS.get(self.pattern, ((1, 1), (1, 1))))
+            channel = table[ys % 2, xs % 2]
+            pixels[ys, xs * 3 + channel] = values
+        else:
+            pixels[ys, xs] = values
+        
+        if self.pyramid is not None:
+            self.pyramid.invalidate_points(xs, ys)
+        self.update()
+
+    def full_image(self):
+        """The whole frame as one QImage (rendered from the tile source if needed)."""
+        if self.image is not None or self.pyramid is None:
+            return self.image
+        source = self.pyramid.source
+        return source.render_tile(0, QRect(0, 0, source.width(), source.height()))
+
     def set_view_params(self, scale, offset):
         self.scale = scale
         self.offset = offset
         self.update()
 
     def set_overlays(self, overlays):
+        # Accepts an OverlayStore or the list-of-dicts format from Algorithm.run
+        if not isinstance(overlays, OverlayStore):
+            overlays = OverlayStore.from_dicts(overlays)
         self.overlays = overlays
         self.update()
 
@@ -51,7 +157,7 @@ class ImageCanvas(QWidget):
         painter = QPainter(self)
         painter.fillRect(self.rect(), Qt.GlobalColor.darkGray)
         
-        if self.image is None:
+        if self.pyramid is None:
             painter.setPen(Qt.GlobalColor.white)
             painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No Image Loaded")
             return
@@ -60,215 +166,184 @@ class ImageCanvas(QWidget):
         painter.translate(self.offset)
         painter.scale(self.scale, self.scale)
         
-        # Draw Image
-        painter.drawImage(0, 0, self.image)
+        # Draw Image (only the tiles in view, at the level matching the zoom)
+        self.pyramid.draw(painter, self.visible_image_rect(), self.scale)
         
         # Draw Overlays
         self.draw_overlays(painter)
         
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            pen_roi = QPen(QColor(255, 220, 0), 0, Qt.PenStyle.DashLine) # Cosmetic
+            painter.setPen(pen_roi)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.drawRect(QRectF(x0, y0, x1 - x0, y1 - y0))
+        
         # Draw Pixel Grid and Values if zoomed in enough
         # Threshold: e.g., when 1 pixel is at least 20 screen pixels
         if self.scale >= 20.0:
             self.draw_pixel_details(painter, event.rect())
             
-    def draw_pixel_details(self, painter, debug_rect):
-        # Calculate visible source rect to avoid iterating entire huge image
-        # Inverse transform map_from_viewport... 
-        # Simplified approach: iterate visible range
-        
-        # Get visible area in image coordinates
-        # visible view rect in widget coords is (0,0) to (width, height)
-        # map to image coords: (view_pos - offset) / scale
-        
+    def visible_image_rect(self):
+        """Returns the widget area in image coordinates (QRectF)."""
         widget_rect = self.rect()
+        return QRectF((-self.offset.x()) / self.scale,
+                      (-self.offset.y()) / self.scale,
+                      widget_rect.width() / self.scale,
+                      widget_rect.height() / self.scale)
+
+    def draw_pixel_details(self, painter, debug_rect):
+        # Only the visible window of pixels is considered
+        visible = self.visible_image_rect()
         
-        start_x = int((-self.offset.x()) / self.scale)
-        start_y = int((-self.offset.y()) / self.scale)
-        end_x = int((widget_rect.width() - self.offset.x()) / self.scale) + 1
-        end_y = int((widget_rect.height() - self.offset.y()) / self.scale) + 1
-        
-        # Clamp to image bounds
-        start_x = max(0, start_x)
-        start_y = max(0, start_y)
-        end_x = min(self.image.width(), end_x)
-        end_y = min(self.image.height(), end_y)
+        start_x = max(0, int(visible.left()))
+        start_y = max(0, int(visible.top()))
+        end_x = min(self.pyramid.source.width(), int(visible.right()) + 1)
+        end_y = min(self.pyramid.source.height(), int(visible.bottom()) + 1)
+        if start_x >= end_x or start_y >= end_y:
+            return
         
+        # Draw Grid: all lines in one batch, 0 width = cosmetic hairline
         pen_grid = QPen(QColor(100, 100, 100, 128))
-        pen_grid.setWidthF(1.0 / self.scale) # Keep line width const relative to screen? Or just 0 cosmetic?
-        # Actually 0 width is 'cosmetic' (1 pixel wide always), but strictly we might want scaling.
-        # Let's use 0 for hairline.
         pen_grid.setWidth(0)
         painter.setPen(pen_grid)
         
-        font = painter.font()
-        font.setPointSizeF(8) # Fixed font size? No, we transform, so font scales too?
-        # If we use painter.scale, everything scales. So text "123" will become huge.
-        # usually we want text to stay readable size.
-        # So we should perhaps reset transform for text, or use constant pixel size.
-        # Or, we just let it scale if we want it to be "part of the pixel".
-        # Required: "Show pixel value". Usually implies readable text inside the pixel box.
-        # If scale is 20, a pixel is 20x20. Text size 8-10 is fine.
-        # But if scale is 50, text 10 is too small? No, scale applies to font size too technically if using painter.drawText.
-        # Wait, if I do painter.scale(20, 20) and drawText with font 10, the text will be 200 units high? Yes.
-        # So we need to scale the font DOWN or draw text in inverse transform.
-        
-        # Better approach for text: do not rely on painter scaling for text if we want fixed screen size,
-        # OR set font pixel size to something small like 0.4 if we want it to fit in 1.0 box?
-        # Let's try: font size = 0.4 (relative to pixel size 1.0).
-        font.setPixelSize(1) # Too big? Pixel is 1x1. Font size should be e.g. 0.5 units height?
-        # QFont setPointSizeF doesn't allow < 1 easily or might behave weird.
-        # Let's use simpler approach: Only draw lines here relative to image.
-        
-        # Draw Grid
-        # Vertical lines
-        for x in range(start_x, end_x + 1):
-            painter.drawLine(x, start_y, x, end_y)
-        # Horizontal lines
-        for y in range(start_y, end_y + 1):
-            painter.drawLine(start_x, y, end_x, y)
+        grid = [QLineF(x, start_y, x, end_y) for x in range(start_x, end_x + 1)]
+        grid += [QLineF(start_x, y, end_x, y) for y in range(start_y, end_y + 1)]
+        painter.drawLines(grid)
             
         # Draw Text
         # We need check if raw_data exists and matches dimensions
-        if self.raw_data is not None:
-             painter.save()
-             painter.resetTransform()
-             
-             # Set font for screen coordinates
-             f = QFont("Monospace")
-             f.setPixelSize(12) # 12px on screen
-             f.setBold(True)
-             painter.setFont(f)
-             
-             for y in range(start_y, end_y):
-                 for x in range(start_x, end_x):
-                     if y < self.raw_data.shape[0] and x < self.raw_data.shape[1]:
-                         val = self.raw_data[y, x]
-                         # Calculate screen position
-                         sx = x * self.scale + self.offset.x()
-                         sy = y * self.scale + self.offset.y()
-                         
-                         rect = QRectF(sx, sy, self.scale, self.scale)
-                         
-                         # Determine Color
-                         text_color = QColor(255, 255, 0) # Default Yellow
-                         if self.pattern and self.pattern not in ["Mono/None", None]:
-                             channel = self.get_bayer_channel(x, y, self.pattern)
-                             if channel == 0: # R
-                                 text_color = QColor(255, 80, 80)
-                             elif channel == 1: # G
-                                 text_color = QColor(80, 255, 80)
-                             elif channel == 2: # B
-                                 text_color = QColor(80, 80, 255)
-                         
-                         # Draw Shadow/Outline for visibility
-                         shadow_offset = 1
-                         painter.setPen(Qt.GlobalColor.black)
-                         # Draw shadow at +1, +1
-                         shadow_rect = rect.translated(shadow_offset, shadow_offset)
-                         painter.drawText(shadow_rect, Qt.AlignmentFlag.AlignCenter, str(val))
-                         
-                         # Draw Main Text
-                         painter.setPen(text_color)
-                         painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, str(val))
-             
-             painter.restore()
-
-    def draw_overlays(self, painter):
-        if not self.overlays:
+        if self.raw_data is None:
             return
-
-        painter.save()
-        # Transform already applied in paintEvent
+        end_x = min(end_x, self.raw_data.shape[1])
+        end_y = min(end_y, self.raw_data.shape[0])
         
-        # We need to ensure pen width is consistent regardless of scale or not? 
-        # Usually we want marked pixels to look like marked pixels.
-        # But if we draw a point at x,y with size 1, it will scale with the image.
+        # Values, channels and screen positions of the window in one NumPy pass
+        values = np.asarray(self.raw_data[start_y:end_y, start_x:end_x])
+        xs = np.arange(start_x, end_x)
+        ys = np.arange(start_y, end_y)
         
-        # Common requirement: "Crosshair" or "Box" around the pixel.
+        if self.pattern and self.pattern in BAYER_CHANNELS:
+            channel_map = np.array(BAYER_CHANNELS[self.pattern.upper()])
+            channels = channel_map[(ys % 2)[:, None], (xs % 2)[None, :]]
+        else:
+            channels = np.full(values.shape, -1)
         
-        for overlay in self.overlays:
-            color_name = overlay.get("color", "red")
-            color = QColor(color_name)
-            pen = QPen(color)
-            
-            # Make line width independent of scale?
-            # pen.setWidthF(1.0 / self.scale) 
-            # If we want a 2px boundary around a pixel regardless of zoom? No, usually we want it to wrap the pixel in image space.
-            # So width 0 or 1.0 in image space is correct.
-            pen.setWidthF(1.0) # 1 pixel in image coordinates
-            painter.setPen(pen)
-            painter.setBrush(Qt.BrushStyle.NoBrush)
-
-            otype = overlay.get("type")
-            coords = overlay.get("coords")
-            
-            if otype == "point":
-                x, y = coords
-                # Draw a rect around the pixel
-                painter.drawRect(QRectF(x, y, 1, 1))
-            elif otype == "line":
-                x1, y1, x2, y2 = coords
-                painter.drawLine(QPoint(int(x1), int(y1)), QPoint(int(x2), int(y2)))
-            elif otype == "rect":
-                x, y, w, h = coords
-                painter.drawRect(QRectF(x, y, w, h))
-                
+        screen_x = xs * self.scale + self.offset.x()
+        screen_y = ys * self.scale + self.offset.y()
+        screen_x, screen_y = np.meshgrid(screen_x, screen_y)
+        
+        self.glyph_cache.set_device_pixel_ratio(self.devicePixelRatioF())
+        get_glyph = self.glyph_cache.get
+        cell = self.scale
+        
+        # Text is drawn in screen coordinates so it keeps a readable size
+        painter.save()
+        painter.resetTransform()
+        for sx, sy, val, channel in zip(screen_x.ravel().tolist(), screen_y.ravel().tolist(),
+                                        values.ravel().tolist(), channels.ravel().tolist()):
+            glyph = get_glyph(val, channel)
+            size = glyph.deviceIndependentSize()
+            painter.drawPixmap(QPointF(sx + (cell - size.width()) / 2, sy + (cell - size.height()) / 2), glyph)
         painter.restore()
 
+    def draw_overlays(self, painter):
+        # Transform already applied in paintEvent
+        self.overlays.draw(painter, self.visible_image_rect(), self.scale)
+
     def get_bayer_channel(self, x, y, pattern):
         # 0=R, 1=G, 2=B
-        pattern = pattern.upper()
+        channels = BAYER_CHANNELS.get(pattern.upper())
+        if channels is None:
+            return -1
         # Row parity, Col parity
-        r = y % 2
-        c = x % 2
-        
-        if pattern == "RGGB":
-            # R G
-            # G B
-            if r == 0: return 0 if c == 0 else 1
-            else:      return 1 if c == 0 else 2
-            
-        elif pattern == "BGGR":
-            # B G
-            # G R
-            if r == 0: return 2 if c == 0 else 1
-            else:      return 1 if c == 0 else 0
+        return channels[y % 2][x % 2]
 
-        elif pattern == "GRBG":
-            # G R
-            # B G
-            if r == 0: return 1 if c == 0 else 0
-            else:      return 2 if c == 0 else 1
-            
-        elif pattern == "GBRG":
-            # G B
-            # R G
-            if r == 0: return 1 if c == 0 else 2
-            else:      return 0 if c == 0 else 1
-            
-        return -1
+    def image_pixel(self, pos):
+        """Widget position -> (x, y) image pixel (may be outside the image)."""
+        return (int(np.floor((pos.x() - self.offset.x()) / self.scale)),
+                int(np.floor((pos.y() - self.offset.y()) / self.scale)))
+
+    def set_roi(self, roi):
+        """Sets the ROI rectangle (x0, y0, x1, y1), None clears it."""
+        if roi is not None and self.raw_data is not None:
+            height, width = self.raw_data.shape
+            x0, y0, x1, y1 = roi
+            roi = (max(x0, 0), max(y0, 0), min(x1, width), min(y1, height))
+            if roi[0] >= roi[2] or roi[1] >= roi[3]:
+                roi = None
+        self.roi = roi
+        self.refresh_roi(extrema=True)
+        self.update()
+
+    def refresh_roi(self, extrema=True):
+        """Emits roi_changed with the stats of the current ROI."""
+        if self.roi is None or self.raw_data is None:
+            self.roi_changed.emit(None, None)
+            return
+        if self.roi_stats is None:
+            self.roi_stats = RoiStats(self.raw_data, self.pattern)
+        x0, y0, x1, y1 = self.roi
+        if (x1 - x0) * (y1 - y0) > self.LIVE_EXTREMA_PIXELS:
+            extrema = extrema and not self.is_selecting
+        self.roi_changed.emit(self.roi, self.roi_stats.query(x0, y0, x1, y1, extrema=extrema))
+
+    def schedule_inspection(self):
+        if not self.inspect_timer.isActive():
+            screen = self.screen()
+            if screen is not None and screen.refreshRate() > 0:
+                self.inspect_timer.setInterval(max(int(1000 / screen.refreshRate()), 1))
+            self.inspect_timer.start()
+
+    def flush_inspection(self):
+        if self.roi_dirty:
+            self.roi_dirty = False
+            self.refresh_roi()
+        if self.hover_pixel is not None:
+            self.pixel_inspected.emit(*self.hover_pixel)
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
+        if (event.button() == Qt.MouseButton.LeftButton and self.raw_data is not None
+                and event.modifiers() & Qt.KeyboardModifier.ShiftModifier):
+            # Shift+drag selects a ROI, a click without drag clears it
+            self.is_selecting = True
+            self.roi_anchor = self.image_pixel(event.pos())
+            self.set_roi(None)
+            self.setCursor(Qt.CursorShape.CrossCursor)
+        elif event.button() == Qt.MouseButton.LeftButton:
             self.is_panning = True
             self.last_mouse_pos = event.pos()
             self.setCursor(Qt.CursorShape.ClosedHandCursor)
 
     def mouseMoveEvent(self, event):
         # Update status bar info
-        if self.image:
+        if self.pyramid is not None:
              # Calculate pixel coord
              img_x = int((event.pos().x() - self.offset.x()) / self.scale)
              img_y = int((event.pos().y() - self.offset.y()) / self.scale)
              
-             if 0 <= img_x < self.image.width() and 0 <= img_y < self.image.height():
+             if 0 <= img_x < self.pyramid.source.width() and 0 <= img_y < self.pyramid.source.height():
                  val = "N/A"
                  if self.raw_data is not None:
                      val = str(self.raw_data[img_y, img_x])
                  self.pixel_hovered.emit(f"X: {img_x}, Y: {img_y} | Value: {val}")
+                 if self.raw_data is not None and (img_x, img_y) != self.hover_pixel:
+                     self.hover_pixel = (img_x, img_y)
+                     self.schedule_inspection()
              else:
                  self.pixel_hovered.emit("")
 
+        # ROI selection: the rectangle follows at once, stats at refresh rate
+        if self.is_selecting:
+            x, y = self.image_pixel(event.pos())
+            ax, ay = self.roi_anchor
+            self.roi = (min(x, ax), min(y, ay), max(x, ax) + 1, max(y, ay) + 1)
+            self.roi_dirty = True
+            self.schedule_inspection()
+            self.update()
+            return
+
         # Pan logic
         if self.is_panning:
             delta = event.pos() - self.last_mouse_pos
@@ -278,7 +353,16 @@ class ImageCanvas(QWidget):
             self.view_changed.emit(self.scale, self.offset)
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
+        if event.button() == Qt.MouseButton.LeftButton and self.is_selecting:
+            self.is_selecting = False
+            self.roi_dirty = False
+            # A click without drag selects a single pixel: treat as clear
+            roi = self.roi
+            if roi is not None and (roi[2] - roi[0]) * (roi[3] - roi[1]) <= 1:
+                roi = None
+            self.set_roi(roi) # Final stats, with min/max
+            self.setCursor(Qt.CursorShape.ArrowCursor)
+        elif event.button() == Qt.MouseButton.LeftButton:
             self.is_panning = False
             self.setCursor(Qt.CursorShape.ArrowCursor)
 
@@ -0,0 +1,98 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QGroupBox, QLabel, QSpinBox, QComboBox,
+                             QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt6.QtCore import pyqtSignal
+
+from ui.tile_cache import DIFF_MODES
+
+METRIC_COLUMNS = ["Ch", "MAE", "RMSE", "PSNR (dB)", "Max", "Mismatch"]
+
+class ComparePanel(QWidget):
+    """
+    Sidebar tab for Compare Mode: difference view settings and the
+    per-channel metrics of main image vs reference.
+    """
+    view_settings_changed = pyqtSignal() # Mode / scale: re-render only
+    tolerance_changed = pyqtSignal(int) # Changes the mismatch mask: recompute
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+
+        group = QGroupBox("Difference View")
+        form = QFormLayout()
+
+        self.show_diff_check = QCheckBox("Show Difference View")
+        self.show_diff_check.setChecked(True)
+        self.show_diff_check.toggled.connect(self.view_settings_changed)
+        form.addRow(self.show_diff_check)
+
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(DIFF_MODES)
+        self.mode_combo.currentTextChanged.connect(self.view_settings_changed)
+        form.addRow("Mode:", self.mode_combo)
+
+        # DN shown as full white, 0 = the max error
+        self.scale_spin = QSpinBox()
+        self.scale_spin.setRange(0, 65535)
+        self.scale_spin.setSpecialValueText("Auto")
+        self.scale_spin.setKeyboardTracking(False)
+        self.scale_spin.valueChanged.connect(self.view_settings_changed)
+        form.addRow("Scale (DN):", self.scale_spin)
+
+        self.tolerance_spin = QSpinBox()
+        self.tolerance_spin.setRange(0, 65535)
+        self.tolerance_spin.setKeyboardTracking(False)
+        self.tolerance_spin.valueChanged.connect(self.tolerance_changed)
+        form.addRow("Tolerance (DN):", self.tolerance_spin)
+
+        group.setLayout(form)
+        layout.addWidget(group)
+
+        metrics_group = QGroupBox("Metrics")
+        metrics_layout = QVBoxLayout()
+        self.summary_label = QLabel("Enable Compare Mode and load a reference image.")
+        self.summary_label.setWordWrap(True)
+        metrics_layout.addWidget(self.summary_label)
+
+        self.metrics_table = QTableWidget(0, len(METRIC_COLUMNS))
+        self.metrics_table.setHorizontalHeaderLabels(METRIC_COLUMNS)
+        self.metrics_table.verticalHeader().setVisible(False)
+        self.metrics_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.metrics_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        metrics_layout.addWidget(self.metrics_table)
+        metrics_group.setLayout(metrics_layout)
+        layout.addWidget(metrics_group)
+
+        layout.addStretch()
+
+    def show_diff(self):
+        return self.show_diff_check.isChecked()
+
+    def mode(self):
+        return self.mode_combo.currentText()
+
+    def scale(self):
+        return self.scale_spin.value()
+
+    def tolerance(self):
+        return self.tolerance_spin.value()
+
+    def set_message(self, text):
+        self.summary_label.setText(text)
+        self.metrics_table.setRowCount(0)
+
+    def set_result(self, result):
+        """Shows a utils.diff_engine.compare_frames result."""
+        total = result["total"]
+        if total["max_error"] == 0:
+            self.summary_label.setText("Identical.")
+        else:
+            self.summary_label.setText(f"{total['mismatches']} of {total['count']} pixels differ by more than "
+                                       f"{self.tolerance()} DN, max error {total['max_error']}.")
+        rows = result["channels"] + [total]
+        self.metrics_table.setRowCount(len(rows))
+        for row, metrics in enumerate(rows):
+            cells = [metrics["name"], f"{metrics['mae']:.3f}", f"{metrics['rmse']:.3f}", f"{metrics['psnr']:.2f}",
+                     str(metrics["max_error"]), str(metrics["mismatches"])]
+            for column, text in enumerate(cells):
+                self.metrics_table.setItem(row, column, QTableWidgetItem(text))
@@ -2,6 +2,8 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QSpinBox, QComboBox, QDialogButtonBox, QFormLayout)
 from PyQt6.QtCore import Qt
 
+from utils.unpack import PACKED_FORMATS
+
 class ImageParamsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -30,6 +32,28 @@ class ImageParamsDialog(QDialog):
         self.bit_depth_combo.setCurrentText("10")
         form_layout.addRow("Bit Depth:", self.bit_depth_combo)
         
+        # Packing (MIPI CSI-2 packed formats fix the bit depth)
+        self.packing_combo = QComboBox()
+        self.packing_combo.addItems(["None"] + list(PACKED_FORMATS.keys()))
+        self.packing_combo.currentTextChanged.connect(self.on_packing_changed)
+        form_layout.addRow("Packing:", self.packing_combo)
+        
+        # Line Stride in bytes, 0 = no line padding
+        self.stride_spin = QSpinBox()
+        self.stride_spin.setRange(0, 1 << 20)
+        self.stride_spin.setSpecialValueText("Auto")
+        form_layout.addRow("Line Stride (bytes):", self.stride_spin)
+        
+        # Multi-frame files: header before each frame, distance between frames
+        self.frame_header_spin = QSpinBox()
+        self.frame_header_spin.setRange(0, (1 << 31) - 1)
+        form_layout.addRow("Frame Header (bytes):", self.frame_header_spin)
+        
+        self.frame_stride_spin = QSpinBox()
+        self.frame_stride_spin.setRange(0, (1 << 31) - 1)
+        self.frame_stride_spin.setSpecialValueText("Auto")
+        form_layout.addRow("Frame Stride (bytes):", self.frame_stride_spin)
+        
         # Bayer Pattern (Optional for now, but good to have)
         self.pattern_combo = QComboBox()
         self.pattern_combo.addItems(["RGGB", "GRBG", "GBRG", "BGGR", "Mono/None"])
@@ -43,10 +67,20 @@ class ImageParamsDialog(QDialog):
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
         
+    def on_packing_changed(self, packing):
+        fmt = PACKED_FORMATS.get(packing)
+        if fmt:
+            self.bit_depth_combo.setCurrentText(str(fmt["bit_depth"]))
+        self.bit_depth_combo.setEnabled(fmt is None)
+        
     def get_params(self):
         return {
             "width": self.width_spin.value(),
             "height": self.height_spin.value(),
             "bit_depth": int(self.bit_depth_combo.currentText()),
+            "packing": self.packing_combo.currentText(),
+            "stride": self.stride_spin.value(),
+            "frame_header": self.frame_header_spin.value(),
+            "frame_stride": self.frame_stride_spin.value(),
             "pattern": self.pattern_combo.currentText()
         }
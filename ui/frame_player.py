@@ -0,0 +1,145 @@
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QSlider, QSpinBox, QLabel, QPushButton
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from collections import OrderedDict
+
+class FrameCache:
+    """
+    LRU of decoded frames (QImage + raw array) of one sequence, bounded by
+    `budget_bytes`. `key` identifies the sequence and display settings the
+    frames were rendered with; reset() drops everything when it changes.
+    """
+    def __init__(self, budget_bytes=512 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.frames = OrderedDict() # frame index -> (QImage, raw_data, nbytes), oldest first
+        self.cached_bytes = 0
+        self.key = None
+
+    def reset(self, key=None):
+        self.frames.clear()
+        self.cached_bytes = 0
+        self.key = key
+
+    def __contains__(self, index):
+        return index in self.frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get(self, index):
+        """Returns (QImage, raw_data) or None."""
+        entry = self.frames.get(index)
+        if entry is None:
+            return None
+        self.frames.move_to_end(index)
+        return entry[0], entry[1]
+
+    def put(self, index, q_img, raw_data):
+        if index in self.frames:
+            self.cached_bytes -= self.frames.pop(index)[2]
+
+        # Unpacked raw frames are views of the file mapping and cost nothing
+        nbytes = q_img.sizeInBytes() + (raw_data.nbytes if raw_data.flags.owndata else 0)
+        self.frames[index] = (q_img, raw_data, nbytes)
+        self.cached_bytes += nbytes
+
+        while self.cached_bytes > self.budget_bytes and len(self.frames) > 1:
+            _, (_, _, evicted) = self.frames.popitem(last=False)
+            self.cached_bytes -= evicted
+
+class FrameScrubber(QWidget):
+    """
+    Slider + play controls for multi-frame files.
+    Emits frame_changed whenever the current frame changes (dragging,
+    stepping or playback). During playback a tick is dropped while the owner
+    reports it is still waiting for the previous frame (set_waiting), so a
+    slow decode lowers the frame rate instead of queueing loads.
+    """
+    frame_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.waiting = False
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(4, 0, 4, 0)
+
+        self.play_btn = QPushButton("Play")
+        self.play_btn.setCheckable(True)
+        self.play_btn.toggled.connect(self.set_playing)
+        layout.addWidget(self.play_btn)
+
+        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.slider.valueChanged.connect(self.on_value_changed)
+        layout.addWidget(self.slider, 1)
+
+        self.frame_spin = QSpinBox()
+        self.frame_spin.setKeyboardTracking(False)
+        self.frame_spin.valueChanged.connect(self.slider.setValue)
+        layout.addWidget(self.frame_spin)
+
+        self.count_label = QLabel("/ 0")
+        layout.addWidget(self.count_label)
+
+        self.fps_spin = QSpinBox()
+        self.fps_spin.setRange(1, 120)
+        self.fps_spin.setValue(30)
+        self.fps_spin.setSuffix(" fps")
+        self.fps_spin.valueChanged.connect(self.on_fps_changed)
+        layout.addWidget(self.fps_spin)
+
+        self.play_timer = QTimer(self)
+        self.play_timer.setInterval(1000 // self.fps_spin.value())
+        self.play_timer.timeout.connect(self.on_tick)
+
+        self.set_frame_count(0)
+
+    @property
+    def frame_count(self):
+        return self.slider.maximum() + 1
+
+    def current_frame(self):
+        return self.slider.value()
+
+    def is_playing(self):
+        return self.play_timer.isActive()
+
+    def set_frame_count(self, count, current=0):
+        """Updates the range without emitting frame_changed."""
+        self.blockSignals(True)
+        for widget in (self.slider, self.frame_spin):
+            widget.blockSignals(True)
+            widget.setRange(0, max(count - 1, 0))
+            widget.setValue(current)
+            widget.blockSignals(False)
+        self.blockSignals(False)
+        self.count_label.setText(f"/ {max(count - 1, 0)}")
+        if count <= 1:
+            self.play_btn.setChecked(False)
+
+    def set_waiting(self, waiting):
+        self.waiting = waiting
+
+    def set_playing(self, playing):
+        self.play_btn.setText("Pause" if playing else "Play")
+        if playing and self.frame_count > 1:
+            self.play_timer.start()
+        else:
+            self.play_timer.stop()
+
+    def step(self, delta):
+        # Loops around at both ends
+        self.slider.setValue((self.slider.value() + delta) % self.frame_count)
+
+    def on_tick(self):
+        if self.waiting:
+            return # Previous frame not on screen yet, drop this tick
+        self.step(1)
+
+    def on_fps_changed(self, fps):
+        self.play_timer.setInterval(1000 // fps)
+
+    def on_value_changed(self, value):
+        self.frame_spin.blockSignals(True)
+        self.frame_spin.setValue(value)
+        self.frame_spin.blockSignals(False)
+        self.frame_changed.emit(value)
@@ -0,0 +1,64 @@
+from PyQt6.QtCore import Qt, QRectF
+from PyQt6.QtGui import QPainter, QPixmap, QColor, QFont, QFontMetrics
+from collections import OrderedDict
+
+# Text colors per Bayer channel index (0=R, 1=G, 2=B, -1=mono/unknown)
+CHANNEL_TEXT_COLORS = {
+    0: QColor(255, 80, 80),
+    1: QColor(80, 255, 80),
+    2: QColor(80, 80, 255),
+    -1: QColor(255, 255, 0)
+}
+
+class GlyphCache:
+    """
+    Pre-rendered pixel value labels (text + 1px black shadow) keyed by
+    (value, channel), so repaints blit cached pixmaps instead of laying out
+    and rasterizing text twice per pixel.
+    """
+    def __init__(self, pixel_size=12, max_entries=8192):
+        self.font = QFont("Monospace")
+        self.font.setPixelSize(pixel_size) # 12px on screen
+        self.font.setBold(True)
+        self.metrics = QFontMetrics(self.font)
+        self.max_entries = max_entries
+        self.glyphs = OrderedDict()
+        self.device_pixel_ratio = 1.0
+
+    def set_device_pixel_ratio(self, ratio):
+        if ratio != self.device_pixel_ratio:
+            self.device_pixel_ratio = ratio
+            self.glyphs.clear()
+
+    def get(self, value, channel):
+        key = (value, channel)
+        glyph = self.glyphs.get(key)
+        if glyph is not None:
+            self.glyphs.move_to_end(key)
+            return glyph
+        
+        text = str(value)
+        shadow_offset = 1
+        w = self.metrics.horizontalAdvance(text) + shadow_offset
+        h = self.metrics.height() + shadow_offset
+        
+        ratio = self.device_pixel_ratio
+        glyph = QPixmap(int(w * ratio + 0.5), int(h * ratio + 0.5))
+        glyph.setDevicePixelRatio(ratio)
+        glyph.fill(Qt.GlobalColor.transparent)
+        
+        p = QPainter(glyph)
+        p.setFont(self.font)
+        rect = QRectF(0, 0, w - shadow_offset, h - shadow_offset)
+        # Draw Shadow/Outline for visibility
+        p.setPen(Qt.GlobalColor.black)
+        p.drawText(rect.translated(shadow_offset, shadow_offset), Qt.AlignmentFlag.AlignCenter, text)
+        # Draw Main Text
+        p.setPen(CHANNEL_TEXT_COLORS.get(channel, CHANNEL_TEXT_COLORS[-1]))
+        p.drawText(rect, Qt.AlignmentFlag.AlignCenter, text)
+        p.end()
+        
+        self.glyphs[key] = glyph
+        if len(self.glyphs) > self.max_entries:
+            self.glyphs.popitem(last=False)
+        return glyph
@@ -0,0 +1,67 @@
+from PyQt6.QtWidgets import QWidget, QSizePolicy
+from PyQt6.QtGui import QPainter, QColor, QPen, QPolygonF
+from PyQt6.QtCore import QPointF
+import numpy as np
+
+# Curve colors per pattern letter
+CHANNEL_COLORS = {
+    "R": QColor(230, 60, 60),
+    "G": QColor(60, 200, 60),
+    "B": QColor(70, 110, 255),
+    "Y": QColor(220, 220, 220)
+}
+
+class HistogramView(QWidget):
+    """
+    Log-scale per-channel histogram of the current frame over the bit
+    depth's code range, with the display window (black / white points)
+    marked and the clipped ranges shaded.
+    """
+    BINS = 256
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(100)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.curves = None # (channels, BINS) log counts normalized to 0..1
+        self.names = []
+        self.max_value = 1
+        self.window = (0, 1)
+
+    def set_histogram(self, histogram, bit_depth, window):
+        """histogram: ChannelHistogram (None clears), window: (black, white or None)."""
+        self.max_value = (1 << bit_depth) - 1
+        black, white = window
+        self.window = (black, self.max_value if white is None else white)
+        if histogram is None:
+            self.curves = None
+        else:
+            counts = np.log1p(histogram.binned(self.BINS, self.max_value).astype(np.float64))
+            peak = counts.max()
+            self.curves = counts / peak if peak > 0 else counts
+            self.names = histogram.channel_names
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(self.rect(), QColor(30, 30, 30))
+        if self.curves is None:
+            return
+
+        # Shade what the window clips to black / white
+        black_x = self.window[0] / self.max_value * width
+        white_x = min(self.window[1] / self.max_value, 1.0) * width
+        painter.fillRect(0, 0, int(black_x), height, QColor(0, 0, 0, 160))
+        painter.fillRect(int(white_x), 0, width - int(white_x), height, QColor(0, 0, 0, 160))
+
+        xs = (np.arange(self.BINS) + 0.5) / self.BINS * width
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        for curve, name in zip(self.curves, self.names):
+            ys = height - 1 - curve * (height - 4)
+            painter.setPen(QPen(CHANNEL_COLORS.get(name, CHANNEL_COLORS["Y"]), 1))
+            painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs, ys)]))
+
+        painter.setPen(QPen(QColor(255, 255, 255, 200), 1))
+        painter.drawLine(QPointF(black_x, 0), QPointF(black_x, height))
+        painter.drawLine(QPointF(white_x, 0), QPointF(white_x, height))
@@ -0,0 +1,102 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QGroupBox, QLabel, QSpinBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QColor
+
+ROI_COLUMNS = ["Ch", "Count", "Mean", "Std", "Min", "Max"]
+
+class InspectorPanel(QWidget):
+    """
+    Sidebar tab with the per-channel stats of the canvas ROI (Shift+drag)
+    and the same-color neighborhood of the pixel under the cursor.
+    """
+    size_changed = pyqtSignal(int) # Neighborhood size
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+
+        # ROI Stats
+        roi_group = QGroupBox("ROI Statistics")
+        roi_layout = QVBoxLayout()
+        self.roi_label = QLabel("Shift+drag on the image to select a region.")
+        self.roi_label.setWordWrap(True)
+        roi_layout.addWidget(self.roi_label)
+
+        self.roi_table = QTableWidget(0, len(ROI_COLUMNS))
+        self.roi_table.setHorizontalHeaderLabels(ROI_COLUMNS)
+        self.roi_table.verticalHeader().setVisible(False)
+        self.roi_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.roi_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        roi_layout.addWidget(self.roi_table)
+        roi_group.setLayout(roi_layout)
+        layout.addWidget(roi_group)
+
+        # Neighborhood Inspector
+        hood_group = QGroupBox("Neighborhood (same color)")
+        hood_layout = QVBoxLayout()
+        form = QFormLayout()
+        self.size_spin = QSpinBox()
+        self.size_spin.setRange(3, 15)
+        self.size_spin.setSingleStep(2) # Odd sizes, centered on the pixel
+        self.size_spin.setValue(5)
+        self.size_spin.valueChanged.connect(self.on_size_changed)
+        form.addRow("Size:", self.size_spin)
+        hood_layout.addLayout(form)
+
+        self.hood_label = QLabel("")
+        hood_layout.addWidget(self.hood_label)
+
+        self.hood_table = QTableWidget()
+        self.hood_table.horizontalHeader().setVisible(False)
+        self.hood_table.verticalHeader().setVisible(False)
+        self.hood_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        hood_layout.addWidget(self.hood_table)
+        hood_group.setLayout(hood_layout)
+        layout.addWidget(hood_group)
+
+        layout.addStretch()
+
+    def neighborhood_size(self):
+        return self.size_spin.value()
+
+    def on_size_changed(self, size):
+        if size % 2 == 0:
+            self.size_spin.setValue(size + 1) # Comes back here once
+            return
+        self.size_changed.emit(size)
+
+    def set_roi_stats(self, rect, stats):
+        """rect: (x0, y0, x1, y1) or None, stats: RoiStats.query result."""
+        if rect is None:
+            self.roi_label.setText("Shift+drag on the image to select a region.")
+            self.roi_table.setRowCount(0)
+            return
+        x0, y0, x1, y1 = rect
+        self.roi_label.setText(f"ROI: ({x0}, {y0}) - ({x1 - 1}, {y1 - 1}), {x1 - x0}x{y1 - y0}")
+        self.roi_table.setRowCount(len(stats))
+        for row, channel in enumerate(stats):
+            cells = [channel["name"], str(channel["count"]), f"{channel['mean']:.2f}", f"{channel['std']:.2f}",
+                     str(channel.get("min", "...")), str(channel.get("max", "..."))]
+            for column, text in enumerate(cells):
+                self.roi_table.setItem(row, column, QTableWidgetItem(text))
+
+    def set_neighborhood(self, x, y, values, valid):
+        """Shows the grid from utils.roi_stats.same_color_neighborhood, center highlighted."""
+        size = values.shape[0]
+        if self.hood_table.rowCount() != size:
+            self.hood_table.setRowCount(size)
+            self.hood_table.setColumnCount(size)
+            self.hood_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+
+        center = size // 2
+        for row in range(size):
+            for column in range(size):
+                item = QTableWidgetItem(str(values[row, column]) if valid[row, column] else "")
+                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                if row == center and column == center:
+                    item.setBackground(QColor(255, 220, 80))
+                self.hood_table.setItem(row, column, item)
+
+        neighbors = values[valid].astype(float)
+        self.hood_label.setText(f"X: {x}, Y: {y} | Mean: {neighbors.mean():.1f}, Std: {neighbors.std():.1f}")
@@ -1,18 +1,33 @@
-from PyQt6.QtWidgets import (QMainWindow, QFileDialog, QMessageBox, QLabel, QDockWidget, QSplitter)
-from PyQt6.QtGui import QImage, QAction
-from PyQt6.QtCore import Qt
-import numpy as np
+from PyQt6.QtWidgets import (QMainWindow, QFileDialog, QMessageBox, QLabel, QDockWidget, QSplitter,
+                             QProgressBar, QWidget, QVBoxLayout)
+from PyQt6.QtGui import QAction
+from PyQt6.QtCore import Qt, QThreadPool
 import os
+import numpy as np
 
-from ui.canvas import ImageCanvas
-from ui.dialogs import ImageParamsDialog
 from ui.canvas import ImageCanvas
 from ui.dialogs import ImageParamsDialog
 from ui.sidebar import ImageControlPanel, AlgorithmPanel
-from utils.image_loader import load_raw_image, apply_bayer_mask
+from ui.overlays import OverlayStore
+from ui.workers import ImageLoadTask, FramePrefetchTask, AlgorithmJobSignals, DiffTask
+from ui.frame_player import FrameCache, FrameScrubber
+from ui.inspector import InspectorPanel
+from ui.compare_panel import ComparePanel
+from ui.tile_cache import DiffTileSource, DemosaicTileSource, IspTileSource, QImageTileSource
+from utils.raw_source import RawSource
+from utils.bayer import BAYER_PATTERNS
+from utils.image_loader import get_display_lut
+from utils.histogram import ChannelHistogram, display_window, DISPLAY_PARAMS
+from utils.roi_stats import same_color_neighborhood
+from utils.isp import IspPipeline
 from algorithms.manager import AlgorithmManager
+from algorithms.defect_map import DefectMap
+from algorithms.jobs import JobRunner
 
 class MainWindow(QMainWindow):
+    PREFETCH_AHEAD = 8 # Frames rendered in the background past the current one
+    PREFETCH_BEHIND = 2
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("RAW Viewer")
@@ -25,38 +40,96 @@ class MainWindow(QMainWindow):
         self.ref_canvas = ImageCanvas()
         self.ref_canvas.setVisible(False) # Hidden by default
         
+        # Difference of the two (Compare Mode), tiles computed as they are viewed
+        self.diff_canvas = ImageCanvas()
+        self.diff_canvas.setVisible(False)
+        
         # Splitter
         self.splitter = QSplitter(Qt.Orientation.Horizontal)
         self.splitter.addWidget(self.canvas)
         self.splitter.addWidget(self.ref_canvas)
+        self.splitter.addWidget(self.diff_canvas)
         self.splitter.setCollapsible(0, False)
         
-        self.setCentralWidget(self.splitter)
+        # Frame scrubber below the views, only shown for multi-frame files
+        self.scrubber = FrameScrubber()
+        self.scrubber.setVisible(False)
+        self.scrubber.frame_changed.connect(self.show_frame)
+        
+        central = QWidget()
+        central_layout = QVBoxLayout(central)
+        central_layout.setContentsMargins(0, 0, 0, 0)
+        central_layout.addWidget(self.splitter, 1)
+        central_layout.addWidget(self.scrubber)
+        self.setCentralWidget(central)
 
         # Sync Signals
         self.canvas.view_changed.connect(self.sync_to_ref)
         self.ref_canvas.view_changed.connect(self.sync_to_main)
+        self.diff_canvas.view_changed.connect(self.sync_from_diff)
         
         # Status Bar
         self.status_label = QLabel("Ready")
         self.statusBar().addWidget(self.status_label)
         self.canvas.pixel_hovered.connect(self.status_label.setText)
         
+        # ROI stats and neighborhood inspector (Inspector tab)
+        self.canvas.roi_changed.connect(lambda rect, stats: self.inspector.set_roi_stats(rect, stats))
+        self.canvas.pixel_inspected.connect(self.inspect_pixel)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(150)
+        self.progress_bar.setVisible(False)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        
+        self.job_progress = QProgressBar()
+        self.job_progress.setMaximumWidth(150)
+        self.job_progress.setVisible(False)
+        self.statusBar().addPermanentWidget(self.job_progress)
+        
+        # Background loading
+        self.thread_pool = QThreadPool.globalInstance()
+        self.load_tasks = {} # canvas -> latest ImageLoadTask
+        self.running_tasks = set() # Keeps tasks alive until they finish
+        self.sources = {} # file path -> RawSource
+        
+        # Multi-frame playback
+        self.frame_cache = FrameCache() # Decoded frames of the current sequence
+        self.prefetch_task = None
+        
         # Current file state
         self.current_file_path = None
+        self.current_params = None
         self.reference_file_path = None
+        self.defect_map = None # Last detection result or loaded map
+        self.diff_task = None
+        self.diff_result = None # Last compare_frames result
+        self.diff_inputs = None # (test, reference) it was computed from
+        self.display_window = (0, None) # (black, white) of the frame on screen
+        self.display_image = None # Loaded QImage of the current frame
+        # ISP preview stages per canvas, kept across reloads (see utils.isp)
+        self.isp_pipelines = {self.canvas: IspPipeline(), self.ref_canvas: IspPipeline()}
         
         # Sidebar (Dock)
         self.algorithm_manager = AlgorithmManager()
+        self.job_runner = JobRunner(self.algorithm_manager) # Algorithms run off the GUI thread
+        self.current_job = None
         
         self.sidebar = ImageControlPanel()
         self.algo_panel = AlgorithmPanel(self.algorithm_manager)
+        self.inspector = InspectorPanel()
+        self.compare_panel = ComparePanel()
         
         # Use a Tab Widget for sidebar content
-        from PyQt6.QtWidgets import QTabWidget
+        from PyQt6.QtWidgets import QTabWidget, QScrollArea
         self.side_tabs = QTabWidget()
-        self.side_tabs.addTab(self.sidebar, "Controls")
+        controls_scroll = QScrollArea() # Parameters + Display + ISP outgrow small screens
+        controls_scroll.setWidgetResizable(True)
+        controls_scroll.setWidget(self.sidebar)
+        self.side_tabs.addTab(controls_scroll, "Controls")
         self.side_tabs.addTab(self.algo_panel, "Algorithms")
+        self.side_tabs.addTab(self.inspector, "Inspector")
+        self.side_tabs.addTab(self.compare_panel, "Compare")
         
         self.dock = QDockWidget("Tools", self)
         self.dock.setWidget(self.side_tabs)
@@ -66,7 +139,13 @@ class MainWindow(QMainWindow):
         
         # Connect Sidebar
         self.sidebar.params_changed.connect(self.reload_image_with_params)
+        self.sidebar.isp_changed.connect(self.on_isp_changed)
         self.algo_panel.run_algorithm.connect(self.run_algorithm)
+        self.algo_panel.live_update.connect(self.on_live_update)
+        self.algo_panel.cancel_algorithm.connect(self.cancel_algorithm)
+        self.inspector.size_changed.connect(self.reinspect_pixel)
+        self.compare_panel.view_settings_changed.connect(self.show_diff)
+        self.compare_panel.tolerance_changed.connect(self.update_diff)
         
         # Menu
         menu_bar = self.menuBar()
@@ -90,15 +169,50 @@ class MainWindow(QMainWindow):
         export_action.triggered.connect(self.export_image)
         file_menu.addAction(export_action)
         
+        file_menu.addSeparator()
+        
+        save_map_action = QAction("Save Defect Map...", self)
+        save_map_action.triggered.connect(self.save_defect_map)
+        file_menu.addAction(save_map_action)
+        
+        load_map_action = QAction("Load Defect Map...", self)
+        load_map_action.triggered.connect(self.load_defect_map)
+        file_menu.addAction(load_map_action)
+        
+        compare_map_action = QAction("Compare Defect Map...", self)
+        compare_map_action.triggered.connect(self.compare_defect_map)
+        file_menu.addAction(compare_map_action)
+        
         # View Actions
         toggle_view_action = self.dock.toggleViewAction()
         view_menu.addAction(toggle_view_action)
 
-        toggle_compare_action = QAction("Compare Mode", self)
+        self.toggle_compare_action = toggle_compare_action = QAction("Compare Mode", self)
         toggle_compare_action.setCheckable(True)
         toggle_compare_action.toggled.connect(self.toggle_compare_mode)
         view_menu.addAction(toggle_compare_action)
         
+        view_menu.addSeparator()
+        
+        next_frame_action = QAction("Next Frame", self)
+        next_frame_action.setShortcut(".")
+        next_frame_action.triggered.connect(lambda: self.step_frame(1))
+        view_menu.addAction(next_frame_action)
+        
+        prev_frame_action = QAction("Previous Frame", self)
+        prev_frame_action.setShortcut(",")
+        prev_frame_action.triggered.connect(lambda: self.step_frame(-1))
+        view_menu.addAction(prev_frame_action)
+        
+    def closeEvent(self, event):
+        # Stop background work before the window goes away
+        self.job_runner.shutdown()
+        if self.diff_task is not None:
+            self.diff_task.cancel()
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+        super().closeEvent(event)
+
     def open_raw_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open RAW File", "", "RAW Files (*.raw *.bin *.bayer);;All Files (*)")
         if not file_path:
@@ -108,13 +222,26 @@ class MainWindow(QMainWindow):
         dialog = ImageParamsDialog(self)
         if dialog.exec():
             params = dialog.get_params()
+            params.update(self.sidebar.display_params())
+            params['frame_index'] = 0
             self.current_file_path = file_path # Store path
+            self.sources.pop(file_path, None) # Re-map, the file may have changed on disk
+            self.frame_cache.reset()
             self.load_image(file_path, params)
             # Sync sidebar
             self.sidebar.set_params(params)
             
     def reload_image_with_params(self, params):
         if self.current_file_path:
+            # Stay on the current frame if the new layout still has it
+            params = dict(params)
+            params['frame_index'] = 0
+            if self.current_params:
+                try:
+                    count = self.get_source(self.current_file_path).frame_count(params)
+                    params['frame_index'] = min(self.current_params.get('frame_index', 0), max(count - 1, 0))
+                except ValueError:
+                    pass # Invalid layout, the load reports it
             self.load_image(self.current_file_path, params)
             
     def run_algorithm(self, algo_name, params):
@@ -127,93 +254,439 @@ class MainWindow(QMainWindow):
             return
             
         try:
-            self.status_label.setText(f"Running {algo_name}...")
-            
             # Inject current pattern
             params['pattern'] = self.canvas.pattern
             
-            # Run algorithm
-            result = algo.run(self.canvas.raw_data, params)
-            
+            # Temporal algorithms get every frame of the file
+            if algo.temporal:
+                if not self.current_file_path or self.current_params is None:
+                    raise ValueError("No sequence loaded.")
+                data = self.get_source(self.current_file_path).sequence(self.current_params)
+            else:
+                data = self.canvas.raw_data
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Algorithm failed: {str(e)}")
+            self.status_label.setText("Algorithm error.")
+            return
+        
+        # Runs in the background; a job still running for this canvas is cancelled
+        signals = AlgorithmJobSignals()
+        job = self.job_runner.submit(algo_name, data, params, key=self.canvas, **signals.callbacks())
+        job.signals = signals # Keep the bridge alive with the job
+        signals.progress.connect(lambda percent, text, j=job: self.on_algorithm_progress(j, percent, text))
+        signals.finished.connect(lambda result, j=job: self.on_algorithm_finished(j, result))
+        signals.failed.connect(lambda message, j=job: self.on_algorithm_failed(j, message))
+        signals.cancelled.connect(lambda j=job: self.on_algorithm_cancelled(j))
+        self.current_job = job
+        
+        self.status_label.setText(f"Running {algo_name}...")
+        self.job_progress.setValue(0)
+        self.job_progress.setVisible(True)
+        self.algo_panel.set_running(True)
+
+    def inspect_pixel(self, x, y):
+        raw_data = self.canvas.raw_data
+        if raw_data is None or not self.inspector.isVisible():
+            return # Nobody looking
+        height, width = raw_data.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return
+        values, valid = same_color_neighborhood(raw_data, x, y, self.inspector.neighborhood_size(), self.canvas.pattern)
+        self.inspector.set_neighborhood(x, y, values, valid)
+
+    def reinspect_pixel(self):
+        if self.canvas.hover_pixel is not None:
+            self.inspect_pixel(*self.canvas.hover_pixel)
+
+    def on_live_update(self, algo_name, params):
+        # Parameter edits with Live Update on; nothing to re-run without an image
+        if self.canvas.raw_data is not None:
+            self.run_algorithm(algo_name, params)
+
+    def cancel_algorithm(self):
+        if self.current_job is None:
+            return
+        self.job_runner.cancel(self.canvas)
+        self.end_job()
+        self.status_label.setText("Algorithm cancelled.")
+
+    def end_job(self):
+        self.current_job = None
+        self.job_progress.setVisible(False)
+        self.algo_panel.set_running(False)
+
+    def on_algorithm_progress(self, job, percent, text):
+        if job is not self.current_job:
+            return
+        self.job_progress.setValue(percent)
+        if text:
+            self.status_label.setText(f"{job.algo_name}: {text}...")
+
+    def on_algorithm_failed(self, job, message):
+        if job is not self.current_job:
+            return
+        self.end_job()
+        QMessageBox.critical(self, "Error", f"Algorithm failed: {message}")
+        self.status_label.setText("Algorithm error.")
+
+    def on_algorithm_cancelled(self, job):
+        if job is self.current_job:
+            self.end_job()
+            self.status_label.setText("Algorithm cancelled.")
+
+    def on_algorithm_finished(self, job, result):
+        if job is not self.current_job:
+            return # Superseded
+        self.end_job()
+        
+        algo = self.algorithm_manager.get_algorithm(job.algo_name)
+        if not algo.temporal and job.data is not self.canvas.raw_data:
+            self.status_label.setText(f"{job.algo_name}: image changed while running, result discarded.")
+            return
+        
+        algo_name, params, data = job.algo_name, job.params, job.data
+        try:
             # Handle result
-            if "overlays" in result:
-                self.canvas.set_overlays(result["overlays"])
+            if "overlays" in result or "detections" in result:
+                overlays = OverlayStore.from_dicts(result.get("overlays", []))
+                if "detections" in result:
+                    overlays.add_detections(result["detections"])
+                self.canvas.set_overlays(overlays)
+            
+            height, width = self.canvas.raw_data.shape
+            defect_map = DefectMap.from_result(result, width, height, algo_name, params)
+            if defect_map is not None:
+                defect_map.meta["source"] = self.current_file_path
+                self.defect_map = defect_map
             
-            # TODO: If image modified, update it?
-            # if "image" in result and result["image"] is not self.canvas.raw_data:
-            #     ... update display ...
+            # Corrected frame: patch only the changed pixels on screen
+            if not algo.temporal and result.get("image") is not None and result["image"] is not data:
+                self.show_corrected_image(result["image"], result.get("detections"))
             
             msg = result.get("message", "Done.")
             self.status_label.setText(msg)
-            
-            if "message" in result:
-                 QMessageBox.information(self, "Algorithm Result", result["message"])
                  
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Algorithm failed: {str(e)}")
             self.status_label.setText("Algorithm error.")
             
+    def show_corrected_image(self, corrected, detections=None):
+        """
+        Puts a corrected version of the current frame on the canvas. Only the
+        changed pixels (the detections, else a full compare) go through the
+        display LUT and only their tiles are re-rendered.
+        """
+        if detections is not None:
+            ys, xs = detections["y"], detections["x"]
+        else:
+            ys, xs = np.nonzero(corrected != self.canvas.raw_data)
+        
+        bit_depth = self.get_source(self.current_file_path).effective_bit_depth(self.current_params)
+        lut = get_display_lut(bit_depth, corrected.dtype.itemsize * 8, *self.display_window)
+        self.canvas.update_pixels(corrected, xs, ys, lut[corrected[ys, xs]])
+        self.update_diff()
+        # Stepping away and back shows the corrected frame
+        # (Demosaiced views render from the raw frame, the loaded image is only a placeholder)
+        image = self.canvas.image if self.canvas.image is not None else self.display_image
+        self.frame_cache.put(self.current_params.get('frame_index', 0), image, corrected)
+
     def load_image(self, file_path, params):
-        try:
-            width = params['width']
-            height = params['height']
-            bit_depth = params['bit_depth']
-            
-            self.status_label.setText(f"Loading {os.path.basename(file_path)}...")
-            
-            # Use utility to load
-            display_data, raw_data = load_raw_image(file_path, width, height, bit_depth)
-            
-            if display_data is None:
-                QMessageBox.critical(self, "Error", "Failed to load image data.")
-                self.status_label.setText("Error loading.")
-                return
-
-            # Convert to QImage
-            # display_data is uint8 numpy array (H, W)
-            # We need to construct QImage. 
-            
-            # Check pattern
-            pattern = params.get('pattern', 'Mono/None')
-            if pattern in ["RGGB", "BGGR", "GRBG", "GBRG"]:
-                # Colorize
-                rgb_data = apply_bayer_mask(raw_data, pattern, bit_depth)
-                # QImage.Format_RGB888 needs contiguous data
-                if not rgb_data.flags['C_CONTIGUOUS']:
-                     rgb_data = np.ascontiguousarray(rgb_data)
-                     
-                height, width, _ = rgb_data.shape
-                # QImage from RGB888
-                q_img = QImage(rgb_data.data, width, height, 3 * width, QImage.Format.Format_RGB888)
-            else:
-                # Grayscale
-                # Format_Grayscale8 is best for single channel
-                q_img = QImage(display_data.data, width, height, width, QImage.Format.Format_Grayscale8)
-            
-            # Start strict separation: QImage buffer must persist or be copied. 
-            # Passing numpy buffer directly to QImage is risky if numpy array is garbage collected.
-            # safe approach: .copy()
-            self.display_image = q_img.copy()
-            
-            self.canvas.set_image(self.display_image, raw_data, pattern)
-            self.status_label.setText(f"Loaded: {width}x{height}, {bit_depth}-bit")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
-            self.status_label.setText("Error.")
+        self.current_params = dict(params)
+        self.status_label.setText(f"Loading {os.path.basename(file_path)}...")
+        self.start_load(self.canvas, file_path, params)
+
+    def frame_cache_key(self, source, params):
+        # Everything a cached frame depends on, except its index
+        return (source.file_path, source.sequence_key(params),
+                source.effective_bit_depth(params), params.get('pattern', 'Mono/None'),
+                tuple(params.get(key) for key in DISPLAY_PARAMS), params.get('demosaic', 'None'))
+
+    def step_frame(self, delta):
+        if self.scrubber.frame_count > 1:
+            self.scrubber.step(delta)
+
+    def show_frame(self, index):
+        """Shows frame `index` of the current file, from the cache if possible."""
+        if not self.current_file_path or self.current_params is None:
+            return
+        params = dict(self.current_params, frame_index=index)
+        source = self.get_source(self.current_file_path)
+        
+        cached = None
+        if self.frame_cache.key == self.frame_cache_key(source, params):
+            cached = self.frame_cache.get(index)
+        
+        if cached is not None:
+            # Drop any slower load still running for an older frame
+            previous = self.load_tasks.get(self.canvas)
+            if previous is not None:
+                previous.cancel()
+                del self.load_tasks[self.canvas]
+            q_img, raw_data = cached
+            self.current_params = params
+            self.show_loaded_frame(source, q_img, raw_data, params, keep_view=True)
+        else:
+            self.scrubber.set_waiting(self.scrubber.is_playing())
+            self.load_image(self.current_file_path, params)
+
+    def show_loaded_frame(self, source, q_img, raw_data, params, keep_view):
+        height, width = raw_data.shape
+        pattern = params.get('pattern', 'Mono/None')
+        index = params.get('frame_index', 0)
+        
+        # Sampled, a few ms; the same window the frame was rendered with
+        histogram = ChannelHistogram.from_image(raw_data, pattern)
+        self.display_window = display_window(params, histogram)
+        self.sidebar.set_histogram(histogram, source.effective_bit_depth(params), self.display_window)
+        
+        self.display_image = q_img
+        self.canvas.set_source(self.canvas_source(self.canvas, source, q_img, raw_data, params, self.display_window),
+                               raw_data, pattern, keep_view=keep_view)
+        self.frame_cache.put(index, q_img, raw_data)
+        self.scrubber.set_waiting(False)
+        
+        frame_count = source.frame_count(params)
+        self.scrubber.set_frame_count(frame_count, index)
+        self.scrubber.setVisible(frame_count > 1)
+        
+        text = f"Loaded: {width}x{height}, {params['bit_depth']}-bit"
+        if frame_count > 1:
+            text += f", frame {index + 1}/{frame_count}"
+        self.status_label.setText(text)
+        
+        self.start_prefetch(source, params, frame_count)
+        self.update_diff()
+
+    def canvas_source(self, canvas, source, q_img, raw_data, params, window):
+        """Tile source for a loaded frame: the rendered image, or tiles demosaiced / ISP processed on demand."""
+        method = params.get('demosaic', 'None')
+        if params.get('pattern', 'Mono/None') in BAYER_PATTERNS:
+            if params.get('isp'):
+                pipeline = self.isp_pipelines[canvas]
+                pipeline.set_params(self.sidebar.isp_params())
+                pipeline.set_frame(raw_data, params['pattern'], method if method != 'None' else 'Bilinear',
+                                   source.effective_bit_depth(params), window)
+                return IspTileSource(pipeline)
+            if method != 'None':
+                lut = get_display_lut(source.effective_bit_depth(params), raw_data.dtype.itemsize * 8, *window)
+                return DemosaicTileSource(raw_data, params['pattern'], method, lut)
+        return QImageTileSource(q_img)
+
+    def on_isp_changed(self, isp_params):
+        """New WB / CCM / gamma: the ISP views re-render, each tile from its last unchanged stage."""
+        for canvas, pipeline in self.isp_pipelines.items():
+            pipeline.set_params(isp_params)
+            if canvas.pyramid is not None and isinstance(canvas.pyramid.source, IspTileSource):
+                canvas.pyramid.invalidate()
+                canvas.update()
+
+    def start_prefetch(self, source, params, frame_count):
+        """Renders the frames around params['frame_index'] in the background."""
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+        if frame_count <= 1:
+            return
+        
+        index = params.get('frame_index', 0)
+        # Ahead first (wrapping like playback), then a few behind
+        order = [(index + d) % frame_count for d in range(1, self.PREFETCH_AHEAD + 1)]
+        order += [(index - d) % frame_count for d in range(1, self.PREFETCH_BEHIND + 1)]
+        indices = []
+        for i in order:
+            if i != index and i not in self.frame_cache and i not in indices:
+                indices.append(i)
+        if not indices:
+            return
+        
+        task = FramePrefetchTask(source, params, indices)
+        key = self.frame_cache_key(source, params)
+        task.signals.frame_ready.connect(lambda i, q_img, raw_data, p, k=key: self.on_frame_prefetched(k, i, q_img, raw_data))
+        task.signals.finished.connect(lambda t=task: self.running_tasks.discard(t))
+        self.prefetch_task = task
+        self.running_tasks.add(task)
+        self.thread_pool.start(task, -1) # Below foreground loads
+
+    def on_frame_prefetched(self, key, index, q_img, raw_data):
+        if self.frame_cache.key == key:
+            self.frame_cache.put(index, q_img, raw_data)
+
+    def start_load(self, canvas, file_path, params):
+        """
+        Loads file_path in the background and hands the result to canvas.
+        A newer load for the same canvas cancels the one in flight.
+        """
+        previous = self.load_tasks.get(canvas)
+        if previous is not None:
+            previous.cancel()
+        
+        task = ImageLoadTask(self.get_source(file_path), params)
+        self.load_tasks[canvas] = task
+        self.running_tasks.add(task)
+        
+        task.signals.progress.connect(self.on_load_progress)
+        task.signals.loaded.connect(lambda q_img, raw_data, p, t=task, c=canvas: self.on_image_loaded(c, t, q_img, raw_data, p))
+        task.signals.failed.connect(lambda msg, t=task, c=canvas: self.on_load_failed(c, t, msg))
+        task.signals.finished.connect(lambda t=task: self.on_load_finished(t))
+        
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.thread_pool.start(task)
+
+    def get_source(self, file_path):
+        """Returns the cached RawSource for file_path (mapped once, reused on reloads)."""
+        # Only the main and reference files are worth keeping mapped
+        keep = {file_path, self.current_file_path, self.reference_file_path}
+        for path in list(self.sources):
+            if path not in keep:
+                del self.sources[path]
+        
+        source = self.sources.get(file_path)
+        if source is None:
+            source = RawSource(file_path)
+            self.sources[file_path] = source
+        return source
+
+    def on_load_progress(self, percent, stage):
+        self.progress_bar.setValue(percent)
+
+    def on_image_loaded(self, canvas, task, q_img, raw_data, params):
+        if self.load_tasks.get(canvas) is not task:
+            return # Superseded while finishing
+        
+        height, width = raw_data.shape
+        bit_depth = params['bit_depth']
+        pattern = params.get('pattern', 'Mono/None')
+        
+        if canvas is self.canvas:
+            # Stepping within the same sequence keeps zoom/pan and the cached frames
+            key = self.frame_cache_key(task.source, params)
+            same_sequence = self.frame_cache.key == key and self.canvas.pyramid is not None
+            if not same_sequence:
+                self.frame_cache.reset(key)
+            self.show_loaded_frame(task.source, q_img, raw_data, params, keep_view=same_sequence)
+        else:
+            window = task.source.display_window(params)
+            canvas.set_source(self.canvas_source(canvas, task.source, q_img, raw_data, params, window), raw_data, pattern)
+            self.status_label.setText(f"Loaded Ref: {width}x{height}, {bit_depth}-bit")
+            # If in compare mode, sync view
+            if self.ref_canvas.isVisible():
+                self.sync_to_ref(self.canvas.scale, self.canvas.offset)
+            self.update_diff()
+
+    def on_load_failed(self, canvas, task, message):
+        if self.load_tasks.get(canvas) is not task:
+            return
+        if canvas is self.canvas:
+            self.scrubber.set_waiting(False)
+            self.scrubber.play_btn.setChecked(False)
+        prefix = "" if canvas is self.canvas else "Ref Load Error: "
+        QMessageBox.critical(self, "Error", prefix + message)
+        self.status_label.setText("Error loading.")
+
+    def on_load_finished(self, task):
+        self.running_tasks.discard(task)
+        for canvas, current in list(self.load_tasks.items()):
+            if current is task:
+                del self.load_tasks[canvas]
+        if not self.load_tasks:
+            self.progress_bar.setVisible(False)
 
     def toggle_compare_mode(self, checked):
         self.ref_canvas.setVisible(checked)
         if checked:
             self.sync_to_ref(self.canvas.scale, self.canvas.offset)
+        self.balance_views()
+        self.update_diff()
+
+    def balance_views(self):
+        # Views without a size hint come back at zero width when shown, share the space evenly
+        views = [self.splitter.widget(i) for i in range(self.splitter.count())]
+        shown = [view for view in views if not view.isHidden()]
+        width = max(self.splitter.width(), len(shown)) // max(len(shown), 1)
+        self.splitter.setSizes([width if view in shown else 0 for view in views])
+
+    def compare_active(self):
+        return self.toggle_compare_action.isChecked()
+
+    def update_diff(self):
+        """(Re)computes main vs reference metrics in the background while comparing."""
+        if self.diff_task is not None:
+            self.diff_task.cancel()
+            self.diff_task = None
+        
+        # The current view stays up until the new result replaces it
+        test, reference = self.canvas.raw_data, self.ref_canvas.raw_data
+        if not self.compare_active() or test is None or reference is None:
+            self.compare_panel.set_message("Enable Compare Mode and load a reference image.")
+            self.diff_result = None
+            self.show_diff()
+            return
+        if test.shape != reference.shape:
+            self.compare_panel.set_message(f"Sizes differ: {test.shape[1]}x{test.shape[0]} vs "
+                                           f"{reference.shape[1]}x{reference.shape[0]}.")
+            self.diff_result = None
+            self.show_diff()
+            return
+        
+        bit_depth = None
+        if self.current_file_path and self.current_params:
+            bit_depth = self.get_source(self.current_file_path).effective_bit_depth(self.current_params)
+        task = DiffTask(test, reference, self.canvas.pattern, bit_depth, self.compare_panel.tolerance())
+        task.signals.done.connect(lambda result, t=task: self.on_diff_done(t, result))
+        task.signals.failed.connect(lambda message: self.compare_panel.set_message(f"Compare failed: {message}"))
+        task.signals.finished.connect(lambda t=task: self.running_tasks.discard(t))
+        self.diff_task = task
+        self.running_tasks.add(task)
+        self.compare_panel.set_message("Comparing...")
+        self.thread_pool.start(task)
+
+    def on_diff_done(self, task, result):
+        if task is not self.diff_task:
+            return # Superseded
+        self.diff_task = None
+        if task.test is not self.canvas.raw_data or task.reference is not self.ref_canvas.raw_data:
+            return # An image changed meanwhile, its own update is on the way
+        self.diff_result = result
+        self.diff_inputs = (task.test, task.reference)
+        self.compare_panel.set_result(result)
+        self.show_diff()
+
+    def show_diff(self):
+        """Shows / re-renders the difference view for the current result and view settings."""
+        visible = self.compare_active() and self.compare_panel.show_diff() and self.diff_result is not None
+        if not visible:
+            if not self.diff_canvas.isHidden():
+                self.diff_canvas.setVisible(False)
+                self.balance_views()
+            self.diff_canvas.set_source(None)
+            return
+        
+        scale = self.compare_panel.scale() or self.diff_result["total"]["max_error"]
+        source = DiffTileSource(*self.diff_inputs, self.compare_panel.mode(),
+                                scale, self.compare_panel.tolerance())
+        self.diff_canvas.set_source(source, keep_view=True)
+        self.diff_canvas.set_view_params(self.canvas.scale, self.canvas.offset)
+        if self.diff_canvas.isHidden():
+            self.diff_canvas.setVisible(True)
+            self.balance_views()
 
     def sync_to_ref(self, scale, offset):
         if self.ref_canvas.isVisible():
             self.ref_canvas.set_view_params(scale, offset)
+        if self.diff_canvas.isVisible():
+            self.diff_canvas.set_view_params(scale, offset)
 
     def sync_to_main(self, scale, offset):
         if self.ref_canvas.isVisible():
             self.canvas.set_view_params(scale, offset)
+            if self.diff_canvas.isVisible():
+                self.diff_canvas.set_view_params(scale, offset)
+
+    def sync_from_diff(self, scale, offset):
+        if self.diff_canvas.isVisible():
+            self.canvas.set_view_params(scale, offset)
+            self.ref_canvas.set_view_params(scale, offset)
 
     def open_reference_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open Reference File", "", "RAW Files (*.raw *.bin *.bayer);;All Files (*)")
@@ -223,47 +696,17 @@ class MainWindow(QMainWindow):
         dialog = ImageParamsDialog(self)
         if dialog.exec():
             params = dialog.get_params()
+            params.update(self.sidebar.display_params())
             self.reference_file_path = file_path
+            self.sources.pop(file_path, None)
             self.load_reference_image(file_path, params)
 
     def load_reference_image(self, file_path, params):
-        try:
-            width = params['width']
-            height = params['height']
-            bit_depth = params['bit_depth']
-            
-            self.status_label.setText(f"Loading Ref: {os.path.basename(file_path)}...")
-            
-            display_data, raw_data = load_raw_image(file_path, width, height, bit_depth)
-            
-            if display_data is None:
-                QMessageBox.critical(self, "Error", "Failed to load reference image data.")
-                self.status_label.setText("Error loading reference.")
-                return
-
-            pattern = params.get('pattern', 'Mono/None')
-            if pattern in ["RGGB", "BGGR", "GRBG", "GBRG"]:
-                rgb_data = apply_bayer_mask(raw_data, pattern, bit_depth)
-                if not rgb_data.flags['C_CONTIGUOUS']:
-                     rgb_data = np.ascontiguousarray(rgb_data)
-                height, width, _ = rgb_data.shape
-                q_img = QImage(rgb_data.data, width, height, 3 * width, QImage.Format.Format_RGB888)
-            else:
-                q_img = QImage(display_data.data, width, height, width, QImage.Format.Format_Grayscale8)
-            
-            self.ref_canvas.set_image(q_img.copy(), raw_data, pattern)
-            self.status_label.setText(f"Loaded Ref: {width}x{height}, {bit_depth}-bit")
-            
-            # If in compare mode, sync view
-            if self.ref_canvas.isVisible():
-                self.sync_to_ref(self.canvas.scale, self.canvas.offset)
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Ref Load Error: {str(e)}")
-            self.status_label.setText("Error.")
+        self.status_label.setText(f"Loading Ref: {os.path.basename(file_path)}...")
+        self.start_load(self.ref_canvas, file_path, params)
 
     def export_image(self):
-        if self.canvas.image is None and self.canvas.raw_data is None:
+        if self.canvas.pyramid is None and self.canvas.raw_data is None:
             QMessageBox.warning(self, "Warning", "No image loaded to export.")
             return
 
@@ -282,11 +725,12 @@ class MainWindow(QMainWindow):
             
             # Check filter or extension
             if "Bitmap" in filter_selected or file_path.lower().endswith('.bmp'):
-                if self.canvas.image is None:
+                image = self.canvas.full_image() # Demosaiced views are rendered here
+                if image is None:
                     raise Exception("No display image available for BMP export.")
                 
                 # Save QImage
-                if not self.canvas.image.save(file_path, "BMP"):
+                if not image.save(file_path, "BMP"):
                     raise Exception("Failed to save BMP file.")
                     
             elif "RAW Data" in filter_selected or file_path.lower().endswith(('.raw', '.bin')):
@@ -301,7 +745,7 @@ class MainWindow(QMainWindow):
                 # Fallback based on extension if user typed it manually without filter match
                 # Default to BMP if image fits, else RAW? 
                 # Let's keep it simple: if extension unknown, error or try QImage
-                self.canvas.image.save(file_path)
+                self.canvas.full_image().save(file_path)
 
             self.status_label.setText("Export successful.")
             QMessageBox.information(self, "Export", "Image exported successfully.")
@@ -309,3 +753,58 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Export Error", f"Failed to export: {str(e)}")
             self.status_label.setText("Export failed.")
+
+    def save_defect_map(self):
+        if self.defect_map is None:
+            QMessageBox.warning(self, "Warning", "No detections to save. Run a detection algorithm first.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Defect Map", "", "Defect Map (*.npz)")
+        if not file_path:
+            return
+        try:
+            self.defect_map.save(file_path)
+            self.status_label.setText(f"Saved {len(self.defect_map)} defects to {os.path.basename(file_path)}.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save defect map: {str(e)}")
+
+    def open_defect_map(self, title):
+        file_path, _ = QFileDialog.getOpenFileName(self, title, "", "Defect Map (*.npz);;All Files (*)")
+        if not file_path:
+            return None
+        try:
+            return DefectMap.load(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load defect map: {str(e)}")
+            return None
+
+    def load_defect_map(self):
+        """Shows a saved defect map on the current image (colored by kind)."""
+        defect_map = self.open_defect_map("Load Defect Map")
+        if defect_map is None:
+            return
+        overlays = OverlayStore()
+        overlays.add_detections(defect_map.to_detections())
+        self.canvas.set_overlays(overlays)
+        self.defect_map = defect_map
+        self.status_label.setText(f"Loaded defect map: {len(defect_map)} defects, "
+                                  f"{defect_map.width}x{defect_map.height}.")
+
+    def compare_defect_map(self):
+        """Diffs a saved map against the current one: new defects green, gone ones red, shared gray."""
+        if self.defect_map is None:
+            QMessageBox.warning(self, "Warning", "No current defect map. Run a detection or load a map first.")
+            return
+        other = self.open_defect_map("Compare With Defect Map")
+        if other is None:
+            return
+        try:
+            added, removed, common = other.diff(self.defect_map)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        overlays = OverlayStore()
+        overlays.add_detections(common.to_detections(), "gray")
+        overlays.add_detections(removed.to_detections(), "red")
+        overlays.add_detections(added.to_detections(), "lime")
+        self.canvas.set_overlays(overlays)
+        self.status_label.setText(f"Defect map diff: {len(added)} new, {len(removed)} gone, {len(common)} unchanged.")
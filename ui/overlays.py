@@ -0,0 +1,197 @@
+from PyQt6.QtCore import Qt, QRectF, QLineF
+from PyQt6.QtGui import QImage, QColor, QPen
+import numpy as np
+
+GRID_CELL = 64 # Spatial index cell size (image pixels)
+HEATMAP_MAX_SCALE = 1.0 # Below this zoom dense points may collapse to a heatmap
+HEATMAP_MIN_POINTS = 500 # ... once this many points are in view
+HEATMAP_BIN_SCREEN_PX = 2 # Heatmap bin size in screen pixels
+
+# Point color per detection kind (algorithms.base.DETECTION_KINDS order)
+KIND_COLORS = ["red", "orange", "cyan", "magenta", "yellow", "lime"]
+
+class OverlayGroup:
+    """
+    All overlays of one type and color as a NumPy coordinate array.
+        point: (N, 2) x, y
+        line:  (N, 4) x1, y1, x2, y2
+        rect:  (N, 4) x, y, w, h
+    Points are bucketed in a uniform grid (sorted by cell id) so a viewport
+    query only touches the cells in view. Lines and rects are culled by
+    bounding box.
+    """
+    def __init__(self, otype, color, coords):
+        self.type = otype
+        self.color = QColor(color)
+        self.pen = QPen(self.color)
+        self.pen.setWidthF(1.0) # 1 pixel in image coordinates
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2 if otype == "point" else 4)
+        self._heatmap_key = None
+        self._heatmap = None
+        
+        if self.type == "point":
+            self._build_grid()
+        else:
+            c = self.coords
+            if self.type == "rect":
+                x0, y0, x1, y1 = c[:, 0], c[:, 1], c[:, 0] + c[:, 2], c[:, 1] + c[:, 3]
+            else:
+                x0, y0, x1, y1 = c[:, 0], c[:, 1], c[:, 2], c[:, 3]
+            self.bbox = np.stack([np.minimum(x0, x1), np.minimum(y0, y1),
+                                  np.maximum(x0, x1), np.maximum(y0, y1)], axis=1)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def _build_grid(self):
+        cells = np.floor(self.coords / GRID_CELL).astype(np.int64)
+        cells = np.maximum(cells, 0)
+        self.grid_cols = int(cells[:, 0].max()) + 1 if len(cells) else 1
+        keys = cells[:, 1] * self.grid_cols + cells[:, 0]
+        order = np.argsort(keys, kind="stable")
+        self.coords = self.coords[order]
+        self.cell_keys = keys[order]
+
+    def query(self, rect):
+        """Returns the coords intersecting rect (QRectF, image coordinates)."""
+        x0, y0, x1, y1 = rect.left(), rect.top(), rect.right(), rect.bottom()
+        
+        if self.type != "point":
+            b = self.bbox
+            hit = (b[:, 2] >= x0) & (b[:, 0] <= x1) & (b[:, 3] >= y0) & (b[:, 1] <= y1)
+            return self.coords[hit]
+        
+        if len(self.coords) == 0:
+            return self.coords
+        # Cell rows in view, each a contiguous key range in the sorted array
+        cx0 = max(0, int(x0 // GRID_CELL))
+        cx1 = min(self.grid_cols - 1, int(x1 // GRID_CELL))
+        cy0 = max(0, int(y0 // GRID_CELL))
+        cy1 = int(self.cell_keys[-1] // self.grid_cols)
+        cy1 = min(cy1, int(y1 // GRID_CELL))
+        if cx0 > cx1 or cy0 > cy1:
+            return self.coords[:0]
+        
+        rows = np.arange(cy0, cy1 + 1) * self.grid_cols
+        starts = np.searchsorted(self.cell_keys, rows + cx0, side="left")
+        ends = np.searchsorted(self.cell_keys, rows + cx1, side="right")
+        candidates = np.concatenate([self.coords[s:e] for s, e in zip(starts, ends)])
+        
+        # Exact test on the edge cells (a point covers [x, x+1) x [y, y+1))
+        px, py = candidates[:, 0], candidates[:, 1]
+        hit = (px + 1 >= x0) & (px <= x1) & (py + 1 >= y0) & (py <= y1)
+        return candidates[hit]
+
+    def heatmap(self, points, bin_size, rect):
+        """
+        Returns (QImage, target QRectF) with the density of `points` binned in
+        bin_size x bin_size image pixel cells covering rect.
+        """
+        bx0 = int(rect.left() // bin_size)
+        by0 = int(rect.top() // bin_size)
+        nbx = int(rect.right() // bin_size) - bx0 + 1
+        nby = int(rect.bottom() // bin_size) - by0 + 1
+        
+        key = (bin_size, bx0, by0, nbx, nby, len(points))
+        if key == self._heatmap_key:
+            return self._heatmap
+        
+        bx = np.clip((points[:, 0] // bin_size).astype(np.int64) - bx0, 0, nbx - 1)
+        by = np.clip((points[:, 1] // bin_size).astype(np.int64) - by0, 0, nby - 1)
+        counts = np.bincount(by * nbx + bx, minlength=nbx * nby).reshape(nby, nbx)
+        
+        # Log-scaled alpha so single outliers stay visible next to clusters
+        alpha = np.zeros(counts.shape, dtype=np.float32)
+        nonzero = counts > 0
+        alpha[nonzero] = 60 + 195 * np.log1p(counts[nonzero]) / np.log1p(counts.max())
+        
+        argb = np.empty((nby, nbx), dtype=np.uint32)
+        argb[:] = (self.color.red() << 16) | (self.color.green() << 8) | self.color.blue()
+        argb |= alpha.astype(np.uint32) << 24
+        
+        q_img = QImage(argb.data, nbx, nby, 4 * nbx, QImage.Format.Format_ARGB32).copy()
+        target = QRectF(bx0 * bin_size, by0 * bin_size, nbx * bin_size, nby * bin_size)
+        
+        self._heatmap_key = key
+        self._heatmap = (q_img, target)
+        return self._heatmap
+
+class OverlayStore:
+    """
+    Columnar overlay storage: one OverlayGroup per (type, color).
+    """
+    def __init__(self):
+        self.groups = {}
+
+    @classmethod
+    def from_dicts(cls, overlays):
+        """Builds a store from the list-of-dicts format returned by Algorithm.run."""
+        store = cls()
+        buckets = {}
+        for overlay in overlays:
+            key = (overlay.get("type"), overlay.get("color", "red"))
+            buckets.setdefault(key, []).append(overlay.get("coords"))
+        for (otype, color), coords in buckets.items():
+            if otype in ("point", "line", "rect"):
+                store.add(otype, color, coords)
+        return store
+
+    def add(self, otype, color, coords):
+        """Adds an array of coords (see OverlayGroup) of one type and color."""
+        key = (otype, color)
+        if key in self.groups:
+            existing = self.groups[key].coords
+            coords = np.concatenate([existing, np.asarray(coords, dtype=np.float64).reshape(-1, existing.shape[1])])
+        self.groups[key] = OverlayGroup(otype, color, coords)
+
+    def add_detections(self, detections, color=None):
+        """
+        Adds a DETECTION_DTYPE array (see algorithms.base) as point overlays,
+        colored by kind (KIND_COLORS) unless a color is given.
+        """
+        if color is None:
+            kinds = detections["kind"]
+            for kind in np.unique(kinds):
+                self.add_detections(detections[kinds == kind], KIND_COLORS[kind % len(KIND_COLORS)])
+            return
+        coords = np.empty((len(detections), 2), dtype=np.float64)
+        coords[:, 0] = detections["x"]
+        coords[:, 1] = detections["y"]
+        self.add("point", color, coords)
+
+    def __len__(self):
+        return sum(len(g) for g in self.groups.values())
+
+    def draw(self, painter, visible_rect, scale):
+        """
+        Draws the overlays inside visible_rect (QRectF, image coordinates).
+        The painter is expected to carry the image -> widget transform.
+        """
+        if not self.groups:
+            return
+        
+        painter.save()
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        
+        for group in self.groups.values():
+            coords = group.query(visible_rect)
+            if len(coords) == 0:
+                continue
+            
+            if group.type == "point":
+                if scale < HEATMAP_MAX_SCALE and len(coords) >= HEATMAP_MIN_POINTS:
+                    bin_size = max(1, int(np.ceil(HEATMAP_BIN_SCREEN_PX / scale)))
+                    q_img, target = group.heatmap(coords, bin_size, visible_rect)
+                    painter.drawImage(target, q_img)
+                    continue
+                painter.setPen(group.pen)
+                # Draw a rect around the pixel
+                painter.drawRects([QRectF(x, y, 1, 1) for x, y in coords.tolist()])
+            elif group.type == "line":
+                painter.setPen(group.pen)
+                painter.drawLines([QLineF(x1, y1, x2, y2) for x1, y1, x2, y2 in coords.tolist()])
+            elif group.type == "rect":
+                painter.setPen(group.pen)
+                painter.drawRects([QRectF(x, y, w, h) for x, y, w, h in coords.tolist()])
+        
+        painter.restore()
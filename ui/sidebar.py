@@ -1,10 +1,20 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QSpinBox, 
                              QComboBox, QGroupBox, QLabel, QPushButton, QCheckBox, 
-                             QDoubleSpinBox, QLineEdit)
-from PyQt6.QtCore import pyqtSignal
+                             QDoubleSpinBox, QLineEdit, QSlider, QHBoxLayout, QGridLayout)
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer
+
+from utils.unpack import PACKED_FORMATS
+from ui.histogram_view import HistogramView
+from utils.histogram import DISPLAY_PARAMS
+from utils.demosaic import DEMOSAIC_METHODS
+from utils.isp import DEFAULT_ISP
 
 class ImageControlPanel(QWidget):
     params_changed = pyqtSignal(dict)
+    isp_changed = pyqtSignal(dict) # WB / CCM / gamma: re-render only, see isp_params
+    
+    DEBOUNCE_MS = 200
+    ISP_DEBOUNCE_MS = 50 # Tiles keep their earlier stages, re-rendering is cheap
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -20,6 +30,7 @@ class ImageControlPanel(QWidget):
         self.width_spin.setRange(1, 65535)
         self.width_spin.setValue(1920)
         self.width_spin.setSingleStep(2) # Usually width is even
+        self.width_spin.setKeyboardTracking(False) # Typing "2048" is one change, not four
         self.width_spin.valueChanged.connect(self.emit_params)
         form_layout.addRow("Width:", self.width_spin)
         
@@ -27,6 +38,7 @@ class ImageControlPanel(QWidget):
         self.height_spin = QSpinBox()
         self.height_spin.setRange(1, 65535)
         self.height_spin.setValue(1080)
+        self.height_spin.setKeyboardTracking(False)
         self.height_spin.valueChanged.connect(self.emit_params)
         form_layout.addRow("Height:", self.height_spin)
         
@@ -37,6 +49,34 @@ class ImageControlPanel(QWidget):
         self.bit_depth_combo.currentTextChanged.connect(self.emit_params)
         form_layout.addRow("Bit Depth:", self.bit_depth_combo)
         
+        # Packing
+        self.packing_combo = QComboBox()
+        self.packing_combo.addItems(["None"] + list(PACKED_FORMATS.keys()))
+        self.packing_combo.currentTextChanged.connect(self.on_packing_changed)
+        form_layout.addRow("Packing:", self.packing_combo)
+        
+        # Line Stride (bytes), 0 = Auto
+        self.stride_spin = QSpinBox()
+        self.stride_spin.setRange(0, 1 << 20)
+        self.stride_spin.setSpecialValueText("Auto")
+        self.stride_spin.setKeyboardTracking(False)
+        self.stride_spin.valueChanged.connect(self.emit_params)
+        form_layout.addRow("Line Stride:", self.stride_spin)
+        
+        # Frame Header / Frame Stride (bytes) for multi-frame files, 0 = Auto
+        self.frame_header_spin = QSpinBox()
+        self.frame_header_spin.setRange(0, (1 << 31) - 1)
+        self.frame_header_spin.setKeyboardTracking(False)
+        self.frame_header_spin.valueChanged.connect(self.emit_params)
+        form_layout.addRow("Frame Header:", self.frame_header_spin)
+        
+        self.frame_stride_spin = QSpinBox()
+        self.frame_stride_spin.setRange(0, (1 << 31) - 1)
+        self.frame_stride_spin.setSpecialValueText("Auto")
+        self.frame_stride_spin.setKeyboardTracking(False)
+        self.frame_stride_spin.valueChanged.connect(self.emit_params)
+        form_layout.addRow("Frame Stride:", self.frame_stride_spin)
+        
         # Bayer Pattern
         self.pattern_combo = QComboBox()
         # Add a few common ones
@@ -44,12 +84,106 @@ class ImageControlPanel(QWidget):
         self.pattern_combo.currentTextChanged.connect(self.emit_params)
         form_layout.addRow("Pattern:", self.pattern_combo)
         
-        self.pattern_combo.currentTextChanged.connect(self.emit_params)
-        form_layout.addRow("Pattern:", self.pattern_combo)
-        
         group.setLayout(form_layout)
         layout.addWidget(group)
+        
+        # Display window: manual black/white points or auto from the histogram
+        display_group = QGroupBox("Display")
+        display_layout = QFormLayout()
+        
+        self.histogram_view = HistogramView()
+        display_layout.addRow(self.histogram_view)
+        
+        # Bayer data: mosaic as is, or demosaiced per visible tile
+        self.demosaic_combo = QComboBox()
+        self.demosaic_combo.addItems(DEMOSAIC_METHODS)
+        self.demosaic_combo.currentTextChanged.connect(self.emit_params)
+        display_layout.addRow("Demosaic:", self.demosaic_combo)
+        
+        self.auto_levels_check = QCheckBox("Auto Levels")
+        self.auto_levels_check.toggled.connect(self.on_auto_levels_toggled)
+        display_layout.addRow(self.auto_levels_check)
+        
+        self.low_percentile_spin = QDoubleSpinBox()
+        self.low_percentile_spin.setRange(0.0, 50.0)
+        self.low_percentile_spin.setDecimals(2)
+        self.low_percentile_spin.setSingleStep(0.1)
+        self.low_percentile_spin.setValue(0.1)
+        self.low_percentile_spin.setSuffix(" %")
+        self.low_percentile_spin.valueChanged.connect(self.emit_params)
+        display_layout.addRow("Low Percentile:", self.low_percentile_spin)
+        
+        self.high_percentile_spin = QDoubleSpinBox()
+        self.high_percentile_spin.setRange(50.0, 100.0)
+        self.high_percentile_spin.setDecimals(2)
+        self.high_percentile_spin.setSingleStep(0.1)
+        self.high_percentile_spin.setValue(99.9)
+        self.high_percentile_spin.setSuffix(" %")
+        self.high_percentile_spin.valueChanged.connect(self.emit_params)
+        display_layout.addRow("High Percentile:", self.high_percentile_spin)
+        
+        self.black_spin = QSpinBox()
+        self.black_spin.setRange(0, 65535)
+        self.black_spin.setKeyboardTracking(False)
+        self.black_spin.valueChanged.connect(self.emit_params)
+        display_layout.addRow("Black Point:", self.black_spin)
+        
+        # White Point, 0 = full range of the bit depth
+        self.white_spin = QSpinBox()
+        self.white_spin.setRange(0, 65535)
+        self.white_spin.setSpecialValueText("Max")
+        self.white_spin.setKeyboardTracking(False)
+        self.white_spin.valueChanged.connect(self.emit_params)
+        display_layout.addRow("White Point:", self.white_spin)
+        
+        display_group.setLayout(display_layout)
+        layout.addWidget(display_group)
+        
+        # ISP preview of Bayer data: black/white from the display window,
+        # then WB -> demosaic (Bilinear if set to None) -> CCM -> gamma
+        self.isp_group = QGroupBox("ISP Preview")
+        self.isp_group.setCheckable(True)
+        self.isp_group.setChecked(DEFAULT_ISP["isp"])
+        self.isp_group.toggled.connect(self.emit_params)
+        isp_layout = QFormLayout()
+        
+        wb_layout = QHBoxLayout()
+        self.wb_spins = []
+        for gain in DEFAULT_ISP["wb_gains"]:
+            spin = self.isp_spin(0.0, 16.0, 0.05, gain)
+            wb_layout.addWidget(spin)
+            self.wb_spins.append(spin)
+        isp_layout.addRow("WB Gains (R/G/B):", wb_layout)
+        
+        # Color matrix, row major: output R, G, B from input R, G, B
+        ccm_layout = QGridLayout()
+        self.ccm_spins = []
+        for i, value in enumerate(DEFAULT_ISP["ccm"]):
+            spin = self.isp_spin(-8.0, 8.0, 0.05, value)
+            ccm_layout.addWidget(spin, i // 3, i % 3)
+            self.ccm_spins.append(spin)
+        isp_layout.addRow("CCM:", ccm_layout)
+        
+        self.gamma_spin = self.isp_spin(0.2, 5.0, 0.1, DEFAULT_ISP["gamma"])
+        isp_layout.addRow("Gamma:", self.gamma_spin)
+        
+        self.isp_group.setLayout(isp_layout)
+        layout.addWidget(self.isp_group)
+        
         layout.addStretch()
+        self.update_display_controls()
+        
+        self.isp_timer = QTimer(self)
+        self.isp_timer.setSingleShot(True)
+        self.isp_timer.setInterval(self.ISP_DEBOUNCE_MS)
+        self.isp_timer.timeout.connect(lambda: self.isp_changed.emit(self.isp_params()))
+        
+        # Coalesce bursts of changes (spinner drags, auto-repeat) into one
+        # params_changed once the value has settled
+        self.emit_timer = QTimer(self)
+        self.emit_timer.setSingleShot(True)
+        self.emit_timer.setInterval(self.DEBOUNCE_MS)
+        self.emit_timer.timeout.connect(self.flush_params)
         
         # Block signals initially to prevent blast during setup? 
         # Actually usually fine, but set_params helper is useful.
@@ -60,6 +194,17 @@ class ImageControlPanel(QWidget):
         if 'height' in params: self.height_spin.setValue(params['height'])
         if 'bit_depth' in params: self.bit_depth_combo.setCurrentText(str(params['bit_depth']))
         if 'pattern' in params: self.pattern_combo.setCurrentText(params['pattern'])
+        if 'packing' in params: self.packing_combo.setCurrentText(params['packing'])
+        if 'stride' in params: self.stride_spin.setValue(params['stride'])
+        if 'frame_header' in params: self.frame_header_spin.setValue(params['frame_header'])
+        if 'frame_stride' in params: self.frame_stride_spin.setValue(params['frame_stride'])
+        if 'demosaic' in params: self.demosaic_combo.setCurrentText(params['demosaic'])
+        if 'auto_levels' in params: self.auto_levels_check.setChecked(params['auto_levels'])
+        if 'low_percentile' in params: self.low_percentile_spin.setValue(params['low_percentile'])
+        if 'high_percentile' in params: self.high_percentile_spin.setValue(params['high_percentile'])
+        if 'black' in params: self.black_spin.setValue(params['black'])
+        if 'white' in params: self.white_spin.setValue(params['white'] or 0)
+        if 'isp' in params: self.isp_group.setChecked(params['isp'])
         self.blockSignals(False)
         
     def get_params(self):
@@ -67,17 +212,89 @@ class ImageControlPanel(QWidget):
             "width": self.width_spin.value(),
             "height": self.height_spin.value(),
             "bit_depth": int(self.bit_depth_combo.currentText()),
-            "width": self.width_spin.value(),
-            "height": self.height_spin.value(),
-            "bit_depth": int(self.bit_depth_combo.currentText()),
-            "pattern": self.pattern_combo.currentText()
+            "packing": self.packing_combo.currentText(),
+            "stride": self.stride_spin.value(),
+            "frame_header": self.frame_header_spin.value(),
+            "frame_stride": self.frame_stride_spin.value(),
+            "pattern": self.pattern_combo.currentText(),
+            "demosaic": self.demosaic_combo.currentText(),
+            "auto_levels": self.auto_levels_check.isChecked(),
+            "low_percentile": self.low_percentile_spin.value(),
+            "high_percentile": self.high_percentile_spin.value(),
+            "black": self.black_spin.value(),
+            "white": self.white_spin.value(),
+            "isp": self.isp_group.isChecked()
+        }
+        
+    def display_params(self):
+        """The display part of get_params: window (utils.histogram.DISPLAY_PARAMS), demosaic and isp."""
+        params = self.get_params()
+        return {key: params[key] for key in DISPLAY_PARAMS + ("demosaic", "isp")}
+        
+    def isp_params(self):
+        """ISP preview settings, for utils.isp.IspPipeline.set_params."""
+        return {
+            "wb_gains": tuple(spin.value() for spin in self.wb_spins),
+            "ccm": tuple(spin.value() for spin in self.ccm_spins),
+            "gamma": self.gamma_spin.value()
         }
         
+    def isp_spin(self, minimum, maximum, step, value):
+        spin = QDoubleSpinBox()
+        spin.setRange(minimum, maximum)
+        spin.setDecimals(3)
+        spin.setSingleStep(step)
+        spin.setValue(value)
+        spin.setKeyboardTracking(False)
+        spin.valueChanged.connect(self.emit_isp)
+        return spin
+        
+    def set_histogram(self, histogram, bit_depth, window):
+        self.histogram_view.set_histogram(histogram, bit_depth, window)
+        
+    def update_display_controls(self):
+        # Percentiles apply in auto mode, the manual points otherwise
+        auto = self.auto_levels_check.isChecked()
+        for widget in (self.low_percentile_spin, self.high_percentile_spin):
+            widget.setEnabled(auto)
+        for widget in (self.black_spin, self.white_spin):
+            widget.setEnabled(not auto)
+        
+    def on_auto_levels_toggled(self, checked):
+        self.update_display_controls()
+        self.emit_params()
+        
+    def on_packing_changed(self, packing):
+        fmt = PACKED_FORMATS.get(packing)
+        # Packed formats fix the bit depth; set it quietly and emit once
+        self.bit_depth_combo.blockSignals(True)
+        if fmt:
+            self.bit_depth_combo.setCurrentText(str(fmt["bit_depth"]))
+        self.bit_depth_combo.setEnabled(fmt is None)
+        self.bit_depth_combo.blockSignals(False)
+        self.emit_params()
+        
     def emit_params(self):
+        # Restart the debounce window, the last value wins
+        if self.signalsBlocked():
+            return
+        self.emit_timer.start()
+        
+    def flush_params(self):
         self.params_changed.emit(self.get_params())
+        
+    def emit_isp(self):
+        if self.signalsBlocked():
+            return
+        self.isp_timer.start()
 
 class AlgorithmPanel(QWidget):
     run_algorithm = pyqtSignal(str, dict) # algorithm_name, params
+    live_update = pyqtSignal(str, dict) # Same, emitted for parameter edits while Live Update is on
+    cancel_algorithm = pyqtSignal()
+
+    LIVE_DEBOUNCE_MS = 150
+    FLOAT_SLIDER_STEPS = 10 # Slider positions per unit for float params
 
     def __init__(self, algorithm_manager, parent=None):
         super().__init__(parent)
@@ -112,11 +329,29 @@ class AlgorithmPanel(QWidget):
         self.params_group.setLayout(self.params_layout)
         layout.addWidget(self.params_group)
 
+        # Re-run on every parameter change. Threshold-only changes reuse the
+        # algorithm's cached intermediates and a stale run is cancelled, so
+        # dragging a slider stays responsive
+        self.live_check = QCheckBox("Live Update")
+        self.live_check.setToolTip("Re-run the algorithm whenever a parameter changes")
+        layout.addWidget(self.live_check)
+
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(self.LIVE_DEBOUNCE_MS)
+        self.live_timer.timeout.connect(self.on_live_timeout)
+
         # Run Button
         self.run_btn = QPushButton("Run Algorithm")
         self.run_btn.clicked.connect(self.on_run_clicked)
         layout.addWidget(self.run_btn)
         
+        # Cancel Button (enabled while a job runs)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_algorithm)
+        layout.addWidget(self.cancel_btn)
+        
         layout.addStretch()
 
         # Initialize with first algo
@@ -152,28 +387,74 @@ class AlgorithmPanel(QWidget):
                 widget = QSpinBox()
                 widget.setRange(spec.get("min", -99999), spec.get("max", 99999))
                 widget.setValue(int(default_val))
+                widget.valueChanged.connect(self.on_param_edited)
             elif param_type == "float":
                 widget = QDoubleSpinBox()
                 widget.setRange(spec.get("min", -99999.0), spec.get("max", 99999.0))
                 widget.setValue(float(default_val))
+                widget.valueChanged.connect(self.on_param_edited)
             elif param_type == "bool":
                 widget = QCheckBox()
                 widget.setChecked(bool(default_val))
+                widget.toggled.connect(self.on_param_edited)
             elif param_type == "list":
                 widget = QComboBox()
                 widget.addItems(spec.get("options", []))
                 widget.setCurrentText(str(default_val))
+                widget.currentTextChanged.connect(self.on_param_edited)
             else:
                 widget = QLineEdit(str(default_val))
+                widget.editingFinished.connect(self.on_param_edited)
             
-            self.params_layout.addRow(label_text, widget)
+            if spec.get("slider") and param_type in ("int", "float"):
+                self.params_layout.addRow(label_text, self.with_slider(widget, param_type))
+            else:
+                self.params_layout.addRow(label_text, widget)
             self.param_inputs[key] = (widget, param_type)
 
+    def with_slider(self, spin, param_type):
+        """Returns a row widget with `spin` next to a slider kept in sync with it."""
+        scale = self.FLOAT_SLIDER_STEPS if param_type == "float" else 1
+        slider = QSlider(Qt.Orientation.Horizontal)
+        slider.setRange(round(spin.minimum() * scale), round(spin.maximum() * scale))
+        slider.setValue(round(spin.value() * scale))
+
+        def on_slider(value):
+            spin.setValue(value / scale if param_type == "float" else value)
+
+        def on_spin(value):
+            slider.blockSignals(True)
+            slider.setValue(round(value * scale))
+            slider.blockSignals(False)
+
+        slider.valueChanged.connect(on_slider)
+        spin.valueChanged.connect(on_spin)
+
+        row = QWidget()
+        row_layout = QHBoxLayout(row)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        row_layout.addWidget(slider, 1)
+        row_layout.addWidget(spin)
+        return row
+
+    def on_param_edited(self, *args):
+        if self.live_check.isChecked():
+            self.live_timer.start() # Restarts, fires once the edits settle
+
+    def on_live_timeout(self):
+        if self.current_algo_name:
+            self.live_update.emit(self.current_algo_name, self.get_params())
+
+    def set_running(self, running):
+        self.cancel_btn.setEnabled(running)
+
     def on_run_clicked(self):
         if not self.current_algo_name:
             return
-        
-        # Collect params
+        self.live_timer.stop()
+        self.run_algorithm.emit(self.current_algo_name, self.get_params())
+
+    def get_params(self):
         params = {}
         for key, (widget, param_type) in self.param_inputs.items():
             if param_type == "int":
@@ -186,5 +467,4 @@ class AlgorithmPanel(QWidget):
                 params[key] = widget.currentText()
             else:
                 params[key] = widget.text()
-        
-        self.run_algorithm.emit(self.current_algo_name, params)
+        return params
@@ -0,0 +1,291 @@
+from PyQt6.QtCore import Qt, QRect, QRectF
+from PyQt6.QtGui import QImage, QPainter
+from collections import OrderedDict
+import numpy as np
+import math
+
+from utils.diff_engine import difference
+from utils.demosaic import demosaic, superpixel, HALO
+
+def array_to_qimage(data):
+    """QImage (own copy) of a C-contiguous uint8 (H, W) gray or (H, W, 3) RGB array."""
+    height, width = data.shape[:2]
+    if data.ndim == 3:
+        return QImage(data.data, width, height, 3 * width, QImage.Format.Format_RGB888).copy()
+    return QImage(data.data, width, height, width, QImage.Format.Format_Grayscale8).copy()
+
+TILE_SIZE = 256
+
+class QImageTileSource:
+    """
+    Produces pyramid tiles by downsampling regions of a full-resolution QImage.
+    Only level 1 is scaled from the image itself, TilePyramid builds the
+    coarser levels from the 2x2 tiles of the level below (compose_from).
+    """
+    compose_from = 1 # Coarsest level rendered straight from the source
+
+    def __init__(self, image):
+        self.image = image # Level 0 is drawn straight from this image
+
+    def width(self):
+        return self.image.width()
+
+    def height(self):
+        return self.image.height()
+
+    def render_tile(self, level, rect):
+        """
+        Returns the QImage for the level-0 region `rect` (QRect) rendered at
+        1 / 2**level resolution.
+        """
+        factor = 2 ** level
+        out_w = max(1, math.ceil(rect.width() / factor))
+        out_h = max(1, math.ceil(rect.height() / factor))
+        region = self.image.copy(rect)
+        if level == 0:
+            return region
+        return region.scaled(out_w, out_h, Qt.AspectRatioMode.IgnoreAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+
+# Diff view modes of DiffTileSource
+DIFF_MODES = ["Absolute", "Signed", "Mismatch"]
+
+class DiffTileSource:
+    """
+    Renders tiles of the difference test - reference on demand (see
+    utils.diff_engine.difference), nothing is computed for tiles that are
+    never looked at.
+        Absolute: |diff| as gray, `scale` DN (e.g. the max error) = white
+        Signed:   positive red, negative blue
+        Mismatch: |diff| > tolerance in red over the dimmed absolute view
+    """
+    def __init__(self, test, reference, mode="Absolute", scale=1, tolerance=0):
+        self.test = test
+        self.reference = reference
+        self.mode = mode
+        self.gain = 255.0 / max(scale, 1)
+        self.tolerance = tolerance
+
+    def width(self):
+        return self.test.shape[1]
+
+    def height(self):
+        return self.test.shape[0]
+
+    def render_tile(self, level, rect):
+        d = difference(self.test, self.reference, rect.y(), rect.y() + rect.height(),
+                       rect.x(), rect.x() + rect.width(), 2 ** level)
+        magnitude = np.minimum(np.abs(d) * self.gain, 255).astype(np.uint8)
+        if self.mode == "Absolute":
+            data = magnitude
+        else:
+            data = np.zeros(d.shape + (3,), dtype=np.uint8)
+            if self.mode == "Signed":
+                data[..., 0] = np.where(d > 0, magnitude, 0)
+                data[..., 2] = np.where(d < 0, magnitude, 0)
+            else:
+                data[...] = (magnitude // 2)[..., None]
+                data[np.abs(d) > self.tolerance] = (255, 0, 0)
+        return array_to_qimage(data)
+
+class DemosaicTileSource:
+    """
+    Full-color tiles demosaiced from the raw Bayer frame as they come into
+    view: level 0 with utils.demosaic.demosaic (tile + HALO border), coarser
+    levels from sampled 2x2 cells (superpixel), so the work and memory per
+    tile stay bounded by the tile size whatever the frame size.
+    `lut` is the display LUT (get_display_lut) over the raw container.
+    """
+    halo = HALO
+
+    def __init__(self, raw_data, pattern, method, lut):
+        self.raw_data = raw_data
+        self.pattern = pattern
+        self.method = method
+        self.lut = lut
+
+    def width(self):
+        return self.raw_data.shape[1]
+
+    def height(self):
+        return self.raw_data.shape[0]
+
+    def update_raw(self, raw_data):
+        """New frame content (e.g. corrected pixels), same geometry."""
+        self.raw_data = raw_data
+
+    def render_tile(self, level, rect):
+        y0, x0 = rect.y(), rect.x()
+        y1, x1 = y0 + rect.height(), x0 + rect.width()
+        if level == 0:
+            rgb = demosaic(self.raw_data, self.pattern, self.method, y0, y1, x0, x1)
+        else:
+            rgb = superpixel(self.raw_data, self.pattern, y0, y1, x0, x1, 2 ** level)
+        np.rint(rgb, out=rgb)
+        np.clip(rgb, 0, len(self.lut) - 1, out=rgb)
+        return array_to_qimage(self.lut[rgb.astype(np.intp)])
+
+class IspTileSource:
+    """
+    Tiles of the ISP preview (utils.isp.IspPipeline). The pipeline outlives
+    the source and keeps its per-tile stages, so after a parameter change
+    the pyramid is simply invalidated and each tile re-runs only the stages
+    after that change.
+    """
+    halo = HALO
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def width(self):
+        return self.pipeline.raw_data.shape[1]
+
+    def height(self):
+        return self.pipeline.raw_data.shape[0]
+
+    def update_raw(self, raw_data):
+        """New frame content (e.g. corrected pixels), same geometry."""
+        self.pipeline.update_raw(raw_data)
+
+    def render_tile(self, level, rect):
+        y0, x0 = rect.y(), rect.x()
+        return array_to_qimage(self.pipeline.render(level, y0, y0 + rect.height(), x0, x0 + rect.width()))
+
+class TilePyramid:
+    """
+    Lazily generated mip-map of fixed-size tiles behind the canvas.
+
+    Level L holds the image at 1 / 2**L resolution, cut into TILE_SIZE x
+    TILE_SIZE tiles. Tiles are rendered by `source` on first use and kept in
+    an LRU cache bounded by `budget_bytes`.
+    """
+    def __init__(self, source, budget_bytes=256 * 1024 * 1024, tile_size=TILE_SIZE):
+        self.source = source
+        self.budget_bytes = budget_bytes
+        self.tile_size = tile_size
+        self.tiles = OrderedDict() # (level, tx, ty) -> QImage, oldest first
+        self.cached_bytes = 0
+        
+        # Coarsest level: whole image fits in a single tile
+        longest = max(source.width(), source.height(), 1)
+        self.max_level = max(0, math.ceil(math.log2(max(longest / tile_size, 1))))
+
+    def level_for_scale(self, scale):
+        """Finest level that is still at least screen resolution for `scale`."""
+        if scale >= 1.0:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1.0 / scale))))
+
+    def tile_rect(self, level, tx, ty):
+        """Level-0 region (QRect) covered by tile (tx, ty) of `level`."""
+        span = self.tile_size * (2 ** level)
+        x = tx * span
+        y = ty * span
+        w = min(span, self.source.width() - x)
+        h = min(span, self.source.height() - y)
+        return QRect(x, y, w, h)
+
+    def get_tile(self, level, tx, ty):
+        key = (level, tx, ty)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+        
+        compose_from = getattr(self.source, "compose_from", None)
+        if compose_from is not None and level > compose_from:
+            tile = self.compose_tile(level, tx, ty)
+        else:
+            tile = self.source.render_tile(level, self.tile_rect(level, tx, ty))
+        self.tiles[key] = tile
+        self.cached_bytes += tile.sizeInBytes()
+        
+        # Evict least recently used, never the tile just made
+        while self.cached_bytes > self.budget_bytes and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.cached_bytes -= old.sizeInBytes()
+        return tile
+
+    def compose_tile(self, level, tx, ty):
+        """
+        Tile of `level` halved from its (up to) 2x2 child tiles of level - 1,
+        which come from the cache (rendered first if needed). Each level is
+        then a single 2x downscale of the one below instead of a full
+        resolution copy and scale per level.
+        """
+        rect = self.tile_rect(level, tx, ty)
+        factor = 2 ** (level - 1) # Child level scale
+        child_span = self.tile_size * factor
+        merged = None
+        painter = None
+        for dy in (0, 1):
+            for dx in (0, 1):
+                # Edge tiles have fewer children
+                if dx * child_span >= rect.width() or dy * child_span >= rect.height():
+                    continue
+                child = self.get_tile(level - 1, 2 * tx + dx, 2 * ty + dy)
+                if merged is None:
+                    merged = QImage(math.ceil(rect.width() / factor), math.ceil(rect.height() / factor), child.format())
+                    painter = QPainter(merged)
+                painter.drawImage(dx * self.tile_size, dy * self.tile_size, child)
+        painter.end()
+        return merged.scaled(math.ceil(rect.width() / (2 * factor)), math.ceil(rect.height() / (2 * factor)),
+                             Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+    def invalidate(self, rect=None):
+        """Drops cached tiles intersecting the level-0 QRect `rect` (all if None)."""
+        if rect is None:
+            self.tiles.clear()
+            self.cached_bytes = 0
+            return
+        for key in list(self.tiles):
+            if self.tile_rect(*key).intersects(rect):
+                self.cached_bytes -= self.tiles.pop(key).sizeInBytes()
+
+    def invalidate_points(self, xs, ys):
+        """
+        Drops the cached tiles (all levels) containing any of the level-0
+        pixels xs, ys. Marks the touched level-0 tiles in a small grid
+        first, so scattered edits cost one pass over the cache.
+        """
+        if len(xs) == 0 or not self.tiles:
+            return
+        grid_w = math.ceil(self.source.width() / self.tile_size)
+        grid_h = math.ceil(self.source.height() / self.tile_size)
+        touched = np.zeros((grid_h, grid_w), dtype=bool)
+        touched[np.asarray(ys) // self.tile_size, np.asarray(xs) // self.tile_size] = True
+        
+        for key in list(self.tiles):
+            level, tx, ty = key
+            n = 2 ** level # Level-0 tiles per tile side
+            if touched[ty * n:(ty + 1) * n, tx * n:(tx + 1) * n].any():
+                self.cached_bytes -= self.tiles.pop(key).sizeInBytes()
+
+    def draw(self, painter, visible_rect, scale):
+        """
+        Draws the part of the image inside `visible_rect` (QRectF, image
+        coordinates) at the level matching `scale`. The painter is expected
+        to already carry the image -> widget transform.
+        """
+        visible = visible_rect.intersected(QRectF(0, 0, self.source.width(), self.source.height()))
+        if visible.isEmpty():
+            return
+        
+        level = self.level_for_scale(scale)
+        direct = getattr(self.source, "image", None)
+        if level == 0 and direct is not None:
+            # Full resolution: one draw of just the visible region, no copies
+            src = visible.toAlignedRect()
+            painter.drawImage(QRectF(src), direct, QRectF(src))
+            return
+        
+        span = self.tile_size * (2 ** level)
+        tx0 = int(visible.left() // span)
+        ty0 = int(visible.top() // span)
+        tx1 = int(math.ceil(visible.right() / span))
+        ty1 = int(math.ceil(visible.bottom() / span))
+        
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                tile = self.get_tile(level, tx, ty)
+                painter.drawImage(QRectF(self.tile_rect(level, tx, ty)), tile)
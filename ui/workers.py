@@ -0,0 +1,182 @@
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+from PyQt6.QtGui import QImage
+import numpy as np
+
+from algorithms.jobs import JobContext, JobCancelled
+from utils.diff_engine import compare_frames
+
+class LoadCancelled(Exception):
+    """Raised inside a load task when it has been superseded or cancelled."""
+    pass
+
+def to_qimage(display_data):
+    """
+    Wraps an 8-bit (H, W) gray or (H, W, 3) RGB array in a QImage.
+    The returned QImage owns its buffer (safe to keep after the array goes away).
+    """
+    # QImage needs contiguous data
+    if not display_data.flags['C_CONTIGUOUS']:
+        display_data = np.ascontiguousarray(display_data)
+    
+    if display_data.ndim == 3:
+        height, width, _ = display_data.shape
+        q_img = QImage(display_data.data, width, height, 3 * width, QImage.Format.Format_RGB888)
+    else:
+        # Format_Grayscale8 is best for single channel
+        height, width = display_data.shape
+        q_img = QImage(display_data.data, width, height, width, QImage.Format.Format_Grayscale8)
+    
+    # QImage does not own numpy memory, copy before the array is released
+    return q_img.copy()
+
+class ImageLoadSignals(QObject):
+    progress = pyqtSignal(int, str) # percent, stage text
+    loaded = pyqtSignal(object, object, dict) # QImage, raw_data, params
+    failed = pyqtSignal(str)
+    finished = pyqtSignal() # Always emitted last, loaded/failed/cancelled alike
+
+class ImageLoadTask(QRunnable):
+    """
+    Runs the load pipeline (decode, normalization, colorization, QImage
+    conversion) on a QThreadPool worker. Results come back through `signals`,
+    which live on the GUI thread, so connected slots run there.
+    Stages that RawSource already has cached for params are not recomputed.
+    """
+    def __init__(self, source, params):
+        super().__init__()
+        self.setAutoDelete(False) # Owner keeps the task alive until finished
+        self.source = source
+        self.params = dict(params)
+        self.signals = ImageLoadSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def check_cancelled(self):
+        if self.is_cancelled:
+            raise LoadCancelled()
+
+    def run(self):
+        try:
+            params = self.params
+            
+            self.check_cancelled()
+            self.signals.progress.emit(10, "Reading")
+            raw_data = self.source.raw(params)
+            
+            self.check_cancelled()
+            self.signals.progress.emit(40, "Converting")
+            display_data = self.source.display(params)
+            
+            self.check_cancelled()
+            rgb_data = self.source.colorized(params)
+            if rgb_data is not None:
+                display_data = rgb_data
+            
+            self.check_cancelled()
+            self.signals.progress.emit(80, "Building image")
+            q_img = to_qimage(display_data)
+            
+            self.check_cancelled()
+            self.signals.progress.emit(100, "Done")
+            self.signals.loaded.emit(q_img, raw_data, params)
+        except LoadCancelled:
+            pass
+        except Exception as e:
+            if not self.is_cancelled:
+                self.signals.failed.emit(str(e))
+        finally:
+            self.signals.finished.emit()
+
+class FramePrefetchSignals(QObject):
+    frame_ready = pyqtSignal(int, object, object, dict) # frame index, QImage, raw_data, params
+    finished = pyqtSignal()
+
+class FramePrefetchTask(QRunnable):
+    """
+    Renders the given frames of a sequence ahead of time, one after the
+    other, and hands each one back as soon as it is ready. Uses
+    RawSource.render so the frame on screen keeps its cached stages.
+    """
+    def __init__(self, source, params, frame_indices):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.source = source
+        self.params = dict(params)
+        self.frame_indices = list(frame_indices)
+        self.signals = FramePrefetchSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        try:
+            for index in self.frame_indices:
+                if self.is_cancelled:
+                    break
+                params = dict(self.params, frame_index=index)
+                display_data, raw_data = self.source.render(params)
+                # Still hand it over if cancelled meanwhile, the cache can use it
+                self.signals.frame_ready.emit(index, to_qimage(display_data), raw_data, params)
+        except Exception:
+            pass # Prefetch is best effort, the foreground load reports errors
+        finally:
+            self.signals.finished.emit()
+
+class AlgorithmJobSignals(QObject):
+    """
+    Bridges the callbacks of an algorithms.jobs.JobRunner job (called on a
+    worker thread) to the GUI thread.
+    """
+    progress = pyqtSignal(int, str) # percent, stage text
+    finished = pyqtSignal(object) # result dict
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def callbacks(self):
+        """Keyword arguments for JobRunner.submit."""
+        return {
+            "on_progress": lambda fraction, text: self.progress.emit(int(fraction * 100), text),
+            "on_done": self.finished.emit,
+            "on_error": lambda e: self.failed.emit(str(e)),
+            "on_cancelled": self.cancelled.emit
+        }
+
+class DiffSignals(QObject):
+    done = pyqtSignal(object) # compare_frames result
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+class DiffTask(QRunnable):
+    """
+    Runs utils.diff_engine.compare_frames on a worker. cancel() stops it
+    between bands (through a JobContext).
+    """
+    def __init__(self, test, reference, pattern, bit_depth, tolerance):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.test = test
+        self.reference = reference
+        self.pattern = pattern
+        self.bit_depth = bit_depth
+        self.tolerance = tolerance
+        self.context = JobContext()
+        self.signals = DiffSignals()
+
+    def cancel(self):
+        self.context.cancel()
+
+    def run(self):
+        try:
+            result = compare_frames(self.test, self.reference, self.pattern, self.bit_depth,
+                                    self.tolerance, context=self.context)
+            self.signals.done.emit(result)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            if not self.context.cancelled:
+                self.signals.failed.emit(str(e))
+        finally:
+            self.signals.finished.emit()
@@ -0,0 +1,4 @@
+BAYER_PATTERNS = ["RGGB", "BGGR", "GRBG", "GBRG"]
+
+# Bayer plane offsets (dy, dx) of the 2x2 grid, channel index dy * 2 + dx
+BAYER_OFFSETS = [(0, 0), (0, 1), (1, 0), (1, 1)]
@@ -0,0 +1,161 @@
+import numpy as np
+
+from utils.bayer import BAYER_PATTERNS
+
+DEMOSAIC_METHODS = ["None", "Bilinear", "Malvar-He-Cutler"]
+
+# Context a demosaiced region needs around it (the 5x5 Malvar kernels)
+HALO = 2
+
+# Interpolation kernels as {(dy, dx): weight}, applied only at the sites of
+# the 2x2 phase that needs them.
+#   g_at_rb: green at a red / blue site
+#   row:     red or blue at a green site that has that color left and right
+#   col:     same with the color above and below
+#   diag:    blue at a red site and red at a blue site
+BILINEAR_KERNELS = {
+    "g_at_rb": {(-1, 0): 0.25, (1, 0): 0.25, (0, -1): 0.25, (0, 1): 0.25},
+    "row": {(0, -1): 0.5, (0, 1): 0.5},
+    "col": {(-1, 0): 0.5, (1, 0): 0.5},
+    "diag": {(-1, -1): 0.25, (-1, 1): 0.25, (1, -1): 0.25, (1, 1): 0.25}
+}
+
+def _scaled(taps, factor):
+    return {offset: weight * factor for offset, weight in taps.items()}
+
+# Malvar, He, Cutler: "High-quality linear interpolation for demosaicing of
+# Bayer-patterned color images" (ICASSP 2004). Bilinear plus a correction by
+# the Laplacian of the known channel at the site, weights in 1/8.
+_MALVAR_ROW = {(0, 0): 5, (0, -1): 4, (0, 1): 4, (0, -2): -1, (0, 2): -1,
+               (-1, -1): -1, (-1, 1): -1, (1, -1): -1, (1, 1): -1, (-2, 0): 0.5, (2, 0): 0.5}
+MALVAR_KERNELS = {
+    "g_at_rb": _scaled({(0, 0): 4, (-1, 0): 2, (1, 0): 2, (0, -1): 2, (0, 1): 2,
+                        (-2, 0): -1, (2, 0): -1, (0, -2): -1, (0, 2): -1}, 1 / 8),
+    "row": _scaled(_MALVAR_ROW, 1 / 8),
+    "col": _scaled({(dx, dy): w for (dy, dx), w in _MALVAR_ROW.items()}, 1 / 8),
+    "diag": _scaled({(0, 0): 6, (-1, -1): 2, (-1, 1): 2, (1, -1): 2, (1, 1): 2,
+                     (-2, 0): -1.5, (2, 0): -1.5, (0, -2): -1.5, (0, 2): -1.5}, 1 / 8)
+}
+
+KERNELS = {"Bilinear": BILINEAR_KERNELS, "Malvar-He-Cutler": MALVAR_KERNELS}
+
+def read_with_halo(raw_data, y0, y1, x0, x1, halo=HALO, dtype=np.float32):
+    """
+    raw_data[y0 - halo:y1 + halo, x0 - halo:x1 + halo] as `dtype` (a copy
+    for float32, may be a view for the raw dtype).
+    Outside the frame the data is mirrored without repeating the edge
+    (-1 -> 1), which keeps every pixel on its Bayer phase.
+    """
+    height, width = raw_data.shape
+    ys = np.abs(np.arange(y0 - halo, y1 + halo))
+    ys = np.where(ys >= height, 2 * (height - 1) - ys, ys)
+    xs = np.abs(np.arange(x0 - halo, x1 + halo))
+    xs = np.where(xs >= width, 2 * (width - 1) - xs, xs)
+    inner_y = slice(max(y0 - halo, 0), min(y1 + halo, height))
+    inner_x = slice(max(x0 - halo, 0), min(x1 + halo, width))
+    if inner_y.stop - inner_y.start == len(ys) and inner_x.stop - inner_x.start == len(xs):
+        return raw_data[inner_y, inner_x].astype(dtype, copy=False) # Interior tile: a plain slice
+    return raw_data[ys[:, None], xs[None, :]].astype(dtype, copy=False)
+
+def linearize(padded, pattern, y0, x0, lut, halo=HALO):
+    """
+    float32 lut[channel][padded] with each pixel looked up in the table of
+    its own Bayer color. padded is a read_with_halo block of raw integers
+    for the region starting at (y0, x0).
+    """
+    out = np.empty(padded.shape, dtype=np.float32)
+    for dy in (0, 1):
+        for dx in (0, 1):
+            color = pattern[((y0 - halo + dy) % 2) * 2 + (x0 - halo + dx) % 2]
+            out[dy::2, dx::2] = lut["RGB".index(color)][padded[dy::2, dx::2]]
+    return out
+
+def apply_taps(padded, taps, py, px, rows, cols, halo=HALO):
+    """
+    Sum of weight * neighbor over `taps` at the (rows x cols) sites
+    padded[halo + py::2, halo + px::2], i.e. one 2x2 phase of the region.
+    """
+    out = np.zeros((rows, cols), dtype=np.float32)
+    for (dy, dx), weight in taps.items():
+        y = halo + py + dy
+        x = halo + px + dx
+        out += weight * padded[y:y + 2 * rows - 1:2, x:x + 2 * cols - 1:2]
+    return out
+
+def demosaic(raw_data, pattern, method="Bilinear", y0=0, y1=None, x0=0, x1=None, lut=None, out=None):
+    """
+    Demosaics the region [y0, y1) x [x0, x1) of a Bayer frame into a float32
+    (h, w, 3) RGB array in raw units (not clipped).
+
+    lut: optional (3, 2**bits) float32 per-channel table the raw values are
+         read through first (see utils.isp.input_lut), the result is then
+         in the table's units.
+    out: optional preallocated float32 (h, w, 3) array to fill.
+
+    Each 2x2 phase of the region is a strided view; every missing color of
+    a phase is one small convolution evaluated only at that phase's sites.
+    Only the region plus a HALO pixel border is read, so the frame can be
+    processed tile by tile with results identical to a whole-frame pass.
+    """
+    height, width = raw_data.shape
+    y1 = height if y1 is None else y1
+    x1 = width if x1 is None else x1
+    h, w = y1 - y0, x1 - x0
+    if lut is not None and pattern in BAYER_PATTERNS:
+        padded = linearize(read_with_halo(raw_data, y0, y1, x0, x1, dtype=raw_data.dtype), pattern, y0, x0, lut)
+    else:
+        padded = read_with_halo(raw_data, y0, y1, x0, x1)
+    rgb = np.empty((h, w, 3), dtype=np.float32) if out is None else out
+
+    if pattern not in BAYER_PATTERNS:
+        rgb[...] = padded[HALO:HALO + h, HALO:HALO + w, None]
+        return rgb
+
+    kernels = KERNELS[method]
+    channel_of = {"R": 0, "G": 1, "B": 2}
+    for py in (0, 1):
+        for px in (0, 1):
+            rows = (h - py + 1) // 2
+            cols = (w - px + 1) // 2
+            if rows <= 0 or cols <= 0:
+                continue
+            # Colors around this site, from its phase in the frame
+            gy, gx = (y0 + py) % 2, (x0 + px) % 2
+            site = pattern[gy * 2 + gx]
+            in_row = pattern[gy * 2 + (1 - gx)]
+
+            out = rgb[py::2, px::2]
+            out[..., channel_of[site]] = padded[HALO + py:HALO + py + 2 * rows - 1:2,
+                                                HALO + px:HALO + px + 2 * cols - 1:2]
+            if site == "G":
+                in_col = "R" if in_row == "B" else "B"
+                out[..., channel_of[in_row]] = apply_taps(padded, kernels["row"], py, px, rows, cols)
+                out[..., channel_of[in_col]] = apply_taps(padded, kernels["col"], py, px, rows, cols)
+            else:
+                other = "B" if site == "R" else "R"
+                out[..., 1] = apply_taps(padded, kernels["g_at_rb"], py, px, rows, cols)
+                out[..., channel_of[other]] = apply_taps(padded, kernels["diag"], py, px, rows, cols)
+    return rgb
+
+def superpixel(raw_data, pattern, y0, y1, x0, x1, step):
+    """
+    Reduced-resolution RGB of [y0, y1) x [x0, x1) for zoomed-out views:
+    one output pixel per sampled 2x2 Bayer cell (R, mean of both greens,
+    B), every `step` pixels. step must be even and y0 / x0 cell aligned.
+    """
+    height, width = raw_data.shape
+    cell_ys = np.arange(y0, y1, step)
+    cell_xs = np.arange(x0, x1, step)
+    rgb = np.zeros((len(cell_ys), len(cell_xs), 3), dtype=np.float32)
+    channel_of = {"R": 0, "G": 1, "B": 2}
+    for dy in (0, 1):
+        for dx in (0, 1):
+            # A cell cut by an odd frame edge borrows the row / column 2 back
+            ys = cell_ys + dy
+            ys[ys >= height] -= 2
+            xs = cell_xs + dx
+            xs[xs >= width] -= 2
+            color = pattern[((y0 + dy) % 2) * 2 + (x0 + dx) % 2]
+            weight = 0.5 if color == "G" else 1.0
+            rgb[..., channel_of[color]] += weight * raw_data[ys[:, None], xs[None, :]]
+    return rgb
@@ -0,0 +1,127 @@
+import numpy as np
+
+from utils.bayer import BAYER_PATTERNS, BAYER_OFFSETS
+
+# Scratch memory of one compare_frames band (signed + absolute difference)
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+def psnr(mse, peak):
+    """Peak signal-to-noise ratio in dB, inf for identical data."""
+    if mse <= 0:
+        return float("inf")
+    return float(10.0 * np.log10(peak * peak / mse))
+
+def chunk_rows_for(width, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Rows per band so the int32 scratch stays within chunk_bytes, even to keep the Bayer phase."""
+    rows = max(chunk_bytes // max(width * 8, 1), 2)
+    return rows - rows % 2
+
+def compare_frames(test, reference, pattern="Mono/None", bit_depth=None, tolerance=0, chunk_rows=None,
+                   context=None):
+    """
+    Compares two frames of the same size in row bands: the signed and
+    absolute differences of a band are computed once into reused int32
+    buffers and reduced per Bayer channel.
+
+    tolerance: pixels with |test - reference| > tolerance are mismatches.
+    bit_depth: sets the PSNR peak (2**bit_depth - 1), else the dtype max.
+    context: optional algorithms.jobs.JobContext for progress / cancel.
+
+    RETURNS: dict
+        "channels": one dict per channel (name, count, mae, rmse, psnr,
+                    max_error, mismatches), "total": the same over all
+                    pixels, "mask": (H, W) bool mismatch mask
+    """
+    if test.shape != reference.shape:
+        raise ValueError(f"Frames differ in size: {test.shape[1]}x{test.shape[0]} vs "
+                         f"{reference.shape[1]}x{reference.shape[0]}")
+    height, width = test.shape
+    if bit_depth is None:
+        bit_depth = test.dtype.itemsize * 8
+    peak = (1 << bit_depth) - 1
+
+    if pattern in BAYER_PATTERNS:
+        offsets, step = BAYER_OFFSETS, 2
+        names = [pattern[dy * 2 + dx] for dy, dx in BAYER_OFFSETS]
+    else:
+        offsets, step, names = [(0, 0)], 1, ["Y"]
+
+    if chunk_rows is None:
+        chunk_rows = chunk_rows_for(width)
+    chunk_rows = max(chunk_rows - chunk_rows % step, step)
+    signed = np.empty((min(chunk_rows, height), width), dtype=np.int32)
+    absolute = np.empty_like(signed)
+    mask = np.empty((height, width), dtype=bool)
+
+    abs_sums = [0] * len(offsets)
+    square_sums = [0] * len(offsets)
+    max_errors = [0] * len(offsets)
+    mismatches = [0] * len(offsets)
+    counts = [0] * len(offsets)
+
+    if context is not None:
+        context.set_total(height, "Comparing")
+    for y0 in range(0, height, chunk_rows):
+        y1 = min(y0 + chunk_rows, height)
+        rows = y1 - y0
+        d = signed[:rows]
+        a = absolute[:rows]
+        np.subtract(test[y0:y1], reference[y0:y1], out=d, dtype=np.int32)
+        np.abs(d, out=a)
+        np.greater(a, tolerance, out=mask[y0:y1])
+
+        # y0 is a multiple of step, the band views keep the frame's phases
+        for channel, (dy, dx) in enumerate(offsets):
+            view = a[dy::step, dx::step]
+            if view.size == 0:
+                continue
+            counts[channel] += view.size
+            abs_sums[channel] += int(view.sum(dtype=np.int64))
+            square_sums[channel] += int(np.einsum("ij,ij->", view, view, dtype=np.int64))
+            max_errors[channel] = max(max_errors[channel], int(view.max()))
+            mismatches[channel] += int(np.count_nonzero(mask[y0 + dy:y1:step, dx::step]))
+        if context is not None:
+            context.advance(rows)
+
+    def summarize(name, count, abs_sum, square_sum, max_error, mismatch):
+        mse = square_sum / count if count else 0.0
+        return {
+            "name": name,
+            "count": count,
+            "mae": abs_sum / count if count else 0.0,
+            "rmse": float(np.sqrt(mse)),
+            "psnr": psnr(mse, peak),
+            "max_error": max_error,
+            "mismatches": mismatch
+        }
+
+    channels = [summarize(*values) for values in zip(names, counts, abs_sums, square_sums, max_errors, mismatches)]
+    total = summarize("All", sum(counts), sum(abs_sums), sum(square_sums), max(max_errors), sum(mismatches))
+    return {"channels": channels, "total": total, "mask": mask}
+
+def difference(test, reference, y0, y1, x0, x1, step=1):
+    """
+    Signed int32 test - reference over [y0, y1) x [x0, x1) at 1 / step
+    resolution. With step > 1 each output pixel is the largest (by
+    magnitude) difference within its step x step block, so isolated
+    mismatches of any Bayer channel survive zooming out.
+    """
+    if step == 1:
+        return np.subtract(test[y0:y1, x0:x1], reference[y0:y1, x0:x1], dtype=np.int32)
+
+    width = x1 - x0
+    blocks_x = -(-width // step)
+    out = np.zeros((-(-(y1 - y0) // step), blocks_x), dtype=np.int32)
+    padded = np.zeros((out.shape[0], blocks_x * step), dtype=np.int32)
+    # One pass per row phase: whole rows, reduced across each block's columns
+    for dy in range(step):
+        rows = test[y0 + dy:y1:step, x0:x1]
+        if rows.shape[0] == 0:
+            break
+        d = padded[:rows.shape[0]]
+        np.subtract(rows, reference[y0 + dy:y1:step, x0:x1], out=d[:, :width], dtype=np.int32)
+        blocks = d.reshape(d.shape[0], blocks_x, step)
+        largest = np.take_along_axis(blocks, np.abs(blocks).argmax(axis=2)[..., None], axis=2)[..., 0]
+        target = out[:d.shape[0]]
+        np.copyto(target, largest, where=np.abs(largest) > np.abs(target))
+    return out
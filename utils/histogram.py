@@ -0,0 +1,124 @@
+import numpy as np
+
+from utils.bayer import BAYER_PATTERNS, BAYER_OFFSETS
+
+# Pixels looked at by ChannelHistogram.from_image, enough for stable
+# percentiles and a few milliseconds even on 50 MP frames
+DEFAULT_MAX_SAMPLES = 1 << 20
+
+# Params that control the display window (see display_window)
+DISPLAY_PARAMS = ("auto_levels", "low_percentile", "high_percentile", "black", "white")
+
+class ChannelHistogram:
+    """
+    Per-channel histograms of raw integer data: one np.bincount row per
+    Bayer plane (the [dy::2, dx::2] views), a single row for mono data.
+    Counts are kept at full native resolution (one bin per code value), so
+    percentiles are exact for the data that went in.
+
+    add() accumulates tiles or sampled views, a frame can be built up
+    incrementally while it is decoded. from_image() samples a whole frame.
+    """
+    def __init__(self, pattern="Mono/None", levels=1 << 16):
+        self.pattern = pattern
+        self.offsets = BAYER_OFFSETS if pattern in BAYER_PATTERNS else [(0, 0)]
+        self.step = 2 if pattern in BAYER_PATTERNS else 1
+        self.counts = np.zeros((len(self.offsets), levels), dtype=np.int64)
+
+    @property
+    def levels(self):
+        return self.counts.shape[1]
+
+    @property
+    def channel_names(self):
+        """Pattern letter of each row (e.g. R, G, G, B), "Y" for mono."""
+        if self.step == 1:
+            return ["Y"]
+        return [self.pattern[dy * 2 + dx] for dy, dx in self.offsets]
+
+    @classmethod
+    def from_image(cls, raw_data, pattern="Mono/None", max_samples=DEFAULT_MAX_SAMPLES):
+        """
+        Histogram of raw_data from a regular subsample of at most about
+        max_samples pixels. Whole 2x2 Bayer cells are skipped, so every
+        channel is sampled evenly.
+        """
+        hist = cls(pattern, 1 << (raw_data.dtype.itemsize * 8))
+        sample_step = max(int(np.ceil(np.sqrt(raw_data.size / max_samples))), 1)
+        hist.add(raw_data, sample_step=sample_step)
+        return hist
+
+    def add(self, tile, y0=0, x0=0, sample_step=1):
+        """
+        Adds the pixels of `tile`, whose top-left pixel is (x0, y0) of the
+        frame (keeps tiles at odd offsets on the right Bayer phase).
+        sample_step > 1 only takes every n-th pixel of each channel plane.
+        """
+        for channel, (dy, dx) in enumerate(self.offsets):
+            view = tile[(dy - y0) % self.step::self.step, (dx - x0) % self.step::self.step]
+            if sample_step > 1:
+                view = view[::sample_step, ::sample_step]
+            if view.size == 0:
+                continue
+            counts = np.bincount(view.ravel(), minlength=self.levels)
+            if len(counts) > self.levels:
+                # Values beyond the expected range (e.g. signed data reinterpreted)
+                self.counts = np.pad(self.counts, ((0, 0), (0, len(counts) - self.levels)))
+            self.counts[channel, :len(counts)] += counts
+
+    def merge(self, other):
+        """Adds the counts of another histogram of the same pattern."""
+        if other.levels > self.levels:
+            self.counts = np.pad(self.counts, ((0, 0), (0, other.levels - self.levels)))
+        self.counts[:, :other.levels] += other.counts
+
+    def total(self):
+        """Counts of all channels together."""
+        return self.counts.sum(axis=0)
+
+    def sample_count(self):
+        return int(self.counts.sum())
+
+    def percentile(self, q, channel=None):
+        """
+        Smallest code value with at least q percent of the samples at or
+        below it, over one channel row or all channels (None).
+        """
+        counts = self.total() if channel is None else self.counts[channel]
+        cdf = np.cumsum(counts)
+        if cdf[-1] == 0:
+            return 0
+        # At least one sample, percentile 0 is the minimum
+        return int(np.searchsorted(cdf, max(cdf[-1] * q / 100.0, 1), side="left"))
+
+    def auto_window(self, low=0.1, high=99.9):
+        """
+        (black, white) display points at the low / high percentiles of all
+        channels, at least one code value apart.
+        """
+        black = self.percentile(low)
+        white = max(self.percentile(high), black + 1)
+        return black, white
+
+    def binned(self, bins=256, max_value=None):
+        """
+        (channels, bins) counts over [0, max_value] for drawing; the last bin
+        takes any remaining levels.
+        """
+        if max_value is None:
+            max_value = self.levels - 1
+        edges = np.linspace(0, max_value + 1, bins + 1).astype(np.int64)
+        edges[-1] = self.levels
+        cumulative = np.concatenate([np.zeros((self.counts.shape[0], 1), dtype=np.int64),
+                                     np.cumsum(self.counts, axis=1)], axis=1)
+        return cumulative[:, edges[1:]] - cumulative[:, edges[:-1]]
+
+def display_window(params, histogram=None):
+    """
+    (black, white) display points for params: the auto_window of
+    `histogram` when params['auto_levels'] is set, else the manual
+    'black' / 'white' points (white 0 or missing = full range, None).
+    """
+    if params.get("auto_levels") and histogram is not None:
+        return histogram.auto_window(params.get("low_percentile", 0.1), params.get("high_percentile", 99.9))
+    return params.get("black", 0), params.get("white") or None
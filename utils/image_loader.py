@@ -1,41 +1,142 @@
 import numpy as np
+import os
+from functools import lru_cache
 
+from utils.unpack import PACKED_FORMATS, packed_line_bytes, unpack_mipi
 
 
-def load_raw_image(file_path, width, height, bit_depth):
+def get_frame_layout(width, height, bit_depth, packing=None, stride=0, frame_header=0, frame_stride=0):
     """
-    Loads a headerless RAW image and converts it to a normalized 8-bit numpy array.
+    Describes how one frame is laid out on disk.
+    A file may hold a sequence of frames: frame i starts at
+    frame_header + i * frame_stride bytes (frame_header skips a per-frame
+    header, frame_stride 0 = frames packed back to back).
+    RETURNS:
+        dict with keys:
+            "dtype": container dtype of the stored samples (uint8 for packed data)
+            "bit_depth": effective bit depth (packed formats override bit_depth)
+            "stride": bytes per line including padding
+            "frame_bytes": bytes occupied by the whole frame
+            "frame_header": bytes before the pixel data of each frame
+            "frame_stride": bytes from one frame to the next
     """
-    try:
-        # Determine data type based on bit depth
+    packed = packing in PACKED_FORMATS
+    
+    # Determine data type based on bit depth
+    if packed:
+        bit_depth = PACKED_FORMATS[packing]["bit_depth"]
+        dtype = np.dtype(np.uint8) # Read the packed bytes, decode later
+        line_bytes = packed_line_bytes(width, packing)
+    else:
         if bit_depth <= 8:
-            dtype = np.uint8
+            dtype = np.dtype(np.uint8)
         elif bit_depth <= 16:
-            dtype = np.uint16
+            dtype = np.dtype(np.uint16)
         else:
             raise ValueError("Unsupported bit depth")
-        
-        # Read data from file
-        raw_data = np.fromfile(file_path, dtype=dtype)
+        line_bytes = width * dtype.itemsize
+    
+    if not stride:
+        stride = line_bytes
+    if stride < line_bytes:
+        raise ValueError(f"Line stride {stride} is smaller than a line ({line_bytes} bytes)")
+    if stride % dtype.itemsize:
+        raise ValueError(f"Line stride {stride} is not a multiple of {dtype.itemsize} bytes")
+    
+    frame_bytes = stride * height
+    if not frame_stride:
+        frame_stride = frame_header + frame_bytes
+    if frame_stride < frame_header + frame_bytes:
+        raise ValueError(f"Frame stride {frame_stride} is smaller than a frame ({frame_header + frame_bytes} bytes)")
+    
+    return {
+        "dtype": dtype,
+        "bit_depth": bit_depth,
+        "stride": stride,
+        "frame_bytes": frame_bytes,
+        "frame_header": frame_header,
+        "frame_stride": frame_stride
+    }
+
+def get_frame_count(file_size, layout):
+    """
+    Number of complete frames in a file of file_size bytes.
+    The last frame does not need its trailing frame_stride padding.
+    """
+    first_end = layout["frame_header"] + layout["frame_bytes"]
+    if file_size < first_end:
+        return 0
+    return (file_size - first_end) // layout["frame_stride"] + 1
+
+def frame_offset(layout, frame_index):
+    """Byte offset of the pixel data of frame_index."""
+    return layout["frame_header"] + frame_index * layout["frame_stride"]
+
+def decode_raw_buffer(buffer, width, height, bit_depth, packing=None, stride=0,
+                      frame_index=0, frame_header=0, frame_stride=0):
+    """
+    Interprets a 1D uint8 byte buffer (ndarray, memmap) as a (height, width)
+    raw frame. Unpacked data comes back as a zero-copy view of the buffer,
+    packed data is decoded into a new uint16 array.
+    For sequences, frame_index selects the frame (an offset, nothing before it is touched).
+    """
+    layout = get_frame_layout(width, height, bit_depth, packing, stride, frame_header, frame_stride)
+    frame_count = get_frame_count(buffer.size, layout)
+    if frame_count == 0:
+        raise ValueError(f"File size too small for dimensions {width}x{height}")
+    if not 0 <= frame_index < frame_count:
+        raise IndexError(f"Frame {frame_index} out of range (file holds {frame_count} frames)")
+    
+    dtype = layout["dtype"]
+    start = frame_offset(layout, frame_index)
+    lines = buffer[start:start + layout["frame_bytes"]].view(dtype).reshape((height, layout["stride"] // dtype.itemsize))
+    
+    if packing in PACKED_FORMATS:
+        return unpack_mipi(lines, width, packing)
+    if lines.shape[1] != width:
+        return lines[:, :width] # Drop line padding (still a view)
+    return lines
+
+def load_raw_image(file_path, width, height, bit_depth, use_mmap=False, packing=None, stride=0,
+                   frame_index=0, frame_header=0, frame_stride=0):
+    """
+    Loads a headerless RAW image and converts it to a normalized 8-bit numpy array.
+
+    With use_mmap=True the file is memory-mapped read-only and the returned raw
+    array is a zero-copy (height, width) view of it: nothing is read up front,
+    the OS pages in only the regions that are actually touched, and the mapping
+    stays alive as long as the raw array is referenced.
+
+    packing selects a MIPI CSI-2 packed format (see utils.unpack.PACKED_FORMATS);
+    its bit depth overrides `bit_depth` and the lines are decoded into uint16.
+    stride is the number of bytes per line including padding (0 = no padding).
+    frame_index / frame_header / frame_stride pick one frame out of a
+    multi-frame file (see get_frame_layout); only that frame is read.
+    """
+    try:
+        layout = get_frame_layout(width, height, bit_depth, packing, stride, frame_header, frame_stride)
         
         # Check if dimensions match file size
-        expected_size = width * height
-        if raw_data.size != expected_size:
-             # Try to adjust if file is larger (maybe has header or extra data, but we strictly read W*H here? 
-             # Or typically raw files are exact. Let's warn or just slice.)
-             if raw_data.size > expected_size:
-                 raw_data = raw_data[:expected_size]
-             else:
-                 raise ValueError(f"File size too small for dimensions {width}x{height}")
-
-        # Reshape
-        image = raw_data.reshape((height, width))
+        # Extra trailing data (footer, padding) is ignored, we only read H lines.
+        file_size = os.path.getsize(file_path)
+        if file_size < layout["frame_header"] + layout["frame_bytes"]:
+            raise ValueError(f"File size too small for dimensions {width}x{height}")
+        frame_count = get_frame_count(file_size, layout)
+        if not 0 <= frame_index < frame_count:
+            raise IndexError(f"Frame {frame_index} out of range (file holds {frame_count} frames)")
+        
+        offset = frame_offset(layout, frame_index)
+        if use_mmap:
+            # Map only the frame region - no copy, no read.
+            buffer = np.memmap(file_path, dtype=np.uint8, mode='r', offset=offset, shape=(layout["frame_bytes"],))
+        else:
+            # Read exactly the frame, not the whole file
+            buffer = np.fromfile(file_path, dtype=np.uint8, count=layout["frame_bytes"], offset=offset)
+        
+        image = decode_raw_buffer(buffer, width, height, bit_depth, packing, stride)
         
-        # Normalize to 8-bit for display purposes
-        # If 10, 12, 14, 16 bit, we typically shift or scale. 
-        # Simple scaling: (value / max_val) * 255
-        max_val = (2 ** bit_depth) - 1
-        normalized_image = (image.astype(np.float32) / max_val * 255).astype(np.uint8)
+        # Normalize to 8-bit for display purposes (one LUT lookup per pixel)
+        normalized_image = apply_display_lut(image, layout["bit_depth"])
         
         return normalized_image, image # Return both display version and original raw data
         
@@ -43,17 +144,47 @@ def load_raw_image(file_path, width, height, bit_depth):
         print(f"Error loading image: {e}")
         return None, None
 
-def apply_bayer_mask(raw_data, pattern, bit_depth):
+@lru_cache(maxsize=32)
+def get_display_lut(bit_depth, container_bits=16, black=0, white=None, gamma=1.0):
+    """
+    Returns a cached read-only uint8 lookup table mapping every raw value of a
+    `container_bits` container to its 8-bit display value.
+    Windowing (black/white points) and gamma are folded into the same table,
+    values outside the window clip to 0 / 255.
+    """
+    max_val = (2 ** bit_depth) - 1
+    if white is None:
+        white = max_val
+    span = max(white - black, 1)
+    
+    values = np.arange(2 ** container_bits, dtype=np.float32)
+    norm = np.clip((values - black) / span, 0.0, 1.0)
+    if gamma != 1.0:
+        norm **= 1.0 / gamma
+    lut = (norm * 255).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+def apply_display_lut(raw_data, bit_depth, black=0, white=None, gamma=1.0):
+    """
+    Converts raw integer data to 8-bit display data through the cached LUT.
+    """
+    container_bits = raw_data.dtype.itemsize * 8
+    lut = get_display_lut(bit_depth, container_bits, black, white, gamma)
+    return np.take(lut, raw_data)
+
+def apply_bayer_mask(raw_data, pattern, bit_depth, normalized=None):
     """
     Applies Bayer mask to raw data to produce a color-coded image (mosaic).
     Returns (H, W, 3) uint8 image.
+    normalized: (optional) 8-bit display plane already produced for raw_data,
+    e.g. by load_raw_image. Reused as-is instead of normalizing again.
     """
     height, width = raw_data.shape
     
     # Normalize to 8-bit
-    max_val = (2 ** bit_depth) - 1
-    # Use float to avoid overflow before normalization
-    normalized = (raw_data.astype(np.float32) / max_val * 255).astype(np.uint8)
+    if normalized is None:
+        normalized = apply_display_lut(raw_data, bit_depth)
     
     # Create RGB image
     image_rgb = np.zeros((height, width, 3), dtype=np.uint8)
@@ -0,0 +1,225 @@
+import numpy as np
+from collections import OrderedDict
+
+from utils.demosaic import demosaic, superpixel
+from utils.bayer import BAYER_PATTERNS
+
+# params keys of the ISP preview (see IspPipeline.set_params)
+ISP_PARAMS = ("isp", "wb_gains", "ccm", "gamma")
+
+IDENTITY_CCM = (1.0, 0.0, 0.0,
+                0.0, 1.0, 0.0,
+                0.0, 0.0, 1.0)
+
+DEFAULT_ISP = {"isp": False, "wb_gains": (1.0, 1.0, 1.0), "ccm": IDENTITY_CCM, "gamma": 2.2}
+
+# Linear levels of the tone curve: 14 bits keeps the steep start of a
+# gamma curve within a few 8-bit codes per step
+TONE_LUT_SIZE = 1 << 14
+
+# Float32 RGB scratch of one row band, about the size of an L2 cache
+BAND_BYTES = 1024 * 1024
+MIN_BAND_ROWS = 16
+
+# Regions larger than this (e.g. an export) run the banded pass uncached
+MAX_CACHED_PIXELS = 512 * 512
+
+def band_rows(width, band_bytes=BAND_BYTES):
+    """Rows per band so a float32 RGB band of `width` stays within band_bytes."""
+    return max(band_bytes // max(width * 12, 1), MIN_BAND_ROWS)
+
+def input_lut(container_bits, black, white, gains):
+    """
+    (3, 2**container_bits) float32 table folding the integer front end
+    into one lookup per pixel: raw DN -> (DN - black) / (white - black)
+    times the channel's white balance gain, 1.0 = white.
+    """
+    values = np.arange(1 << container_bits, dtype=np.float32)
+    scales = np.asarray(gains, dtype=np.float32) / np.float32(max(white - black, 1))
+    return (values[None, :] - np.float32(black)) * scales[:, None]
+
+def tone_lut(gamma, size=TONE_LUT_SIZE):
+    """uint8 display codes of `size` evenly spaced linear levels over [0, 1]."""
+    levels = np.linspace(0.0, 1.0, size)
+    return np.rint(255.0 * levels ** (1.0 / gamma)).astype(np.uint8)
+
+def tone_indices(linear, ccm, out=None, scratch=None):
+    """
+    Applies the 3x3 color matrix to linear (h, w, 3) float32 RGB and
+    quantizes the result to uint16 tone curve indices (clipped to [0, 1]).
+    The matrix carries the index scale, so each row band is one matmul,
+    one clip and one rounding cast through the float32 `scratch` band.
+    """
+    height, width = linear.shape[:2]
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint16)
+    if scratch is None or scratch.shape[1] < width:
+        scratch = np.empty((min(band_rows(width), height), width, 3), dtype=np.float32)
+    rows = scratch.shape[0]
+    matrix = np.asarray(ccm, dtype=np.float32).reshape(3, 3).T * np.float32(TONE_LUT_SIZE - 1)
+
+    for y0 in range(0, height, rows):
+        y1 = min(y0 + rows, height)
+        band = scratch[:y1 - y0, :width]
+        np.matmul(linear[y0:y1], matrix, out=band)
+        np.clip(band, 0, TONE_LUT_SIZE - 1, out=band)
+        band += 0.5 # Round on the truncating cast below
+        out[y0:y1] = band
+    return out
+
+class IspPipeline:
+    """
+    Preview ISP of a Bayer frame, rendered region by region:
+
+        input    <- black / white (display window), WB gains: one LUT, raw DN -> linear
+        demosaic <- input + method (utils.demosaic, reads through the LUT)
+        ccm      <- demosaic + color matrix: uint16 tone curve indices
+        tone     <- gamma: one LUT, index -> 8-bit
+
+    Both LUTs are rebuilt only when their own parameters change. Regions
+    up to MAX_CACHED_PIXELS (the canvas tiles) keep their demosaic and
+    ccm results in an LRU cache bounded by `budget_bytes`, so a change
+    re-runs only the stages after it: a new gamma is a single table
+    lookup per pixel, a new matrix skips the demosaic.
+    """
+    def __init__(self, budget_bytes=128 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.params = {key: DEFAULT_ISP[key] for key in ("wb_gains", "ccm", "gamma")}
+        self.raw_data = None
+        self.pattern = None
+        self.method = None
+        self.window = (0, 1)
+        self.generation = 0 # Bumped whenever the frame content changes
+        self.regions = OrderedDict() # (level, y0, y1, x0, x1) -> stage dict, oldest first
+        self.cached_bytes = 0
+        self.scratch = None
+        self._input_key = None
+        self._input_lut = None
+        self._tone_key = None
+        self._tone_lut = None
+
+    def set_frame(self, raw_data, pattern, method, bit_depth, window):
+        """
+        Frame to render. window: (black, white) in DN like get_display_lut,
+        white None = the max of bit_depth. Regions cached for the same raw
+        array are kept.
+        """
+        if pattern not in BAYER_PATTERNS:
+            raise ValueError(f"ISP preview needs a Bayer pattern, got {pattern}")
+        if raw_data is not self.raw_data:
+            self.update_raw(raw_data)
+        self.pattern = pattern
+        self.method = method
+        black, white = window
+        self.window = (black, (1 << bit_depth) - 1 if white is None else white)
+
+    def update_raw(self, raw_data):
+        """New frame content (e.g. corrected pixels): every cached region is stale."""
+        self.raw_data = raw_data
+        self.generation += 1
+        self.clear()
+
+    def set_params(self, params):
+        """Takes wb_gains (R, G, B), ccm (9 values, row major) and gamma from params."""
+        for key in ("wb_gains", "ccm", "gamma"):
+            if key in params:
+                self.params[key] = params[key]
+
+    def clear(self):
+        self.regions.clear()
+        self.cached_bytes = 0
+
+    def input_lut(self):
+        container_bits = self.raw_data.dtype.itemsize * 8
+        key = (container_bits, self.window, tuple(self.params["wb_gains"]))
+        if key != self._input_key:
+            self._input_lut = input_lut(container_bits, self.window[0], self.window[1], key[2])
+            self._input_key = key
+        return self._input_lut
+
+    def tone_lut(self):
+        key = self.params["gamma"]
+        if key != self._tone_key:
+            self._tone_lut = tone_lut(key)
+            self._tone_key = key
+        return self._tone_lut
+
+    def demosaic_key(self):
+        return (self.generation, self.pattern, self.method, self.window, tuple(self.params["wb_gains"]))
+
+    def ccm_key(self):
+        return self.demosaic_key() + (tuple(self.params["ccm"]),)
+
+    def linear(self, level, y0, y1, x0, x1, out=None):
+        """Float32 linear RGB of the region at 1 / 2**level resolution (input + demosaic stages)."""
+        if level == 0:
+            return demosaic(self.raw_data, self.pattern, self.method, y0, y1, x0, x1,
+                            lut=self.input_lut(), out=out)
+        rgb = superpixel(self.raw_data, self.pattern, y0, y1, x0, x1, 2 ** level)
+        # The input LUT is affine per channel, so mapping the cell averages is exact
+        lut = self.input_lut()
+        rgb *= lut[:, 1] - lut[:, 0]
+        rgb += lut[:, 0]
+        return rgb
+
+    def render(self, level, y0, y1, x0, x1):
+        """8-bit (h, w, 3) RGB of the region [y0, y1) x [x0, x1) at 1 / 2**level resolution."""
+        if (y1 - y0) * (x1 - x0) > MAX_CACHED_PIXELS * 4 ** level:
+            return self.process(level, y0, y1, x0, x1)
+
+        region = (level, y0, y1, x0, x1)
+        stages = self.regions.pop(region, None)
+        if stages is None:
+            stages = {"demosaic_key": None, "ccm_key": None}
+        else:
+            self.cached_bytes -= stages["nbytes"]
+
+        ccm_key = self.ccm_key()
+        if stages["ccm_key"] != ccm_key:
+            demosaic_key = self.demosaic_key()
+            if stages["demosaic_key"] != demosaic_key:
+                stages["linear"] = self.linear(level, y0, y1, x0, x1)
+                stages["demosaic_key"] = demosaic_key
+            stages["indices"] = tone_indices(stages["linear"], self.params["ccm"], scratch=self.get_scratch(x1 - x0))
+            stages["ccm_key"] = ccm_key
+        stages["nbytes"] = stages["linear"].nbytes + stages["indices"].nbytes
+
+        self.regions[region] = stages
+        self.cached_bytes += stages["nbytes"]
+        # Evict least recently used, never the region just made
+        while self.cached_bytes > self.budget_bytes and len(self.regions) > 1:
+            _, old = self.regions.popitem(last=False)
+            self.cached_bytes -= old["nbytes"]
+        return self.tone_lut()[stages["indices"]]
+
+    def process(self, level, y0, y1, x0, x1):
+        """
+        Uncached render of a large region: all stages fused per row band,
+        so the float intermediates stay band-sized whatever the region.
+        """
+        tone = self.tone_lut()
+        if level > 0:
+            # Already reduced 4**level times, one band is small enough
+            indices = tone_indices(self.linear(level, y0, y1, x0, x1), self.params["ccm"],
+                                   scratch=self.get_scratch(x1 - x0))
+            return tone[indices]
+
+        height, width = y1 - y0, x1 - x0
+        rows = min(band_rows(width), height)
+        out = np.empty((height, width, 3), dtype=np.uint8)
+        linear = np.empty((rows, width, 3), dtype=np.float32)
+        indices = np.empty((rows, width, 3), dtype=np.uint16)
+        scratch = self.get_scratch(width)
+        for b0 in range(0, height, rows):
+            b1 = min(b0 + rows, height)
+            n = b1 - b0
+            self.linear(0, y0 + b0, y0 + b1, x0, x1, out=linear[:n])
+            tone_indices(linear[:n], self.params["ccm"], out=indices[:n], scratch=scratch)
+            np.take(tone, indices[:n], out=out[b0:b1])
+        return out
+
+    def get_scratch(self, width):
+        """The shared float32 band buffer, grown to cover `width`."""
+        if self.scratch is None or self.scratch.shape[1] < width:
+            self.scratch = np.empty((band_rows(width), width, 3), dtype=np.float32)
+        return self.scratch
@@ -0,0 +1,197 @@
+import numpy as np
+import threading
+
+from utils.image_loader import (get_frame_layout, get_frame_count, decode_raw_buffer, apply_display_lut,
+                                apply_bayer_mask)
+from utils.histogram import ChannelHistogram, display_window
+from utils.bayer import BAYER_PATTERNS
+
+class RawSource:
+    """
+    A RAW file mapped once and reinterpreted in memory.
+
+    The file bytes are memory-mapped on first use and stay mapped, so changing
+    width/height/stride/packing reshapes (or re-unpacks) pages that are already
+    resident instead of reading the file again. Each pipeline stage keeps its
+    last result and is only recomputed when its own inputs change:
+        decode   <- width, height, container/packing, stride
+        histogram <- decode + pattern (sampled, milliseconds)
+        display  <- decode + bit depth + display window (LUT rebuild only)
+        colorize <- display + pattern
+
+    With params['demosaic'] set (see utils.demosaic) there is no mosaic
+    stage: the canvas demosaics the tiles in view from the raw frame.
+    params['isp'] likewise leaves the preview (utils.isp) to the canvas.
+
+    The display window is either the manual black/white points of params
+    or, with params['auto_levels'], percentiles of the frame's histogram
+    (see utils.histogram.display_window): changing it only re-runs the LUT.
+
+    Multi-frame files are addressed with params['frame_index'] (plus
+    'frame_header' / 'frame_stride' for the layout), each frame is just
+    another offset into the same mapping.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.lock = threading.RLock() # Stages may be requested from worker threads
+        self._buffer = None
+        self._raw_key = None
+        self._raw = None
+        self._hist_key = None
+        self._hist = None
+        self._display_key = None
+        self._display = None
+        self._rgb_key = None
+        self._rgb = None
+        self._sequence = None
+
+    @property
+    def buffer(self):
+        """The whole file as a read-only uint8 memmap."""
+        if self._buffer is None:
+            self._buffer = np.memmap(self.file_path, dtype=np.uint8, mode='r')
+        return self._buffer
+
+    def layout(self, params):
+        return get_frame_layout(params['width'], params['height'], params['bit_depth'],
+                                params.get('packing'), params.get('stride', 0),
+                                params.get('frame_header', 0), params.get('frame_stride', 0))
+
+    def sequence_key(self, params):
+        """Identifies the frame layout, i.e. everything but the frame index."""
+        layout = self.layout(params)
+        # 10/12/14/16-bit unpacked data share the uint16 container: same key
+        return (params['width'], params['height'], layout["dtype"].str,
+                params.get('packing'), layout["stride"], layout["frame_header"], layout["frame_stride"])
+
+    def decode_key(self, params):
+        return self.sequence_key(params) + (params.get('frame_index', 0),)
+
+    def effective_bit_depth(self, params):
+        return self.layout(params)["bit_depth"]
+
+    def frame_count(self, params):
+        """Number of complete frames in the file for params' layout."""
+        return get_frame_count(self.buffer.size, self.layout(params))
+
+    def decode(self, params):
+        """Decodes params' frame without touching the stage caches."""
+        return decode_raw_buffer(self.buffer, params['width'], params['height'], params['bit_depth'],
+                                 params.get('packing'), params.get('stride', 0), params.get('frame_index', 0),
+                                 params.get('frame_header', 0), params.get('frame_stride', 0))
+
+    def render(self, params):
+        """
+        Returns (display_data, raw_data) for params' frame: the (H, W, 3)
+        mosaic for Bayer patterns, else the 8-bit plane.
+        Stateless, so prefetching many frames does not evict the stage caches
+        of the frame on screen.
+        """
+        raw_data = self.decode(params)
+        bit_depth = self.effective_bit_depth(params)
+        histogram = None
+        if params.get('auto_levels'):
+            histogram = ChannelHistogram.from_image(raw_data, params.get('pattern', 'Mono/None'))
+        black, white = display_window(params, histogram)
+        display_data = apply_display_lut(raw_data, bit_depth, black, white)
+        if self.wants_mosaic(params):
+            display_data = apply_bayer_mask(raw_data, params['pattern'], bit_depth, display_data)
+        return display_data, raw_data
+
+    def sequence(self, params):
+        """
+        Returns all frames of params' layout as a lazy FrameSequence.
+        The same object comes back while the layout is unchanged, so
+        results cached per sequence stay valid.
+        """
+        key = self.sequence_key(params)
+        with self.lock:
+            if self._sequence is None or self._sequence[0] != key:
+                self._sequence = (key, FrameSequence(self, params))
+            return self._sequence[1]
+
+    def raw(self, params):
+        """Returns the (H, W) raw array for params."""
+        key = self.decode_key(params)
+        with self.lock:
+            if key != self._raw_key:
+                self._raw = self.decode(params)
+                self._raw_key = key
+                self._display_key = None
+            return self._raw
+
+    def histogram(self, params):
+        """Returns the ChannelHistogram of params' frame."""
+        pattern = params.get('pattern', 'Mono/None')
+        with self.lock:
+            raw_data = self.raw(params)
+            key = (self._raw_key, pattern)
+            if key != self._hist_key:
+                self._hist = ChannelHistogram.from_image(raw_data, pattern)
+                self._hist_key = key
+            return self._hist
+
+    def display_window(self, params):
+        """(black, white) the display plane of params is mapped with."""
+        histogram = self.histogram(params) if params.get('auto_levels') else None
+        return display_window(params, histogram)
+
+    def display(self, params):
+        """Returns the 8-bit display plane for params."""
+        with self.lock:
+            raw_data = self.raw(params)
+            black, white = self.display_window(params)
+            key = (self._raw_key, self.effective_bit_depth(params), black, white)
+            if key != self._display_key:
+                self._display = apply_display_lut(raw_data, key[1], black, white)
+                self._display_key = key
+                self._rgb_key = None
+            return self._display
+
+    def wants_mosaic(self, params):
+        """True if params' frame is shown as a colored Bayer mosaic."""
+        return (params.get('pattern', 'Mono/None') in BAYER_PATTERNS
+                and params.get('demosaic', 'None') == 'None')
+
+    def colorized(self, params):
+        """Returns the (H, W, 3) Bayer mosaic, or None for mono / demosaiced data."""
+        pattern = params.get('pattern', 'Mono/None')
+        if not self.wants_mosaic(params):
+            return None
+        with self.lock:
+            display_data = self.display(params)
+            key = (self._display_key, pattern)
+            if key != self._rgb_key:
+                self._rgb = apply_bayer_mask(self._raw, pattern, key[0][1], display_data)
+                self._rgb_key = key
+            return self._rgb
+
+class FrameSequence:
+    """
+    Lazy (N, H, W) view of a multi-frame file for streaming consumers:
+    len(), integer indexing and iteration. A frame is decoded only when it
+    is accessed (a zero-copy view of the mapping for unpacked data), so
+    walking a long burst never holds more than one frame.
+    """
+    def __init__(self, source, params):
+        self.source = source
+        self.params = dict(params)
+        self.count = source.frame_count(self.params)
+
+    @property
+    def shape(self):
+        return (self.count, self.params['height'], self.params['width'])
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(f"Frame {index} out of range ({self.count} frames)")
+        return self.source.decode(dict(self.params, frame_index=index))
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
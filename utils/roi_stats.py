@@ -0,0 +1,103 @@
+import numpy as np
+
+from utils.bayer import BAYER_PATTERNS, BAYER_OFFSETS
+
+def summed_area_table(plane):
+    """
+    (H+1, W+1) int64 table with sat[y, x] = sum of plane[:y, :x], the
+    leading zero row/column saves the bounds checks in rect_sum.
+    """
+    height, width = plane.shape
+    sat = np.zeros((height + 1, width + 1), dtype=np.int64)
+    np.cumsum(plane, axis=0, dtype=np.int64, out=sat[1:, 1:])
+    np.cumsum(sat[1:, 1:], axis=1, out=sat[1:, 1:])
+    return sat
+
+def rect_sum(sat, x0, y0, x1, y1):
+    """Sum over [y0, y1) x [x0, x1) from a summed-area table, 4 lookups."""
+    return int(sat[y1, x1]) - int(sat[y0, x1]) - int(sat[y1, x0]) + int(sat[y0, x0])
+
+class RoiStats:
+    """
+    Per-channel summed-area tables (sum and sum of squares, int64) of one
+    raw frame, so the count / mean / std of any rectangle is a handful of
+    lookups no matter how large it is. Built once per frame; the tables
+    take 16 bytes per pixel.
+
+    Min / max have no summed-area form and are reduced over the ROI itself
+    (optional, see query).
+    """
+    def __init__(self, raw_data, pattern="Mono/None"):
+        self.raw_data = raw_data
+        self.height, self.width = raw_data.shape
+        if pattern in BAYER_PATTERNS:
+            self.offsets = BAYER_OFFSETS
+            self.step = 2
+            self.names = [pattern[dy * 2 + dx] for dy, dx in BAYER_OFFSETS]
+        else:
+            self.offsets = [(0, 0)]
+            self.step = 1
+            self.names = ["Y"]
+
+        self.sums = []
+        self.squares = []
+        for dy, dx in self.offsets:
+            plane = raw_data[dy::self.step, dx::self.step].astype(np.int64)
+            self.sums.append(summed_area_table(plane))
+            np.multiply(plane, plane, out=plane) # 16-bit squares fit int64 sums up to 2 Gpixel
+            self.squares.append(summed_area_table(plane))
+
+    def plane_range(self, start, stop, offset):
+        """Frame range [start, stop) to the index range of a plane starting at offset."""
+        step = self.step
+        return (max(start - offset, 0) + step - 1) // step, (max(stop - offset, 0) + step - 1) // step
+
+    def query(self, x0, y0, x1, y1, extrema=True):
+        """
+        Stats of the frame rectangle [x0, x1) x [y0, y1) (clipped to the
+        frame), one dict per channel: name, count, mean, std and, with
+        extrema, min / max. Empty channels are left out.
+        """
+        x0, x1 = max(int(x0), 0), min(int(x1), self.width)
+        y0, y1 = max(int(y0), 0), min(int(y1), self.height)
+        results = []
+        for channel, (dy, dx) in enumerate(self.offsets):
+            px0, px1 = self.plane_range(x0, x1, dx)
+            py0, py1 = self.plane_range(y0, y1, dy)
+            count = (px1 - px0) * (py1 - py0)
+            if count <= 0:
+                continue
+            total = rect_sum(self.sums[channel], px0, py0, px1, py1)
+            squares = rect_sum(self.squares[channel], px0, py0, px1, py1)
+            # Exact integer variance numerator, no float cancellation
+            variance = (count * squares - total * total) / (count * count)
+            stats = {
+                "name": self.names[channel],
+                "count": count,
+                "mean": total / count,
+                "std": float(np.sqrt(max(variance, 0.0)))
+            }
+            if extrema:
+                view = self.raw_data[py0 * self.step + dy:py1 * self.step + dy:self.step,
+                                     px0 * self.step + dx:px1 * self.step + dx:self.step]
+                stats["min"] = int(view.min())
+                stats["max"] = int(view.max())
+            results.append(stats)
+        return results
+
+def same_color_neighborhood(raw_data, x, y, size, pattern="Mono/None"):
+    """
+    The size x size grid of same-color pixels centered on (x, y): 2 px
+    apart for Bayer data, adjacent for mono.
+    RETURNS: (values int64, valid bool) arrays, values outside the frame
+    are 0 and not valid.
+    """
+    step = 2 if pattern in BAYER_PATTERNS else 1
+    radius = size // 2
+    height, width = raw_data.shape
+    ys = y + step * np.arange(-radius, radius + 1)
+    xs = x + step * np.arange(-radius, radius + 1)
+    valid = ((ys >= 0) & (ys < height))[:, None] & ((xs >= 0) & (xs < width))[None, :]
+    values = np.zeros((size, size), dtype=np.int64)
+    values[valid] = raw_data[np.clip(ys, 0, height - 1)[:, None], np.clip(xs, 0, width - 1)[None, :]][valid]
+    return values, valid
@@ -0,0 +1,64 @@
+import numpy as np
+
+# MIPI CSI-2 packed RAW formats.
+# Each group stores the upper 8 bits of every pixel in its own byte, followed
+# by the remaining low bits of the whole group packed LSB-first.
+#   RAW10: 4 pixels in 5 bytes
+#   RAW12: 2 pixels in 3 bytes
+#   RAW14: 4 pixels in 7 bytes
+PACKED_FORMATS = {
+    "MIPI RAW10": {"bit_depth": 10, "pixels": 4, "bytes": 5},
+    "MIPI RAW12": {"bit_depth": 12, "pixels": 2, "bytes": 3},
+    "MIPI RAW14": {"bit_depth": 14, "pixels": 4, "bytes": 7},
+}
+
+def packed_line_bytes(width, packing):
+    """
+    Returns the number of bytes one line of `width` pixels occupies in the given
+    packed format (without any line padding). Partial groups are padded up.
+    """
+    fmt = PACKED_FORMATS[packing]
+    groups = -(-width // fmt["pixels"]) # ceil
+    return groups * fmt["bytes"]
+
+def unpack_mipi(lines, width, packing):
+    """
+    Decodes MIPI CSI-2 packed lines into a (H, W) uint16 array.
+    ARGS:
+        lines: 2D uint8 array (H, stride), one packed line per row. Any bytes
+               past the packed payload (line padding) are ignored.
+        width: pixels per line.
+        packing: key of PACKED_FORMATS.
+    """
+    fmt = PACKED_FORMATS[packing]
+    ppg = fmt["pixels"]
+    bpg = fmt["bytes"]
+    lsb_bits = fmt["bit_depth"] - 8
+    
+    height = lines.shape[0]
+    groups = -(-width // ppg)
+    
+    # (H, groups, bytes_per_group) view of the payload, padding sliced off
+    packed = lines[:, :groups * bpg].reshape(height, groups, bpg)
+    
+    out = np.empty((height, groups * ppg), dtype=np.uint16)
+    out_groups = out.reshape(height, groups, ppg)
+    
+    # Gather the low bits of the group into one integer so each pixel's
+    # share is a single shift + mask
+    if bpg - ppg == 1:
+        lsb = packed[:, :, ppg]
+    else:
+        lsb = np.zeros((height, groups), dtype=np.uint32)
+        for i in range(bpg - ppg):
+            lsb |= packed[:, :, ppg + i].astype(np.uint32) << (8 * i)
+    
+    lsb_mask = (1 << lsb_bits) - 1
+    for i in range(ppg):
+        px = out_groups[:, :, i]
+        np.left_shift(packed[:, :, i], lsb_bits, out=px, dtype=np.uint16)
+        px |= (lsb >> (lsb_bits * i)) & lsb_mask
+    
+    if out.shape[1] != width:
+        out = out[:, :width]
+    return out